@@ -3,6 +3,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from firebase_admin.auth import InvalidIdTokenError, ExpiredIdTokenError
 import core.firebase as firebase
+from core.config import settings
 from fastapi import HTTPException
 
 bearer_scheme = HTTPBearer(auto_error=False)
@@ -48,11 +49,19 @@ def get_current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(bea
 
 def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
     """
-    Проста перевірка адмінського доступу. Для dev дозволяємо uid=local-dev.
+    Адмінський доступ — лише за custom claim admin (або is_admin) у Firebase ID токені.
+    Запит без токена (uid=local-dev) пропускається тільки з LOCAL_DEV_ADMIN=true:
+    інакше будь-хто без заголовка Authorization отримав би адмінські ендпоінти.
     """
     if current_user.get("uid") == "local-dev":
-        return current_user
-    if current_user.get("admin") or current_user.get("is_admin"):
+        if settings.LOCAL_DEV_ADMIN:
+            return current_user
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin access requires authentication",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if current_user.get("admin") is True or current_user.get("is_admin") is True:
         return current_user
 
     raise HTTPException(
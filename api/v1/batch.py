@@ -0,0 +1,245 @@
+# api/v1/batch.py
+"""
+Кілька операцій одним запитом: POST /api/v1/batch.
+
+    {"ops": [
+        {"id": "inc", "op": "income.create", "params": {"amount": 1500, "description": "...", "date": "2025-03-01"}},
+        {"id": "cl", "op": "client.create", "params": {"name": "ACME"}},
+        {"id": "decl", "op": "declaration.generate", "params": {"year": 2025, "quarter": 1}, "after": ["inc"]}
+    ]}
+
+Операції без залежностей (after) виконуються конкурентно з одним контекстом користувача.
+Однотипні створення в межах одного етапу групуються в одну транзакцію Firestore
+(агрегати, лічильники й версії синку оновлюються один раз). Кожна операція має власний
+результат зі статусом; помилка однієї не відкочує інші, а залежні від неї отримують 424.
+"""
+import asyncio
+import inspect
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field, ValidationError
+
+from api.deps import get_current_user
+from api.v1.clients import ClientCreate, create_clients
+from api.v1.expenses import ExpenseCreate, ExpenseInDB
+from api.v1.forms import Declaration3GroupPayload
+from api.v1.income import IncomeCreate, IncomeInDB
+from core.money import to_kopiykas
+from services import expense_service, income_service
+from services.declaration_service import generate_declaration_3, get_declaration_3_prefill
+
+router = APIRouter()
+
+MAX_OPS = 50
+
+
+class BatchOp(BaseModel):
+    id: str | None = None
+    op: str
+    params: dict = Field(default_factory=dict)
+    after: list[str] = Field(default_factory=list)
+
+
+class BatchRequest(BaseModel):
+    ops: list[BatchOp] = Field(..., min_length=1, max_length=MAX_OPS)
+
+
+class BatchOpResult(BaseModel):
+    id: str
+    op: str
+    status: int
+    result: object | None = None
+    error: object | None = None
+
+
+class _IdParams(BaseModel):
+    id: str
+
+
+class _PrefillParams(BaseModel):
+    year: int
+    quarter: int
+
+
+# --- Групові створення: список валідованих моделей -> список результатів (в одній транзакції) ---
+
+def _create_incomes(user_uid: str, items: list[IncomeCreate]) -> list[dict]:
+    ids = income_service.create_incomes(user_uid, [item.to_document() for item in items])
+    return [
+        IncomeInDB(id=doc_id, user_uid=user_uid, amount_kop=to_kopiykas(item.amount), **item.dict()).model_dump(mode="json")
+        for doc_id, item in zip(ids, items)
+    ]
+
+
+def _create_expenses(user_uid: str, items: list[ExpenseCreate]) -> list[dict]:
+    ids = expense_service.create_expenses(user_uid, [item.to_document() for item in items])
+    return [
+        ExpenseInDB(id=doc_id, user_uid=user_uid, amount_kop=to_kopiykas(item.amount), **item.dict()).model_dump(mode="json")
+        for doc_id, item in zip(ids, items)
+    ]
+
+
+def _create_clients(user_uid: str, items: list[ClientCreate]) -> list[dict]:
+    return [client.model_dump(mode="json") for client in create_clients(user_uid, items)]
+
+
+GROUPED_OPS = {
+    "income.create": (IncomeCreate, _create_incomes),
+    "expense.create": (ExpenseCreate, _create_expenses),
+    "client.create": (ClientCreate, _create_clients),
+}
+
+
+# --- Окремі операції: (user_uid, params) -> результат ---
+
+def _delete_income(user_uid: str, params: _IdParams) -> dict:
+    income_service.delete_income(user_uid, params.id)
+    return {"id": params.id, "deleted": True}
+
+
+def _delete_expense(user_uid: str, params: _IdParams) -> dict:
+    expense_service.delete_expense(user_uid, params.id)
+    return {"id": params.id, "deleted": True}
+
+
+async def _declaration_prefill(user_uid: str, params: _PrefillParams) -> dict:
+    return await get_declaration_3_prefill(user_uid, params.year, params.quarter)
+
+
+async def _declaration_generate(user_uid: str, params: Declaration3GroupPayload) -> dict:
+    return await generate_declaration_3(user_uid, params.year, params.quarter, params.dict(exclude_none=True))
+
+
+SINGLE_OPS = {
+    "income.delete": (_IdParams, _delete_income),
+    "expense.delete": (_IdParams, _delete_expense),
+    "declaration.prefill": (_PrefillParams, _declaration_prefill),
+    "declaration.generate": (Declaration3GroupPayload, _declaration_generate),
+}
+
+
+def _error_result(op_id: str, op: str, exc: Exception) -> BatchOpResult:
+    if isinstance(exc, HTTPException):
+        return BatchOpResult(id=op_id, op=op, status=exc.status_code, error=exc.detail)
+    if isinstance(exc, ValidationError):
+        return BatchOpResult(id=op_id, op=op, status=422, error=exc.errors(include_url=False, include_context=False))
+    print(f"Batch: операція {op} ({op_id}) впала: {exc}")
+    return BatchOpResult(id=op_id, op=op, status=500, error=str(exc))
+
+
+def _stages(ops: list[BatchOp], ids: list[str]) -> list[list[int]]:
+    """Розкладає операції на етапи за after; цикли та посилання на невідомі id — 400."""
+    index = {op_id: i for i, op_id in enumerate(ids)}
+    for op in ops:
+        unknown = [ref for ref in op.after if ref not in index]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Невідомі залежності в after: {', '.join(unknown)}")
+
+    level: dict[int, int] = {}
+    visiting: set[int] = set()
+
+    def _level(i: int) -> int:
+        if i in level:
+            return level[i]
+        if i in visiting:
+            raise HTTPException(status_code=400, detail="Циклічні залежності між операціями")
+        visiting.add(i)
+        level[i] = 1 + max((_level(index[ref]) for ref in ops[i].after), default=-1)
+        visiting.discard(i)
+        return level[i]
+
+    stages: list[list[int]] = []
+    for i in range(len(ops)):
+        lvl = _level(i)
+        while len(stages) <= lvl:
+            stages.append([])
+        stages[lvl].append(i)
+    return stages
+
+
+async def _run_single(user_uid: str, op: BatchOp, op_id: str) -> BatchOpResult:
+    model, handler = SINGLE_OPS[op.op]
+    try:
+        params = model(**op.params)
+        if inspect.iscoroutinefunction(handler):
+            result = await handler(user_uid, params)
+        else:
+            result = await asyncio.to_thread(handler, user_uid, params)
+        return BatchOpResult(id=op_id, op=op.op, status=200, result=result)
+    except Exception as e:
+        return _error_result(op_id, op.op, e)
+
+
+async def _run_group(user_uid: str, name: str, members: list[tuple[int, BatchOp, str]]) -> dict[int, BatchOpResult]:
+    model, handler = GROUPED_OPS[name]
+    results: dict[int, BatchOpResult] = {}
+    valid: list[tuple[int, str, BaseModel]] = []
+    for i, op, op_id in members:
+        try:
+            valid.append((i, op_id, model(**op.params)))
+        except ValidationError as e:
+            results[i] = _error_result(op_id, name, e)
+    if not valid:
+        return results
+    try:
+        created = await asyncio.to_thread(handler, user_uid, [item for _, _, item in valid])
+        for (i, op_id, _), result in zip(valid, created):
+            results[i] = BatchOpResult(id=op_id, op=name, status=201, result=result)
+    except Exception as e:
+        for i, op_id, _ in valid:
+            results[i] = _error_result(op_id, name, e)
+    return results
+
+
+@router.post("/", response_model=list[BatchOpResult])
+async def run_batch(
+    payload: BatchRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Виконує список операцій (income.create, expense.create, client.create, income.delete,
+    expense.delete, declaration.prefill, declaration.generate) і повертає результат кожної
+    в порядку запиту.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Пакетні операції потребують авторизації")
+
+    ops = payload.ops
+    ids = [op.id or str(i) for i, op in enumerate(ops)]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="id операцій мають бути унікальними")
+    unknown = sorted({op.op for op in ops if op.op not in GROUPED_OPS and op.op not in SINGLE_OPS})
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Невідомі операції: {', '.join(unknown)}")
+
+    results: dict[int, BatchOpResult] = {}
+    for stage in _stages(ops, ids):
+        groups: dict[str, list[tuple[int, BatchOp, str]]] = {}
+        singles: list[int] = []
+        for i in stage:
+            failed = [ref for ref in ops[i].after if results[ids.index(ref)].status >= 400]
+            if failed:
+                results[i] = BatchOpResult(
+                    id=ids[i], op=ops[i].op, status=424, error=f"Не виконано залежності: {', '.join(failed)}"
+                )
+            elif ops[i].op in GROUPED_OPS:
+                groups.setdefault(ops[i].op, []).append((i, ops[i], ids[i]))
+            else:
+                singles.append(i)
+
+        # Групи пишуть послідовно (одна транзакція на тип, без конфліктів на лічильнику версій),
+        # окремі операції — паралельно з ними
+        async def _groups() -> dict[int, BatchOpResult]:
+            merged: dict[int, BatchOpResult] = {}
+            for name, members in groups.items():
+                merged.update(await _run_group(user_uid, name, members))
+            return merged
+
+        group_results, *single_results = await asyncio.gather(
+            _groups(), *(_run_single(user_uid, ops[i], ids[i]) for i in singles)
+        )
+        results.update(group_results)
+        results.update(zip(singles, single_results))
+
+    return [results[i] for i in range(len(ops))]
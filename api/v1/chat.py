@@ -5,12 +5,12 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 from typing import List
 import datetime
-from google.cloud.firestore_v1.base_query import FieldFilter
 from types import SimpleNamespace
 # Наші сервіси для збору контексту
-from services import auth_service, tax_service
+from services import auth_service, tax_service, income_limit, ledger_repository, user_stats
 from models.tax import TaxCalculationRequest
 from core.firebase import ensure_initialized # Імпортуємо Firestore
+from core.money import doc_kopiykas, format_kopiykas, kopiykas_to_float, to_kopiykas
 from services.calendar_service import TaxCalendarService
 from services.legal_repository import LegalRepository
 
@@ -79,13 +79,9 @@ async def chat_with_bot(
             profile = auth_service.get_user_profile(user_uid)
             if not profile:
                 raise HTTPException(status_code=404, detail="Профіль користувача не знайдено")
-            income_query = (
-                db.collection("incomes")
-                .where(filter=FieldFilter("user_uid", "==", user_uid))
-                .stream()
-            )
+            income_query = ledger_repository.query("incomes", user_uid).stream()
             incomes_list = [doc.to_dict() for doc in income_query]
-            total_income = sum(item.get("amount", 0) for item in incomes_list)
+            total_income = kopiykas_to_float(sum(doc_kopiykas(item) for item in incomes_list))
             recent_incomes = sorted(
                 incomes_list,
                 key=lambda x: x.get("date") if isinstance(x.get("date"), datetime.datetime) else datetime.datetime.min,
@@ -93,13 +89,9 @@ async def chat_with_bot(
             )[:5]
 
             try:
-                expense_query = (
-                    db.collection("expenses")
-                    .where(filter=FieldFilter("user_uid", "==", user_uid))
-                    .stream()
-                )
+                expense_query = ledger_repository.query("expenses", user_uid).stream()
                 expenses_list = [doc.to_dict() for doc in expense_query]
-                total_expenses = sum(item.get("amount", 0) for item in expenses_list)
+                total_expenses = kopiykas_to_float(sum(doc_kopiykas(item) for item in expenses_list))
                 recent_expenses = sorted(
                     expenses_list,
                     key=lambda x: x.get("date") if isinstance(x.get("date"), datetime.datetime) else datetime.datetime.min,
@@ -119,6 +111,18 @@ async def chat_with_bot(
         deadlines_ep = TaxCalendarService.get_monthly_ep_deadlines(today.year)
         deadlines_esv = TaxCalendarService.get_quarterly_esv_deadlines(today.year)
 
+        if user_uid == "local-dev":
+            limit_status = income_limit.build_status(today.year, None, profile.fop_group)
+        else:
+            limit_status = income_limit.get_limit_status(user_uid, today.year, profile=profile)
+        if limit_status["limit"]:
+            limit_text = (
+                f"{limit_status['limit']:.2f} грн, використано {limit_status['used_ratio'] * 100:.1f}%, "
+                f"залишок {limit_status['remaining']:.2f} грн"
+            )
+        else:
+            limit_text = "не застосовується"
+
         def fmt_recent(items, label: str):
             if not items:
                 return f"- {label}: немає записів."
@@ -133,14 +137,14 @@ async def chat_with_bot(
                     dt_str = str(dt)
                 cat = it.get("category") or it.get("type")
                 desc = it.get("description", "")
-                amt = it.get("amount", 0)
+                amt = format_kopiykas(doc_kopiykas(it))
                 extra = []
                 if cat:
                     extra.append(f"категорія: {cat}")
                 if desc:
                     extra.append(desc)
                 extra_text = f" ({'; '.join(extra)})" if extra else ""
-                return f"{dt_str}: {amt:.2f} грн{extra_text}"
+                return f"{dt_str}: {amt} грн{extra_text}"
 
             return f"- {label} (останні): " + "; ".join(_fmt_item(it) for it in items)
 
@@ -156,6 +160,7 @@ async def chat_with_bot(
         - Розрахований Єдиний Податок (ЄП): {tax_data.single_tax:.2f} грн
         - Розрахований Єдиний Соціальний Внесок (ЄСВ): {tax_data.social_contribution:.2f} грн
         - Всього податків до сплати: {tax_data.total_tax:.2f} грн
+        - Річний ліміт доходу за {today.year}: {limit_text}
         - Останній дохід: {fmt_recent([latest_income], 'Дохід останній') if latest_income else '—'}
         - Остання витрата: {fmt_recent([latest_expense], 'Витрата остання') if latest_expense else '—'}
         {fmt_recent(recent_incomes, 'Дохід')}
@@ -242,8 +247,11 @@ async def chat_with_bot(
 
         try:
             async def add_income_intent(data: dict) -> str:
-                amount = float(data.get("amount") or 0)
-                if amount <= 0:
+                try:
+                    amount_kop = to_kopiykas(data.get("amount") or 0)
+                except ValueError:
+                    amount_kop = 0
+                if amount_kop <= 0:
                     return "Не вдалося додати дохід: сума не вказана."
                 desc = data.get("description") or "Дохід"
                 date_raw = data.get("date")
@@ -254,17 +262,20 @@ async def chat_with_bot(
                         dt = datetime.datetime.now()
                 else:
                     dt = datetime.datetime.now()
-                db.collection("incomes").add({
-                    "amount": amount,
+                from services.income_service import create_income
+                create_income(user_uid, {
+                    "amount_kop": amount_kop,
                     "description": desc,
                     "date": dt,
-                    "user_uid": user_uid,
                 })
-                return f"Додала дохід {amount:.2f} грн ({desc}) на дату {dt.date()}. Він вже у розділі доходів."
+                return f"Додала дохід {format_kopiykas(amount_kop)} грн ({desc}) на дату {dt.date()}. Він вже у розділі доходів."
 
             async def add_expense_intent(data: dict) -> str:
-                amount = float(data.get("amount") or 0)
-                if amount <= 0:
+                try:
+                    amount_kop = to_kopiykas(data.get("amount") or 0)
+                except ValueError:
+                    amount_kop = 0
+                if amount_kop <= 0:
                     return "Не вдалося додати витрату: сума не вказана."
                 desc = data.get("description") or "Витрата"
                 date_raw = data.get("date")
@@ -275,13 +286,13 @@ async def chat_with_bot(
                         dt = datetime.datetime.now()
                 else:
                     dt = datetime.datetime.now()
-                db.collection("expenses").add({
-                    "amount": amount,
+                from services.expense_service import create_expense
+                create_expense(user_uid, {
+                    "amount_kop": amount_kop,
                     "description": desc,
                     "date": dt,
-                    "user_uid": user_uid,
                 })
-                return f"Додала витрату {amount:.2f} грн ({desc}) на дату {dt.date()}. Запис збережено."
+                return f"Додала витрату {format_kopiykas(amount_kop)} грн ({desc}) на дату {dt.date()}. Запис збережено."
 
             async def create_declaration_intent(data: dict) -> str:
                 year = int(data.get("year") or datetime.datetime.now().year)
@@ -304,6 +315,14 @@ async def chat_with_bot(
                 elif intent == "create_declaration":
                     try:
                         reply = await create_declaration_intent(intent_data)
+                    except HTTPException as decl_err:
+                        print(f"Declaration intent failed: {decl_err.status_code} {decl_err.detail}")
+                        if decl_err.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                            reply = "Зараз формується багато документів. Спробуйте за хвилину."
+                        elif decl_err.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+                            reply = f"{decl_err.detail}."
+                        else:
+                            reply = "Не вдалося згенерувати декларацію. Спробуйте уточнити квартал/рік."
                     except Exception as decl_err:
                         print(f"Declaration intent failed: {decl_err}")
                         reply = "Не вдалося згенерувати декларацію. Спробуйте уточнити квартал/рік."
@@ -320,20 +339,27 @@ async def chat_with_bot(
         
         # 4.1 Зберігаємо повідомлення користувача
         if db:
-            db.collection("messages").add({
+            batch = db.batch()
+            message_id = ledger_repository.document("messages", user_uid).id
+            ledger_repository.set(batch, "messages", user_uid, message_id, {
                 "user_uid": user_uid,
                 "sender": "user",
                 "text": request.message,
                 "timestamp": utc_now
             })
+            user_stats.increment(batch, user_uid, "chat_questions")
+            batch.commit()
             
             # 4.2 Зберігаємо відповідь бота
-            db.collection("messages").add({
+            batch = db.batch()
+            reply_id = ledger_repository.document("messages", user_uid).id
+            ledger_repository.set(batch, "messages", user_uid, reply_id, {
                 "user_uid": user_uid,
                 "sender": "bot",
                 "text": reply,
                 "timestamp": utc_now + datetime.timedelta(seconds=1) # (щоб гарантувати порядок)
             })
+            batch.commit()
         
         return ChatMessageResponse(reply=reply)
 
@@ -356,10 +382,8 @@ def get_chat_history(
     try:
         if user_uid == "local-dev":
             return []
-        db = ensure_initialized()
         # ↓↓↓ ЗАПИТ ОНОВЛЕНО, ЩОБ ВИПРАВИТИ UserWarning ↓↓↓
-        messages_query = db.collection("messages") \
-            .where(filter=FieldFilter("user_uid", "==", user_uid)) \
+        messages_query = ledger_repository.query("messages", user_uid) \
             .order_by("timestamp") \
             .stream()
             
@@ -3,7 +3,7 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 
 from api.deps import get_current_user
-from core.firebase import ensure_initialized
+from services import ledger_repository, sync_service
 
 
 class ClientCreate(BaseModel):
@@ -22,17 +22,28 @@ class ClientResponse(ClientCreate):
 router = APIRouter(tags=["Clients"])
 
 
+def create_clients(user_uid: str, clients: list[ClientCreate]) -> list[ClientResponse]:
+    """Кілька клієнтів однією транзакцією (з версіями синку)."""
+    items = [
+        (ledger_repository.document("clients", user_uid).id, {**client.model_dump(), "user_uid": user_uid})
+        for client in clients
+    ]
+
+    def _write(transaction, allocate):
+        first_version = allocate(len(items))
+        for offset, (doc_id, data) in enumerate(items):
+            ledger_repository.set(transaction, "clients", user_uid, doc_id, {**data, "version": first_version + offset})
+
+    sync_service.run_versioned(user_uid, _write)
+    return [ClientResponse(id=doc_id, **data) for doc_id, data in items]
+
+
 @router.post("/", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
 def create_client(client: ClientCreate, user=Depends(get_current_user)):
-    db = ensure_initialized()
-    data = client.model_dump()
-    data["user_uid"] = user["uid"]
-    _, doc_ref = db.collection("clients").add(data)
-    return ClientResponse(id=doc_ref.id, **data)
+    return create_clients(user["uid"], [client])[0]
 
 
 @router.get("/", response_model=List[ClientResponse])
 def list_clients(user=Depends(get_current_user)):
-    db = ensure_initialized()
-    docs = db.collection("clients").where("user_uid", "==", user["uid"]).stream()
+    docs = ledger_repository.query("clients", user["uid"]).stream()
     return [ClientResponse(id=doc.id, **doc.to_dict()) for doc in docs]
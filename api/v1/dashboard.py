@@ -0,0 +1,24 @@
+# api/v1/dashboard.py
+
+from fastapi import APIRouter, Depends, Query
+
+from api.deps import get_current_user
+from services import dashboard_service
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_dashboard(
+    widgets: str | None = Query(
+        None,
+        description="Віджети через кому: stats, currency, calendar, legal, income, income_limit (за замовчуванням усі)",
+    ),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Усі віджети головного екрану одним запитом: один токен, одне читання профілю,
+    віджети збираються паралельно; timings_ms — час кожного віджета.
+    """
+    names = dashboard_service.parse_widgets(widgets)
+    return await dashboard_service.build_dashboard(current_user.get("uid", "local-dev"), names)
@@ -122,18 +122,18 @@ async def toggle_archive_document(
     current_user: dict = Depends(resolve_current_user),
 ):
     uid = current_user.get("uid")
-    meta = DocumentService.get_document_meta(doc_id)
+    meta = DocumentService.get_document_meta(doc_id, user_id=uid)
     if meta.get("userId") != uid:
         raise HTTPException(status_code=403, detail="Немає доступу")
 
-    updated = DocumentService.update_document_meta(doc_id, {"archived": payload.archived})
+    updated = DocumentService.update_document_meta(doc_id, {"archived": payload.archived}, user_id=uid)
     return updated
 
 
 @router.get("/{doc_id}/download", response_class=FileResponse)
 async def download_document(doc_id: str, current_user: dict = Depends(resolve_current_user)):
     uid = current_user.get("uid")
-    meta = DocumentService.get_document_meta(doc_id)
+    meta = DocumentService.get_document_meta(doc_id, user_id=uid)
     if meta.get("userId") != uid:
         raise HTTPException(status_code=403, detail="Немає доступу")
 
@@ -144,7 +144,7 @@ async def download_document(doc_id: str, current_user: dict = Depends(resolve_cu
 
     return FileResponse(
         path=full_path,
-        media_type="application/pdf",
+        media_type="application/xml" if full_path.suffix == ".xml" else "application/pdf",
         filename=meta.get("fileName", "document.pdf"),
     )
 
@@ -152,7 +152,7 @@ async def download_document(doc_id: str, current_user: dict = Depends(resolve_cu
 @router.delete("/{doc_id}")
 async def delete_document(doc_id: str, current_user: dict = Depends(resolve_current_user)):
     uid = current_user.get("uid")
-    meta = DocumentService.get_document_meta(doc_id)
+    meta = DocumentService.get_document_meta(doc_id, user_id=uid)
     if meta.get("userId") != uid:
         raise HTTPException(status_code=403, detail="Немає доступу")
 
@@ -161,7 +161,7 @@ async def delete_document(doc_id: str, current_user: dict = Depends(resolve_curr
     if full_path and full_path.is_file():
         full_path.unlink()
 
-    DocumentService.delete_document(doc_id)
+    DocumentService.delete_document(doc_id, user_id=uid)
     return {"status": "ok"}
 
 
@@ -21,7 +21,7 @@ async def list_documents(user=Depends(get_current_user)):
 
 @router.get("/{doc_id}/download", response_class=FileResponse)
 async def download_document(doc_id: str, user=Depends(get_current_user)):
-    meta = DocumentService.get_document_meta(doc_id)
+    meta = DocumentService.get_document_meta(doc_id, user_id=user.uid)
     if meta["userId"] != user.uid:
         raise HTTPException(status_code=403, detail="Немає доступу")
 
@@ -38,7 +38,7 @@ async def download_document(doc_id: str, user=Depends(get_current_user)):
 
 @router.delete("/{doc_id}")
 async def delete_document(doc_id: str, user=Depends(get_current_user)):
-    meta = DocumentService.get_document_meta(doc_id)
+    meta = DocumentService.get_document_meta(doc_id, user_id=user.uid)
     if meta["userId"] != user.uid:
         raise HTTPException(status_code=403, detail="Немає доступу")
 
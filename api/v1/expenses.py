@@ -1,14 +1,15 @@
 # api/v1/expenses.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from pydantic import BaseModel
 from typing import List
 import datetime
 
 # Імпортуємо залежності
 from api.deps import get_current_user
-from core.firebase import ensure_initialized
-from google.cloud.firestore_v1.base_query import FieldFilter
+from models.ledger import LedgerBulkFilter, LedgerBulkResult, LedgerBulkUpdate
+from core.money import UAH, doc_kopiykas, from_kopiykas, to_kopiykas
+from services import expense_service, idempotency, ledger_bulk, ledger_repository
 
 router = APIRouter()
 
@@ -16,15 +17,35 @@ router = APIRouter()
 # Модель, яку ми очікуємо від фронтенду
 
 class ExpenseCreate(BaseModel):
-    amount: float
+    amount: UAH  # гривні на вході/виході API; у Firestore зберігається amount_kop
     description: str
     date: datetime.date
 
+    def to_document(self) -> dict:
+        """Документ Firestore: сума цілими копійками, дата — datetime для сумісності з Firestore."""
+        data = self.dict()
+        data["amount_kop"] = to_kopiykas(data.pop("amount"))
+        data["date"] = datetime.datetime.combine(self.date, datetime.time.min)
+        return data
+
 # Модель, яку ми повертатимемо з бази даних
 
 class ExpenseInDB(ExpenseCreate):
     id: str
     user_uid: str
+    amount_kop: int
+
+    @classmethod
+    def from_doc(cls, doc_id: str, data: dict) -> "ExpenseInDB":
+        data = dict(data)
+        kop = doc_kopiykas(data)
+        data["amount_kop"] = kop
+        data["amount"] = from_kopiykas(kop)
+        # Перетворюємо datetime -> date (бо Pydantic model очікує date)
+        d = data.get("date")
+        if isinstance(d, datetime.datetime):
+            data["date"] = d.date()
+        return cls(id=doc_id, **data)
 
 # --- 2. Ендпоінт POST (Створити витрату) ---
 
@@ -35,39 +56,70 @@ class ExpenseInDB(ExpenseCreate):
 )
 def create_expense(
     expense_data: ExpenseCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Створює новий запис про витрати для поточного користувача.
+    Повтор з тим самим Idempotency-Key повертає першу відповідь без нового запису.
     """
     user_uid = current_user.get("uid")
+    amount_kop = to_kopiykas(expense_data.amount)
     if user_uid == "local-dev":
-        return ExpenseInDB(id="local-dev", user_uid=user_uid, **expense_data.dict())
-    
-    new_expense_data = expense_data.dict()
-    new_expense_data["user_uid"] = user_uid
-    
-    # Перетворюємо 'date' на 'datetime' для сумісності з Firestore
-    new_expense_data["date"] = datetime.datetime.combine(expense_data.date, datetime.time.min)
+        return ExpenseInDB(id="local-dev", user_uid=user_uid, amount_kop=amount_kop, **expense_data.dict())
     
-    try:
-        db = ensure_initialized()
-        # Додаємо новий документ до колекції 'expenses'
-        doc_ref = db.collection("expenses").add(new_expense_data)
-        created_doc_id = doc_ref[1].id
-        
+    request_fingerprint = idempotency.fingerprint(expense_data.model_dump(mode="json"))
+
+    def _write(doc_id: str | None) -> str:
+        # Додаємо новий документ до колекції 'expenses' разом з лічильником статистики
+        document = expense_data.to_document()
+        if idempotency_key:
+            document["idempotency_key"] = idempotency_key
+            document[idempotency.FINGERPRINT_FIELD] = request_fingerprint
+        return expense_service.create_expense(user_uid, document, doc_id=doc_id)
+
+    def _respond(doc_id: str) -> ExpenseInDB:
         return ExpenseInDB(
-            id=created_doc_id,
+            id=doc_id,
             user_uid=user_uid,
+            amount_kop=amount_kop,
             **expense_data.dict()
         )
+
+    try:
+        result, replayed = idempotency.execute(user_uid, idempotency_key, request_fingerprint, _write, _respond)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Помилка при створенні запису: {str(e)}"
         )
 
+@router.get("/duplicates")
+def get_expense_duplicates(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Звіт про ймовірні дублікати витрат (однакові дата, сума й опис) — наслідок повторених запитів.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return {"collection": "expenses", "groups": [], "duplicate_records": 0, "excess_amount": 0.0}
+    try:
+        return idempotency.duplicate_report(user_uid, "expenses")
+    except Exception as e:
+        print(f"Не вдалося побудувати звіт про дублікати витрат: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Не вдалося побудувати звіт: {e}"
+        )
+
 # --- 3. Ендпоінт GET (Отримати всі витрати) ---
 
 @router.get(
@@ -85,10 +137,8 @@ def get_all_expenses(
         return []
     
     try:
-        db = ensure_initialized()
         # ЗАПИТ (відступ 1)
-        expenses_query = db.collection("expenses") \
-            .where(filter=FieldFilter("user_uid", "==", user_uid)) \
+        expenses_query = ledger_repository.query("expenses", user_uid) \
             .order_by("date", direction="DESCENDING") \
             .stream()
             
@@ -96,13 +146,7 @@ def get_all_expenses(
         results = []
         for doc in expenses_query:
             # ЛОГІКА ЦИКЛУ (відступ 2)
-            doc_data = doc.to_dict()
-            
-            
-            results.append(ExpenseInDB(
-                id=doc.id,      
-                **doc_data      
-            ))
+            results.append(ExpenseInDB.from_doc(doc.id, doc.to_dict()))
             
             
         return results
@@ -130,16 +174,7 @@ def delete_expense(
     if user_uid == "local-dev":
         return
     try:
-        doc_ref = db.collection("expenses").document(expense_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Запис не знайдено")
-
-        data = doc.to_dict()
-        if data.get("user_uid") != user_uid:
-            raise HTTPException(status_code=403, detail="Немає доступу до запису")
-
-        doc_ref.delete()
+        expense_service.delete_expense(user_uid, expense_id)
         return
     except HTTPException:
         raise
@@ -148,3 +183,57 @@ def delete_expense(
             status_code=500,
             detail=f"Помилка при видаленні витрати: {e}"
         )
+
+
+@router.post("/bulk-delete", response_model=LedgerBulkResult, response_model_exclude_none=True)
+def bulk_delete(
+    payload: LedgerBulkFilter,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Видаляє багато записів витрат за списком id або діапазоном дат.
+    Чужі та відсутні id повертаються у forbidden / not_found і не зупиняють решту.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return LedgerBulkResult(deleted=0)
+    try:
+        return ledger_bulk.bulk_delete(
+            "expenses", user_uid, ids=payload.ids, date_from=payload.date_from, date_to=payload.date_to
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка при масовому видаленні: {e}"
+        )
+
+
+@router.post("/bulk-update", response_model=LedgerBulkResult, response_model_exclude_none=True)
+def bulk_update(
+    payload: LedgerBulkUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Змінює суму / опис / дату в багатьох записах витрат за списком id або діапазоном дат.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return LedgerBulkResult(updated=0)
+    try:
+        return ledger_bulk.bulk_update(
+            "expenses",
+            user_uid,
+            payload.changes.to_document(),
+            ids=payload.ids,
+            date_from=payload.date_from,
+            date_to=payload.date_to,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка при масовому редагуванні: {e}"
+        )
@@ -0,0 +1,117 @@
+# api/v1/export.py
+from datetime import date
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
+
+from api.deps import get_current_user
+from services import account_export, auth_service, export_service
+
+router = APIRouter()
+
+KINDS = {"incomes": "incomes", "expenses": "expenses"}
+
+
+def _book_owner(user_uid: str, date_from: date | None, date_to: date | None) -> str:
+    try:
+        profile = auth_service.get_user_profile(user_uid)
+    except Exception as e:
+        print(f"Не вдалося отримати профіль користувача {user_uid}: {e}")
+        profile = None
+    parts = []
+    if profile:
+        name = " ".join(p for p in (profile.last_name, profile.first_name, profile.middle_name) if p)
+        if name:
+            parts.append(f"ФОП {name}")
+        tax_id = (profile.onboarding_data or {}).get("taxId")
+        if tax_id:
+            parts.append(f"РНОКПП {tax_id}")
+    if date_from or date_to:
+        start = date_from.strftime("%d.%m.%Y") if date_from else "…"
+        end = date_to.strftime("%d.%m.%Y") if date_to else "…"
+        parts.append(f"період {start} – {end}")
+    return ", ".join(parts)
+
+
+def _account_uid(current_user: dict) -> str:
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Експорт акаунта потребує авторизації")
+    return user_uid
+
+
+@router.get("/account")
+def export_account(current_user: dict = Depends(get_current_user)):
+    """
+    Усі дані акаунта одним ZIP (профіль, доходи, витрати, клієнти, чат, документи з PDF),
+    що формується й віддається потоком.
+    """
+    user_uid = _account_uid(current_user)
+    return StreamingResponse(
+        account_export.iter_archive(user_uid),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="fopilot-account.zip"'},
+    )
+
+
+@router.post("/account/jobs", status_code=status.HTTP_202_ACCEPTED)
+def start_account_export(background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    """Той самий архів у фоні на диск — для великих акаунтів і нестабільних з'єднань."""
+    user_uid = _account_uid(current_user)
+    job = account_export.create_job(user_uid)
+    background_tasks.add_task(account_export.run_job, user_uid, job["id"])
+    return job
+
+
+@router.get("/account/jobs/{job_id}")
+def get_account_export(job_id: str, current_user: dict = Depends(get_current_user)):
+    return account_export.get_job(_account_uid(current_user), job_id)
+
+
+@router.get("/account/jobs/{job_id}/download")
+def download_account_export(job_id: str, current_user: dict = Depends(get_current_user)):
+    path = account_export.job_archive(_account_uid(current_user), job_id)
+    return FileResponse(path, media_type="application/zip", filename="fopilot-account.zip")
+
+
+@router.get("/{kind}")
+def export_ledger(
+    kind: str,
+    format: str = Query("csv", pattern="^(csv|xlsx|jsonl|pdf)$"),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Вивантаження доходів або витрат файлом: csv, xlsx, jsonl; для доходів також pdf —
+    «Книга обліку доходів» з підсумками по сторінках. Файл віддається потоком по мірі
+    читання з бази, тож розмір журналу не впливає на пам'ять сервера.
+    """
+    collection = KINDS.get(kind)
+    if collection is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Невідомий тип експорту")
+    if format == "pdf" and collection != "incomes":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="PDF доступний лише для доходів")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from пізніше за date_to")
+
+    user_uid = current_user.get("uid")
+    rows = iter(()) if user_uid == "local-dev" else export_service.iter_rows(user_uid, collection, date_from, date_to)
+
+    if format == "csv":
+        body = export_service.stream_csv(rows, collection)
+    elif format == "xlsx":
+        body = export_service.stream_xlsx(rows, collection)
+    elif format == "jsonl":
+        body = export_service.stream_jsonl(rows)
+    else:
+        owner = "" if user_uid == "local-dev" else _book_owner(user_uid, date_from, date_to)
+        body = export_service.stream_income_book(rows, owner=owner)
+
+    media_type, extension = export_service.FORMATS[format]
+    suffix = "".join(f"_{d.isoformat()}" for d in (date_from, date_to) if d)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{kind}{suffix}.{extension}"'},
+    )
@@ -1,14 +1,10 @@
 # api/v1/forms.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from pydantic import BaseModel
 
-from api.deps import get_current_user
-from services.declaration_service import (
-    build_declaration_3_defaults,
-    generate_declaration_3_pdf,
-    merge_declaration_overrides,
-)
-from services.income_service import get_totals_for_quarter  # твоя логика
+from api.deps import get_current_user, require_admin
+from services import declaration_batch, render_cache, render_pool
+from services.declaration_service import generate_declaration_3, get_declaration_3_prefill
 
 router = APIRouter(prefix="/forms", tags=["forms"])
 
@@ -34,9 +30,10 @@ class Declaration3GroupPayload(BaseModel):
     period_text: str | None = None
 
 
-async def _get_prefill(uid: str, year: int, quarter: int) -> dict:
-    totals = await get_totals_for_quarter(uid, year, quarter)
-    return build_declaration_3_defaults(uid, year, quarter, totals)
+class DeclarationBatchPayload(BaseModel):
+    year: int
+    quarter: int
+    reset: bool = False
 
 
 @router.get("/declaration/3-group/prefill", response_model=DeclarationPrefillResponse)
@@ -49,7 +46,7 @@ async def get_declaration_3_group_prefill(
     if not uid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Немає даних користувача")
 
-    return await _get_prefill(uid, year, quarter)
+    return await get_declaration_3_prefill(uid, year, quarter)
 
 
 @router.post("/declaration/3-group")
@@ -61,14 +58,32 @@ async def create_declaration_3_group(
     if not uid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Немає даних користувача")
 
-    base_data = await _get_prefill(uid, payload.year, payload.quarter)
-    payload_data = payload.dict(exclude_none=True)
-    # Фіксуємо рік/квартал навіть якщо фронт їх не редагує
-    payload_data.update({"year": payload.year, "quarter": payload.quarter})
-    merged = merge_declaration_overrides(base_data, payload_data)
-
-    meta = await generate_declaration_3_pdf(
-        user_uid=uid,
-        form_data=merged,
-    )
-    return meta
+    return await generate_declaration_3(uid, payload.year, payload.quarter, payload.dict(exclude_none=True))
+
+
+@router.get("/render-metrics")
+def get_render_metrics(_: dict = Depends(require_admin)):
+    """Стан пулу рендеру PDF: черга, відмови (429), таймаути, час рендеру й очікування, кеш декларацій."""
+    return {**render_pool.metrics(), "cache": render_cache.stats()}
+
+
+@router.post("/declarations/batch", status_code=status.HTTP_202_ACCEPTED)
+def start_declaration_batch(
+    payload: DeclarationBatchPayload,
+    background_tasks: BackgroundTasks,
+    _: dict = Depends(require_admin),
+):
+    """Запускає (або продовжує з чекпоінта) масову генерацію декларацій за квартал; 409 — вже виконується."""
+    job = declaration_batch.claim_job(payload.year, payload.quarter, reset=payload.reset)
+    if job["status"] == "running":
+        background_tasks.add_task(declaration_batch.run_job, payload.year, payload.quarter)
+    return job
+
+
+@router.get("/declarations/batch/{year}/{quarter}")
+def get_declaration_batch(year: int, quarter: int, _: dict = Depends(require_admin)):
+    """Прогрес масової генерації: лічильники, частка оброблених користувачів, дедлайн подання."""
+    job = declaration_batch.get_job(year, quarter)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Завдання не знайдено")
+    return job
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from pydantic import BaseModel
 from typing import List
 import datetime # Використовуватимемо для дати
 
 # Імпортуємо залежності
 from api.deps import get_current_user
-from core.firebase import ensure_initialized
+from models.ledger import LedgerBulkFilter, LedgerBulkResult, LedgerBulkUpdate
+from core.money import UAH, doc_kopiykas, from_kopiykas, to_kopiykas
+from services import idempotency, income_service, ledger_bulk, ledger_repository
 
 router = APIRouter()
 
@@ -13,15 +15,36 @@ router = APIRouter()
 # Модель, яку ми очікуємо від фронтенду при створенні
 
 class IncomeCreate(BaseModel):
-    amount: float
+    amount: UAH  # гривні на вході/виході API; у Firestore зберігається amount_kop
     description: str
     date: datetime.date # Фронтенд може надсилати дату як рядок, FastAPI перетворить її
 
+    def to_document(self) -> dict:
+        """Документ Firestore: сума цілими копійками, дата — datetime (на північ), бо Firestore це любить."""
+        return {
+            "amount_kop": to_kopiykas(self.amount),
+            "description": self.description,
+            "date": datetime.datetime.combine(self.date, datetime.time.min),
+        }
+
 # Модель, яку ми повертатимемо з бази даних (включаючи ID)
 
 class IncomeInDB(IncomeCreate):
     id: str
     user_uid: str
+    amount_kop: int
+
+    @classmethod
+    def from_doc(cls, doc_id: str, data: dict) -> "IncomeInDB":
+        data = dict(data)
+        kop = doc_kopiykas(data)
+        data["amount_kop"] = kop
+        data["amount"] = from_kopiykas(kop)
+        # Перетворюємо datetime -> date (бо Pydantic model очікує date)
+        d = data.get("date")
+        if isinstance(d, datetime.datetime):
+            data["date"] = d.date()
+        return cls(id=doc_id, **data)
 
 # --- 2. Ендпоінт POST (Створити дохід) ---
 
@@ -32,41 +55,70 @@ class IncomeInDB(IncomeCreate):
 )
 def create_income(
     income_data: IncomeCreate,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Створює новий запис про дохід для поточного користувача.
+    Повтор з тим самим Idempotency-Key повертає першу відповідь без нового запису.
     """
     user_uid = current_user.get("uid")
+    amount_kop = to_kopiykas(income_data.amount)
     if user_uid == "local-dev":
-        return IncomeInDB(id="local-dev", user_uid=user_uid, **income_data.dict())
-    
-    new_income_data = income_data.dict()
-    new_income_data["user_uid"] = user_uid
-    
-    # ↓↓↓ ОДИН НОВИЙ РЯДОК, ЯКИЙ ВСЕ ВИПРАВЛЯЄ ↓↓↓
-    # Перетворюємо 'date' на 'datetime' (на північ), бо Firestore це любить
-    new_income_data["date"] = datetime.datetime.combine(income_data.date, datetime.time.min)
+        return IncomeInDB(id="local-dev", user_uid=user_uid, amount_kop=amount_kop, **income_data.dict())
     
-    try:
-        db = ensure_initialized()
-        # Тепер Firestore отримає datetime і буде задоволений
-        doc_ref = db.collection("incomes").add(new_income_data)
-        
-        created_doc_id = doc_ref[1].id
-        
+    request_fingerprint = idempotency.fingerprint(income_data.model_dump(mode="json"))
+
+    def _write(doc_id: str | None) -> str:
+        # Квартальні суми оновлюються разом із записом
+        document = income_data.to_document()
+        if idempotency_key:
+            document["idempotency_key"] = idempotency_key
+            document[idempotency.FINGERPRINT_FIELD] = request_fingerprint
+        return income_service.create_income(user_uid, document, doc_id=doc_id)
+
+    def _respond(doc_id: str) -> IncomeInDB:
         return IncomeInDB(
-            id=created_doc_id,
+            id=doc_id,
             user_uid=user_uid,
+            amount_kop=amount_kop,
             **income_data.dict() # Pydantic коректно поверне 'date'
         )
+
+    try:
+        result, replayed = idempotency.execute(user_uid, idempotency_key, request_fingerprint, _write, _respond)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Помилка при створенні запису в Firestore: {str(e)}"
         )
 
+@router.get("/duplicates")
+def get_income_duplicates(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Звіт про ймовірні дублікати доходів (однакові дата, сума й опис) — наслідок повторених запитів.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return {"collection": "incomes", "groups": [], "duplicate_records": 0, "excess_amount": 0.0}
+    try:
+        return idempotency.duplicate_report(user_uid, "incomes")
+    except Exception as e:
+        print(f"Не вдалося побудувати звіт про дублікати доходів: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Не вдалося побудувати звіт: {e}"
+        )
+
 # --- 3. Ендпоінт GET (Отримати всі доходи) ---
 
 @router.get(
@@ -84,24 +136,13 @@ def get_all_income(
         return []
     
     try:
-        db = ensure_initialized()
-        # Шукаємо всі документи в 'incomes', де 'user_uid' збігається
-        income_query = db.collection("incomes").where("user_uid", "==", user_uid).stream()
+        # Усі документи доходів користувача (розміщення — services/ledger_repository.py)
+        income_query = ledger_repository.query("incomes", user_uid).stream()
         
         results = []
         for doc in income_query:
-            # Перетворюємо документ Firestore на словник
-            doc_data = doc.to_dict()
-            # Перетворюємо datetime -> date (бо Pydantic model очікує date)
-            d = doc_data.get("date")
-            if isinstance(d, datetime.datetime):
-                doc_data["date"] = d.date()
-            # Створюємо об'єкт IncomeInDB, додаючи ID документа
-            income_entry = IncomeInDB(
-                id=doc.id,
-                **doc_data
-            )
-            results.append(income_entry)
+            # Створюємо об'єкт IncomeInDB, додаючи ID документа (старі записи — з float amount)
+            results.append(IncomeInDB.from_doc(doc.id, doc.to_dict()))
             
         # Сортуємо за датою (новіші спочатку) - опціонально, але корисно
         results.sort(key=lambda x: x.date, reverse=True)
@@ -129,17 +170,7 @@ def delete_income(
     if user_uid == "local-dev":
         return
     try:
-        db = ensure_initialized()
-        doc_ref = db.collection("incomes").document(income_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Запис не знайдено")
-
-        data = doc.to_dict()
-        if data.get("user_uid") != user_uid:
-            raise HTTPException(status_code=403, detail="Немає доступу до запису")
-
-        doc_ref.delete()
+        income_service.delete_income(user_uid, income_id)
         return
     except HTTPException:
         raise
@@ -148,3 +179,57 @@ def delete_income(
             status_code=500,
             detail=f"Помилка при видаленні доходу: {e}"
         )
+
+
+@router.post("/bulk-delete", response_model=LedgerBulkResult, response_model_exclude_none=True)
+def bulk_delete(
+    payload: LedgerBulkFilter,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Видаляє багато записів доходів за списком id або діапазоном дат.
+    Чужі та відсутні id повертаються у forbidden / not_found і не зупиняють решту.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return LedgerBulkResult(deleted=0)
+    try:
+        return ledger_bulk.bulk_delete(
+            "incomes", user_uid, ids=payload.ids, date_from=payload.date_from, date_to=payload.date_to
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка при масовому видаленні: {e}"
+        )
+
+
+@router.post("/bulk-update", response_model=LedgerBulkResult, response_model_exclude_none=True)
+def bulk_update(
+    payload: LedgerBulkUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Змінює суму / опис / дату в багатьох записах доходів за списком id або діапазоном дат.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return LedgerBulkResult(updated=0)
+    try:
+        return ledger_bulk.bulk_update(
+            "incomes",
+            user_uid,
+            payload.changes.to_document(),
+            ids=payload.ids,
+            date_from=payload.date_from,
+            date_to=payload.date_to,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка при масовому редагуванні: {e}"
+        )
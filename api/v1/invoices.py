@@ -0,0 +1,54 @@
+# api/v1/invoices.py
+import datetime as dt
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+
+from api.deps import get_current_user
+from core.money import UAH
+from services import invoice_service
+
+router = APIRouter(tags=["Invoices"])
+
+
+class InvoiceItem(BaseModel):
+    client_id: str
+    service_name: str
+    amount: UAH = Field(..., gt=0)
+    currency: str = "USD"
+
+
+class InvoiceCreate(InvoiceItem):
+    date: dt.date | None = None
+
+
+class InvoiceBatchCreate(BaseModel):
+    date: dt.date | None = None
+    items: list[InvoiceItem] = Field(..., min_length=1)
+
+
+def _local_dev_clients_missing(client_ids: list[str]) -> HTTPException:
+    # У local-dev клієнтів немає — та сама відповідь, що й invoice_service._load_clients
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Клієнта не знайдено: {', '.join(dict.fromkeys(client_ids))}",
+    )
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def create_invoice(payload: InvoiceCreate, user=Depends(get_current_user)):
+    user_uid = user.get("uid")
+    if user_uid == "local-dev":
+        raise _local_dev_clients_missing([payload.client_id])
+    item = payload.model_dump(exclude={"date"})
+    return (await invoice_service.generate_invoices(user_uid, [item], payload.date))[0]
+
+
+@router.post("/batch", status_code=status.HTTP_201_CREATED)
+async def create_invoices(payload: InvoiceBatchCreate, user=Depends(get_current_user)):
+    """Інвойси для кількох клієнтів (напр. щомісячні) одним запитом: спільна дата, номери підряд."""
+    user_uid = user.get("uid")
+    if user_uid == "local-dev":
+        raise _local_dev_clients_missing([item.client_id for item in payload.items])
+    items = [item.model_dump() for item in payload.items]
+    return {"invoices": await invoice_service.generate_invoices(user_uid, items, payload.date)}
@@ -0,0 +1,102 @@
+# api/v1/monobank.py
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, status
+from pydantic import BaseModel
+from typing import List, Optional
+
+from api.deps import get_current_user
+from services import monobank_sync, monobank_webhook
+
+router = APIRouter()
+
+
+class MonobankConnectPayload(BaseModel):
+    token: Optional[str] = None  # персональний токен користувача (api.monobank.ua); без нього — 400
+    accounts: Optional[List[str]] = None
+
+
+async def _run_sync(user_uid: str) -> None:
+    try:
+        await monobank_sync.sync_user(user_uid)
+    except Exception as e:
+        print(f"Monobank sync для {user_uid} не вдався: {e}")
+
+
+@router.post("/connect")
+async def connect_monobank(
+    payload: MonobankConnectPayload,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Підключає рахунки Монобанку і запускає першу синхронізацію у фоні.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Недоступно без авторизації")
+
+    result = await monobank_sync.connect_user(user_uid, payload.token, payload.accounts)
+    background_tasks.add_task(_run_sync, user_uid)
+    return result
+
+
+@router.post("/sync", status_code=status.HTTP_202_ACCEPTED)
+async def trigger_sync(
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Ставить синхронізацію виписки в чергу. Через ліміт Монобанку (1 запит/хв на токен)
+    перша синхронізація за кілька місяців може тривати кілька хвилин.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return {"status": "skipped"}
+    if monobank_sync.get_link_status(user_uid) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Monobank не підключено")
+
+    background_tasks.add_task(_run_sync, user_uid)
+    return {"status": "queued"}
+
+
+@router.get("/status")
+def get_sync_status(current_user: dict = Depends(get_current_user)):
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return {"connected": False}
+    link = monobank_sync.get_link_status(user_uid)
+    if link is None:
+        return {"connected": False}
+    return {
+        "connected": True,
+        "accounts": link.get("accounts", []),
+        "checkpoints": link.get("checkpoints", {}),
+        "last_sync_at": link.get("last_sync_at"),
+        "last_sync_result": link.get("last_sync_result"),
+    }
+
+
+@router.post("/webhook/register")
+async def register_webhook(current_user: dict = Depends(get_current_user)):
+    """
+    Реєструє вебхук у Монобанку: далі нові надходження приходять push-подіями
+    і періодичний синк лише підстраховує пропущені.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Недоступно без авторизації")
+    return await monobank_webhook.register_webhook(user_uid)
+
+
+@router.get("/webhook/{hook_id}")
+def verify_webhook(hook_id: str):
+    """Монобанк перевіряє адресу GET-запитом і очікує 200."""
+    return {"status": "ok"}
+
+
+@router.post("/webhook/{hook_id}")
+async def receive_webhook(hook_id: str, payload: dict = Body(...)):
+    """
+    Приймає StatementItem від Монобанку. Відповідаємо одразу, запис у Firestore робить воркер.
+    """
+    queued = await monobank_webhook.enqueue_event(hook_id, payload)
+    return {"status": "queued" if queued else "ignored"}
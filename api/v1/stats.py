@@ -1,14 +1,13 @@
 # api/v1/stats.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 import datetime
 
 # Імпортуємо сервіси
 from api.deps import get_current_user
-import core.firebase as firebase # Потрібен 'auth_client' для дати реєстрації
-from google.cloud.firestore_v1.base_query import FieldFilter
+from services import analytics_service, income_limit, user_stats
 
 router = APIRouter()
 bearer_optional = HTTPBearer(auto_error=False)
@@ -32,6 +31,8 @@ class UserStats(BaseModel):
     chat_questions: int
     calculations: int
     days_in_system: int
+    expenses: int = 0
+    declarations: int = 0
 
 @router.get("/", response_model=UserStats)
 def get_user_stats(
@@ -39,49 +40,28 @@ def get_user_stats(
 ):
     """
     Збирає та повертає статистику для поточного користувача.
+    Лічильники ведуться при записі (services/user_stats.py) — тут лише одне читання.
     """
     user_uid = current_user.get("uid")
     if user_uid == "local-dev":
         return UserStats(chat_questions=0, calculations=0, days_in_system=0)
     
     try:
-        # --- 1. Запитань в чаті ---
-        # Рахуємо повідомлення, де sender == 'user'
-        db = firebase.ensure_initialized()
-        chat_query = db.collection("messages") \
-            .where(filter=FieldFilter("user_uid", "==", user_uid)) \
-            .where(filter=FieldFilter("sender", "==", "user")) \
-            .count() # .count() - це ефективний спосіб порахувати
-            
-        chat_count = chat_query.get()[0][0].value
+        stats = user_stats.get_stats(user_uid)
 
-        # --- 2. Розрахунків ---
-        # Ми не зберігаємо "розрахунки", але ми зберігаємо "доходи".
-        # Давайте використаємо кількість доданих доходів як показник "активності".
-        income_query = db.collection("incomes") \
-            .where(filter=FieldFilter("user_uid", "==", user_uid)) \
-            .count()
-            
-        income_count = income_query.get()[0][0].value
-
-        # --- 3. Днів в системі ---
-        # Отримуємо дату реєстрації користувача з Firebase Auth
-        user_record = firebase.auth_client.get_user(user_uid)
-        
-        # timestamp в мілісекундах, конвертуємо в секунди
-        creation_timestamp_ms = user_record.user_metadata.creation_timestamp
-        created_at = datetime.datetime.fromtimestamp(
-            creation_timestamp_ms / 1000, 
-            tz=datetime.timezone.utc
-        )
-        
+        # --- Днів в системі ---
+        # Дата реєстрації закешована в профілі
+        created_at = stats["created_at"]
         now = datetime.datetime.now(datetime.timezone.utc)
-        days_count = (now - created_at).days
+        days_count = (now - created_at).days if created_at else 0
         
         return UserStats(
-            chat_questions=chat_count,
-            calculations=income_count, # Використовуємо кількість доходів
-            days_in_system=days_count
+            chat_questions=stats["chat_questions"],
+            # Ми не зберігаємо "розрахунки" — використовуємо кількість доходів як показник "активності"
+            calculations=stats["incomes"],
+            days_in_system=days_count,
+            expenses=stats["expenses"],
+            declarations=stats["declarations"],
         )
 
     except Exception as e:
@@ -90,3 +70,59 @@ def get_user_stats(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Не вдалося завантажити статистику: {e}"
         )
+
+
+@router.get("/income-limit")
+def get_income_limit(
+    year: int | None = None,
+    current_user: dict = Depends(resolve_current_user)
+):
+    """
+    Скільки доходу лишилось до граничного річного обсягу для групи ФОП.
+    """
+    year = year or datetime.date.today().year
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return income_limit.build_status(year, None, 3)
+
+    try:
+        return income_limit.get_limit_status(user_uid, year)
+    except Exception as e:
+        print(f"Помилка при розрахунку ліміту доходу: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Не вдалося розрахувати ліміт доходу: {e}"
+        )
+
+
+@router.get("/series")
+def get_ledger_series(
+    granularity: str = Query("month", pattern="^(month|quarter)$"),
+    window: int = Query(3, ge=1, le=24),
+    date_from: datetime.date | None = None,
+    date_to: datetime.date | None = None,
+    current_user: dict = Depends(resolve_current_user)
+):
+    """
+    Часові ряди доходів/витрат: суми по періодах, ковзні суми, зміна рік до року, категорії.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        ledger = analytics_service.build_ledger([])
+    else:
+        try:
+            ledger = analytics_service.load_ledger(user_uid)
+        except Exception as e:
+            print(f"Помилка при завантаженні журналу: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Не вдалося завантажити журнал: {e}"
+            )
+
+    return analytics_service.compute_series(
+        ledger,
+        granularity=granularity,
+        window=window,
+        date_from=date_from,
+        date_to=date_to,
+    )
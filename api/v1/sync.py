@@ -0,0 +1,40 @@
+# api/v1/sync.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from api.deps import get_current_user
+from services import sync_service
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_sync_changes(
+    since: int = Query(0, ge=0, description="version з попередньої відповіді; 0 — повний знімок"),
+    limit: int = Query(500, ge=1, le=2000, description="максимум змін у відповіді"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Доходи, витрати, клієнти та документи, створені/змінені/видалені після since.
+    Клієнт зберігає поле version і передає його в наступному запиті; якщо has_more=True —
+    одразу запитує наступну сторінку.
+    """
+    user_uid = current_user.get("uid")
+    if user_uid == "local-dev":
+        return {
+            "since": since,
+            "version": since,
+            "has_more": False,
+            "full": since <= 0,
+            "changes": {entity: [] for entity in sync_service.ENTITIES},
+            "deleted": {entity: [] for entity in sync_service.ENTITIES},
+        }
+
+    try:
+        return sync_service.get_changes(user_uid, since=since, limit=limit)
+    except Exception as e:
+        print(f"Помилка синхронізації для {user_uid}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Не вдалося отримати зміни: {e}"
+        )
@@ -1,6 +1,7 @@
 # Файл конфігурації, завантажує змінні з .env
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,15 @@ class Settings(BaseSettings):
     # 2. Monobank
     MONOBANK_API_TOKEN: str
     MONOBANK_API_URL: str
+    # Ключ Fernet (cryptography), яким шифруються токени користувачів у monobank_links;
+    # без нього підключити Монобанк не можна
+    MONOBANK_TOKEN_KEY: str | None = None
+    # Синхронізація виписок (personal API): Монобанк дозволяє 1 запит на хвилину на токен
+    MONOBANK_STATEMENT_INTERVAL_SECONDS: float = 60.0
+    MONOBANK_SYNC_INTERVAL_MINUTES: int = 180
+    MONOBANK_SYNC_LOOKBACK_DAYS: int = 93
+    # Публічна адреса бекенду, на яку Монобанк надсилатиме вебхуки
+    PUBLIC_BASE_URL: str | None = None
 
     # 3. Gemini
     GEMINI_API_KEY: str
@@ -28,6 +38,61 @@ class Settings(BaseSettings):
     # Значение по умолчанию будет использоваться, если переменной нет в .env
     MIN_SOCIAL_CONTRIBUTION_MONTHLY: float = 1760.00
 
+    # 6. Граничний річний дохід ФОП = мінімальна зарплата на 1 січня × коефіцієнт групи
+    MIN_WAGE: float = 8000.00
+    # Пороги сповіщень про використання ліміту (частки, кома-сепарейтед)
+    INCOME_LIMIT_ALERT_THRESHOLDS: str = "0.8,0.95,1.0"
+
+    # 7. Лічильники статистики користувача: кількість шардів на користувача
+    # (більше шардів — більше паралельних записів; зменшувати не можна, лише збільшувати)
+    USER_STATS_SHARDS: int = 1
+
+    # 8. Idempotency-Key для створення доходів/витрат: скільки зберігати відповідь і скільки ключів
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_MAX_KEYS_PER_USER: int = 200
+    IDEMPOTENCY_MAX_USERS: int = 10_000
+
+    # 9. Архіви повного експорту акаунта (storage/exports): скільки годин зберігати готовий файл
+    ACCOUNT_EXPORT_KEEP_HOURS: int = 24
+
+    # 10. Розміщення записів користувача: global — колекції верхнього рівня з полем user_uid,
+    # user — users/{uid}/<колекція>, dual — читання з global, запис в обидва (на час міграції)
+    DATA_LAYOUT: Literal["global", "dual", "user"] = "global"
+
+    # 11. Рендер PDF декларації: vector — значення поверх офіційного бланка (pypdf + reportlab),
+    # raster — сторінка, намальована Pillow (також фолбек, якщо vector недоступний),
+    # html — шаблон declaration_3_group.html через WeasyPrint (фолбек — vector)
+    DECLARATION_RENDERER: Literal["vector", "raster", "html"] = "vector"
+
+    # 12. Пул процесів рендеру PDF (services/render_pool.py): процесів (0 — рендер у потоці),
+    # скільки запитів може чекати понад них (далі 429) і скільки секунд чекати на рендер
+    RENDER_WORKERS: int = 2
+    RENDER_QUEUE_SIZE: int = 8
+    RENDER_TIMEOUT_SECONDS: float = 30.0
+
+    # 13. Пам'ять рендеру: сумарна оцінка пам'яті одночасних рендерів, МБ (0 — без обмеження);
+    # растр декларації: rgb (A4@300dpi, ~26 МБ полотно), gray (утричі менше), mono (1 біт у PDF)
+    RENDER_MEMORY_BUDGET_MB: int = 512
+    DECLARATION_RASTER_MODE: Literal["rgb", "gray", "mono"] = "rgb"
+
+    # 14. HTML -> PDF: weasyprint (прогрівається в процесах пулу рендеру) або fallback — лише
+    # растровий фолбек без імпорту WeasyPrint
+    HTML_PDF_BACKEND: Literal["weasyprint", "fallback"] = "weasyprint"
+
+    # 15. Масова генерація декларацій за квартал (services/declaration_batch.py): окремий пул
+    # процесів зі зниженим пріоритетом і ліміт читань Firestore — інтерактивні запити не страждають
+    DECLARATION_BATCH_WORKERS: int = 2
+    DECLARATION_BATCH_READS_PER_SECOND: float = 200.0
+
+    # 16. Інвойси (services/invoice_service.py): vector — reportlab, найшвидший; html —
+    # templates/invoice.html через WeasyPrint. Не більше INVOICE_BATCH_LIMIT інвойсів за запит
+    INVOICE_RENDERER: Literal["vector", "html"] = "vector"
+    INVOICE_BATCH_LIMIT: int = 100
+
+    # 17. Лише для локальної розробки: запит без токена (uid=local-dev) має адмінський доступ
+    # (api/deps.require_admin). У продакшені не вмикати
+    LOCAL_DEV_ADMIN: bool = False
+
 
 settings = Settings()
 
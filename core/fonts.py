@@ -0,0 +1,62 @@
+# core/fonts.py
+"""
+Реєстр шрифтів для рендеру PDF/зображень.
+
+Шрифт з кирилицею (DejaVu Sans) лежить у templates/fonts, тож вигляд документів однаковий
+на будь-якій машині; системні шрифти — лише запасний варіант, якщо файли не скопійовано.
+Шлях до файлу шукається один раз на процес, кожен (розмір, накреслення) завантажується
+один раз, а розміри тексту кешуються: у запиті немає ні перебору файлів, ні розбору TTF.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import ImageFont
+
+from core.templates import TEMPLATES_DIR
+
+FONTS_DIR = TEMPLATES_DIR / "fonts"
+FACES = {False: "DejaVuSans.ttf", True: "DejaVuSans-Bold.ttf"}
+SYSTEM_FONT_DIRS = (
+    Path("/usr/share/fonts/truetype/dejavu"),
+    Path("/usr/share/fonts/TTF"),
+    Path(ImageFont.__file__).resolve().parent / "fonts",
+)
+
+
+@lru_cache(maxsize=2)
+def font_path(bold: bool = False) -> Path | None:
+    """Файл TTF накреслення: вбудований у репозиторій, інакше системний DejaVu."""
+    name = FACES[bold]
+    for directory in (FONTS_DIR, *SYSTEM_FONT_DIRS):
+        path = directory / name
+        if path.is_file():
+            return path
+    print(f"Шрифт {name} не знайдено, буде використано вбудований шрифт Pillow")
+    return None
+
+
+@lru_cache(maxsize=64)
+def load(size: int, bold: bool = False):
+    """Шрифт Pillow заданого розміру; фолбек — вбудований шрифт Pillow."""
+    path = font_path(bold)
+    try:
+        if path is not None:
+            return ImageFont.truetype(str(path), size)
+    except OSError as e:
+        print(f"Не вдалося завантажити шрифт {path}: {e}")
+    return ImageFont.load_default()
+
+
+# Розміри тексту. Ключ — об'єкт шрифту з load() (живе весь процес) і рядок.
+
+@lru_cache(maxsize=4096)
+def text_length(font, text: str) -> float:
+    """Ширина рядка (як ImageDraw.textlength) — для вирівнювання по правому краю."""
+    return font.getlength(text)
+
+
+@lru_cache(maxsize=4096)
+def text_size(font, text: str) -> tuple[int, int]:
+    """Ширина й висота охоплюючого прямокутника рядка (як ImageDraw.textbbox)."""
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
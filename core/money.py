@@ -0,0 +1,79 @@
+# Гроші в копійках: суми зберігаємо й агрегуємо цілими числами (amount_kop),
+# Decimal/float лише на межі API та у форматуванні
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from typing import Annotated
+
+from pydantic import BeforeValidator, PlainSerializer
+
+KOP = Decimal("0.01")
+
+
+def to_kopiykas(value) -> int:
+    """Гривні (float/int/str/Decimal) -> ціла кількість копійок з округленням половини вгору."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        raise ValueError("Некоректна сума")
+    if isinstance(value, int):
+        return value * 100
+    try:
+        dec = Decimal(str(value).replace(" ", "").replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Некоректна сума: {value!r}")
+    if not dec.is_finite():
+        raise ValueError(f"Некоректна сума: {value!r}")
+    return int((dec * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_kopiykas(kop: int) -> Decimal:
+    return (Decimal(int(kop)) / 100).quantize(KOP)
+
+
+def format_kopiykas(kop: int) -> str:
+    """12345 -> "123.45" без проміжного Decimal."""
+    kop = int(kop)
+    sign = "-" if kop < 0 else ""
+    whole, frac = divmod(abs(kop), 100)
+    return f"{sign}{whole}.{frac:02d}"
+
+
+def kopiykas_to_float(kop: int) -> float:
+    return int(kop) / 100
+
+
+def doc_kopiykas(data: dict | None) -> int:
+    """
+    Сума документа доходу/витрати в копійках.
+    Нові документи мають amount_kop; старі (до міграції) — лише float amount.
+    """
+    if not data:
+        return 0
+    kop = data.get("amount_kop")
+    if kop is not None:
+        return int(kop)
+    try:
+        return to_kopiykas(data.get("amount", 0))
+    except ValueError:
+        return 0
+
+
+def apply_rate(kop: int, rate) -> int:
+    """Сума × ставка (0.05) з округленням до копійки, цілочисельно через базисні пункти."""
+    basis_points = int((Decimal(str(rate)) * 10000).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    product = int(kop) * basis_points
+    if product >= 0:
+        return (product + 5000) // 10000
+    return -((-product + 5000) // 10000)
+
+
+def _coerce_uah(value):
+    return from_kopiykas(to_kopiykas(value))
+
+
+# Сума в гривнях для моделей API: приймає число/рядок, всередині Decimal з 2 знаками,
+# у JSON віддається числом як і раніше
+UAH = Annotated[
+    Decimal,
+    BeforeValidator(_coerce_uah),
+    PlainSerializer(lambda v: float(v), return_type=float, when_used="json"),
+]
@@ -5,9 +5,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from database import Database
 from services.scheduler import start_scheduler, scheduler
+from services import monobank_webhook, render_pool
 from core.firebase import initialize_firebase
 from core.config import settings
-from api.v1 import auth, taxes, chat, income, stats, expenses, documents, clients, currency, forms, calendar, legal_admin, legal
+from api.v1 import auth, taxes, chat, income, stats, expenses, documents, clients, invoices, currency, forms, calendar, legal_admin, legal, monobank, dashboard, sync, batch, export
 
 
 @asynccontextmanager
@@ -15,7 +16,11 @@ async def lifespan(app: FastAPI):
     initialize_firebase()
     Database.initialize()
     start_scheduler()
+    monobank_webhook.start_worker()
+    render_pool.start()
     yield
+    await monobank_webhook.stop_worker()
+    render_pool.shutdown()
     if scheduler:
         scheduler.shutdown()
 
@@ -50,11 +55,17 @@ app.include_router(stats.router, prefix="/api/v1/stats", tags=["Stats"])
 app.include_router(expenses.router, prefix="/api/v1/expenses", tags=["Expenses"])
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["Documents"])
 app.include_router(clients.router, prefix="/api/v1/clients", tags=["Clients"])
+app.include_router(invoices.router, prefix="/api/v1/invoices", tags=["Invoices"])
 app.include_router(currency.router, prefix="/api/v1/currency", tags=["Currency"])
 app.include_router(calendar.router, prefix="/api/v1", tags=["Calendar"])
 app.include_router(forms.router, prefix="/api/v1", tags=["Forms"])
 app.include_router(legal.router, prefix="/api/v1", tags=["Legal"])
 app.include_router(legal_admin.router, prefix="/api/v1", tags=["Legal Admin"])
+app.include_router(monobank.router, prefix="/api/v1/monobank", tags=["Monobank"])
+app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
+app.include_router(sync.router, prefix="/api/v1/sync", tags=["Sync"])
+app.include_router(batch.router, prefix="/api/v1/batch", tags=["Batch"])
+app.include_router(export.router, prefix="/api/v1/export", tags=["Export"])
 
 
 @app.get("/")
@@ -0,0 +1,39 @@
+# Pydantic моделі для масових операцій з доходами/витратами
+
+import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from core.money import UAH, to_kopiykas
+
+class LedgerBulkFilter(BaseModel):
+    # Або конкретні id, або діапазон дат (включно)
+    ids: List[str] | None = Field(None, max_length=5000)
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None
+
+class LedgerBulkChanges(BaseModel):
+    amount: UAH | None = None
+    description: str | None = None
+    date: datetime.date | None = None
+
+    def to_document(self) -> dict:
+        """Лише задані поля, у форматі документа Firestore."""
+        data = {}
+        if self.amount is not None:
+            data["amount_kop"] = to_kopiykas(self.amount)
+        if self.description is not None:
+            data["description"] = self.description
+        if self.date is not None:
+            data["date"] = datetime.datetime.combine(self.date, datetime.time.min)
+        return data
+
+class LedgerBulkUpdate(LedgerBulkFilter):
+    changes: LedgerBulkChanges
+
+class LedgerBulkResult(BaseModel):
+    deleted: int | None = None
+    updated: int | None = None
+    not_found: List[str] = []
+    forbidden: List[str] = []
@@ -0,0 +1,196 @@
+# services/account_export.py
+"""
+Повний експорт даних акаунта (запит на перенесення даних) одним ZIP:
+
+    profile.json              — документ users/{uid}
+    incomes.jsonl, expenses.jsonl, clients.jsonl, messages.jsonl, documents.jsonl
+    documents/<id>_<файл>.pdf — PDF з storage/documents/{uid}
+    manifest.json             — кількість записів, пропущені файли, час експорту
+
+Архів пишеться потоково: колекції читаються сторінками по PAGE_SIZE, PDF копіюються
+шматками по COPY_CHUNK_SIZE, а zip-потік віддається або у відповідь (iter_archive), або
+у файл storage/exports/{uid}/{job_id}.zip (фонова задача run_job). Пам'ять не залежить
+від розміру акаунта.
+"""
+import json
+import time
+import zipfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from uuid import uuid4
+
+from fastapi import HTTPException
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from services import ledger_repository
+from services.document_service import BASE_DIR, DOCUMENTS_DIR, DocumentService
+from services.export_service import ZipStream
+
+EXPORTS_DIR = BASE_DIR / "storage" / "exports"
+PAGE_SIZE = 500
+COPY_CHUNK_SIZE = 1024 * 1024
+# Колекції записів користувача (розміщення — services/ledger_repository.py)
+COLLECTIONS = ("incomes", "expenses", "clients", "messages")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+def iter_user_documents(collection: str, user_uid: str):
+    """Усі документи користувача в колекції, сторінками по PAGE_SIZE (порядок за id)."""
+    query = ledger_repository.query(collection, user_uid).order_by("__name__").limit(PAGE_SIZE)
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        last = page[-1]
+
+
+def _document_file(user_uid: str, meta: dict) -> Path | None:
+    """Шлях до PDF документа; лише в межах каталогу користувача."""
+    file_path = meta.get("filePath")
+    if not file_path:
+        return None
+    path = (BASE_DIR / file_path).resolve()
+    if not path.is_relative_to((DOCUMENTS_DIR / user_uid).resolve()) or not path.is_file():
+        return None
+    return path
+
+
+def iter_archive(user_uid: str):
+    """ZIP з усіма даними користувача як ітератор bytes."""
+    db = ensure_initialized()
+    sink = ZipStream()
+    manifest = {
+        "user_uid": user_uid,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "counts": {},
+        "missing_files": [],
+    }
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        profile = db.collection("users").document(user_uid).get()
+        zf.writestr("profile.json", _dumps(profile.to_dict() if profile.exists else {}))
+        yield sink.drain()
+
+        for collection in COLLECTIONS:
+            count = 0
+            with zf.open(f"{collection}.jsonl", "w", force_zip64=True) as out:
+                for doc in iter_user_documents(collection, user_uid):
+                    out.write((_dumps({"id": doc.id, **doc.to_dict()}) + "\n").encode("utf-8"))
+                    count += 1
+                    if count % PAGE_SIZE == 0:
+                        yield sink.drain()
+            manifest["counts"][collection] = count
+            yield sink.drain()
+
+        documents = DocumentService.list_user_documents(user_uid)
+        with zf.open("documents.jsonl", "w", force_zip64=True) as out:
+            for meta in documents:
+                out.write((_dumps(meta) + "\n").encode("utf-8"))
+        manifest["counts"]["documents"] = len(documents)
+        yield sink.drain()
+
+        files = 0
+        for meta in documents:
+            path = _document_file(user_uid, meta)
+            if path is None:
+                manifest["missing_files"].append(meta.get("id"))
+                continue
+            with path.open("rb") as src, zf.open(f"documents/{meta.get('id')}_{path.name}", "w", force_zip64=True) as out:
+                while chunk := src.read(COPY_CHUNK_SIZE):
+                    out.write(chunk)
+                    yield sink.drain()
+            files += 1
+        manifest["counts"]["files"] = files
+
+        zf.writestr("manifest.json", _dumps(manifest))
+    yield sink.drain()
+
+
+# --- Фонові задачі: архів пишеться на диск, клієнт опитує статус і завантажує файл ---
+
+def _job_paths(user_uid: str, job_id: str) -> tuple[Path, Path]:
+    user_dir = EXPORTS_DIR / user_uid
+    return user_dir / f"{job_id}.zip", user_dir / f"{job_id}.json"
+
+
+def _write_status(user_uid: str, job_id: str, status: dict) -> None:
+    _, status_path = _job_paths(user_uid, job_id)
+    tmp = status_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(status, ensure_ascii=False))
+    tmp.replace(status_path)
+
+
+def _cleanup(user_uid: str) -> None:
+    """Видаляє архіви користувача, старші за ACCOUNT_EXPORT_KEEP_HOURS."""
+    user_dir = EXPORTS_DIR / user_uid
+    if not user_dir.is_dir():
+        return
+    cutoff = time.time() - settings.ACCOUNT_EXPORT_KEEP_HOURS * 3600
+    for path in user_dir.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError as e:
+            print(f"Не вдалося прибрати старий експорт {path}: {e}")
+
+
+def create_job(user_uid: str) -> dict:
+    _cleanup(user_uid)
+    (EXPORTS_DIR / user_uid).mkdir(parents=True, exist_ok=True)
+    job_id = uuid4().hex
+    status = {"id": job_id, "status": "pending", "created_at": datetime.now(timezone.utc).isoformat()}
+    _write_status(user_uid, job_id, status)
+    return status
+
+
+def run_job(user_uid: str, job_id: str) -> None:
+    archive_path, _ = _job_paths(user_uid, job_id)
+    partial = archive_path.with_suffix(".part")
+    status = get_job(user_uid, job_id)
+    status["status"] = "running"
+    _write_status(user_uid, job_id, status)
+    try:
+        size = 0
+        with partial.open("wb") as out:
+            for chunk in iter_archive(user_uid):
+                out.write(chunk)
+                size += len(chunk)
+        partial.replace(archive_path)
+        status.update(status="done", size=size, finished_at=datetime.now(timezone.utc).isoformat())
+    except Exception as e:
+        print(f"Експорт акаунта {user_uid} ({job_id}) впав: {e}")
+        partial.unlink(missing_ok=True)
+        status.update(status="failed", error=str(e))
+    _write_status(user_uid, job_id, status)
+
+
+def get_job(user_uid: str, job_id: str) -> dict:
+    _, status_path = _job_paths(user_uid, job_id)
+    if not job_id.isalnum() or not status_path.is_file():
+        raise HTTPException(status_code=404, detail="Експорт не знайдено")
+    return json.loads(status_path.read_text())
+
+
+def job_archive(user_uid: str, job_id: str) -> Path:
+    status = get_job(user_uid, job_id)
+    archive_path, _ = _job_paths(user_uid, job_id)
+    if status.get("status") != "done" or not archive_path.is_file():
+        raise HTTPException(status_code=409, detail="Експорт ще не готовий")
+    return archive_path
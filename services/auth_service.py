@@ -1,4 +1,6 @@
 # Сервісний шар для логіки автентифікації
+from datetime import datetime, timezone
+
 from fastapi import HTTPException
 import core.firebase as firebase
 from models.user import UserInDB, UserUpdate
@@ -21,6 +23,8 @@ def create_user_profile(uid: str, email: str, first_name: str, last_name: str, m
         "onboarding_completed": False,
         "onboarding_data": None,
         "phone": phone,
+        # Кешуємо дату реєстрації для статистики, щоб не ходити щоразу в Firebase Auth
+        "created_at": datetime.now(timezone.utc),
     }
 
     # Використовуємо UID з Auth як ID документу в Firestore
@@ -0,0 +1,187 @@
+# services/dashboard_service.py
+"""
+Дані головного екрану одним запитом.
+
+Кожен віджет — функція від спільного контексту запиту (uid, профіль, дата), тож токен
+перевіряється і профіль читається один раз на весь дашборд. Віджети виконуються
+конкурентно: синхронні (Firestore) — у потоках, асинхронні (курси валют) — в event loop.
+Помилка одного віджета не ламає інші: він потрапляє в errors, решта повертається.
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+
+from fastapi import HTTPException, status
+
+from core.money import doc_kopiykas, from_kopiykas
+from services import auth_service, income_limit, income_totals, ledger_repository, user_stats
+from services.calendar_service import TaxCalendarService
+from services.legal_repository import LegalRepository
+from services.monobank import get_exchange_rate
+
+RECENT_INCOMES_LIMIT = 5
+
+
+@dataclass
+class DashboardContext:
+    user_uid: str
+    profile: object | None
+    today: date
+
+    @property
+    def is_local(self) -> bool:
+        return self.user_uid == "local-dev"
+
+
+def _stats(ctx: DashboardContext) -> dict:
+    if ctx.is_local:
+        return {"chat_questions": 0, "calculations": 0, "days_in_system": 0, "expenses": 0, "declarations": 0}
+    stats = user_stats.get_stats(ctx.user_uid)
+    created_at = stats["created_at"]
+    days = (datetime.now(timezone.utc) - created_at).days if created_at else 0
+    return {
+        "chat_questions": stats["chat_questions"],
+        "calculations": stats["incomes"],
+        "days_in_system": days,
+        "expenses": stats["expenses"],
+        "declarations": stats["declarations"],
+    }
+
+
+async def _currency(ctx: DashboardContext) -> dict:
+    usd, eur = await asyncio.gather(get_exchange_rate("USD"), get_exchange_rate("EUR"))
+    return {"USD": usd, "EUR": eur, "UAH": 1.0}
+
+
+def _calendar(ctx: DashboardContext) -> dict:
+    year = ctx.today.year
+    return {
+        "ep": TaxCalendarService.get_monthly_ep_deadlines(year),
+        "esv": TaxCalendarService.get_quarterly_esv_deadlines(year),
+        "declaration": TaxCalendarService.get_declaration_deadlines(year),
+    }
+
+
+def _legal(ctx: DashboardContext) -> dict:
+    start = ctx.today.replace(day=1)
+    group = getattr(ctx.profile, "fop_group", None) if ctx.profile else None
+    vat_status = "vat" if getattr(ctx.profile, "is_vat_payer", False) else "non_vat"
+    updates = LegalRepository.get_updates_for_period(
+        start_date=start,
+        end_date=ctx.today,
+        group=group,
+        vat_status=vat_status,
+    )
+    return {
+        "period": f"{ctx.today.year}-{ctx.today.month:02d}",
+        "items": [
+            {
+                "id": u.id,
+                "date": u.date.isoformat() if isinstance(u.date, date) else str(u.date),
+                "title": u.title,
+                "importance": u.importance,
+                "summary": u.summary_for_fop3_non_vat or u.summary_general,
+            }
+            for u in updates
+        ],
+    }
+
+
+def _income(ctx: DashboardContext) -> dict:
+    quarter = (ctx.today.month - 1) // 3 + 1
+    if ctx.is_local:
+        return {"year": ctx.today.year, "quarter": quarter, "quarter_total": 0.0, "year_total": 0.0, "recent": []}
+
+    totals = income_totals.get_complete_year_totals(ctx.user_uid, ctx.today.year)
+    recent_query = (
+        ledger_repository.query("incomes", ctx.user_uid)
+        .order_by("date", direction="DESCENDING")
+        .limit(RECENT_INCOMES_LIMIT)
+    )
+    recent = []
+    for doc in recent_query.stream():
+        data = doc.to_dict()
+        d = data.get("date")
+        recent.append({
+            "id": doc.id,
+            "amount": float(from_kopiykas(doc_kopiykas(data))),
+            "description": data.get("description"),
+            "date": d.date().isoformat() if isinstance(d, datetime) else d,
+        })
+    return {
+        "year": ctx.today.year,
+        "quarter": quarter,
+        "quarter_total": float(from_kopiykas(int((totals.get("quarters") or {}).get(str(quarter), 0)))),
+        "year_total": float(from_kopiykas(int(totals.get("year_total", 0)))),
+        "recent": recent,
+    }
+
+
+def _income_limit(ctx: DashboardContext) -> dict:
+    if ctx.is_local:
+        return income_limit.build_status(ctx.today.year, None, 3)
+    return income_limit.get_limit_status(ctx.user_uid, ctx.today.year, profile=ctx.profile)
+
+
+WIDGETS = {
+    "stats": _stats,
+    "currency": _currency,
+    "calendar": _calendar,
+    "legal": _legal,
+    "income": _income,
+    "income_limit": _income_limit,
+}
+
+
+def parse_widgets(raw: str | None) -> list[str]:
+    if not raw:
+        return list(WIDGETS)
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in WIDGETS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Невідомі віджети: {', '.join(unknown)}. Доступні: {', '.join(WIDGETS)}",
+        )
+    return list(dict.fromkeys(names))
+
+
+async def _run_widget(name: str, ctx: DashboardContext) -> tuple[str, object, str | None, float]:
+    func = WIDGETS[name]
+    started = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(func):
+            data = await func(ctx)
+        else:
+            data = await asyncio.to_thread(func, ctx)
+        error = None
+    except Exception as e:
+        print(f"Дашборд: віджет {name} впав: {e}")
+        data, error = None, str(e)
+    return name, data, error, round((time.perf_counter() - started) * 1000, 2)
+
+
+async def build_dashboard(user_uid: str, widgets: list[str]) -> dict:
+    started = time.perf_counter()
+    profile = None
+    needs_profile = {"legal", "income_limit"} & set(widgets)
+    if needs_profile and user_uid != "local-dev":
+        try:
+            profile = await asyncio.to_thread(auth_service.get_user_profile, user_uid)
+        except Exception as e:
+            print(f"Дашборд: не вдалося прочитати профіль {user_uid}: {e}")
+    ctx = DashboardContext(user_uid=user_uid, profile=profile, today=date.today())
+
+    results = await asyncio.gather(*(_run_widget(name, ctx) for name in widgets))
+
+    payload = {"widgets": {}, "errors": {}, "timings_ms": {}}
+    for name, data, error, elapsed in results:
+        payload["timings_ms"][name] = elapsed
+        if error is None:
+            payload["widgets"][name] = data
+        else:
+            payload["errors"][name] = error
+    payload["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return payload
@@ -0,0 +1,303 @@
+# services/declaration_batch.py
+"""
+Масова генерація декларацій 3 групи за квартал — до дедлайнів подання
+(TaxCalendarService.get_declaration_deadlines), щоб у кінці кварталу користувачі
+отримували готовий документ, а не чергу рендеру.
+
+Запуск — адмінський ендпоінт POST /forms/declarations/batch або
+    python -m services.declaration_batch --year 2025 --quarter 3 [--reset]
+
+Як працює:
+    - користувачі читаються сторінками по PAGE_SIZE (order_by __name__), профіль — з тієї ж
+      сторінки (активні — онбординг завершено, 3 група), суми — одним get_all агрегатів
+      income_totals на сторінку; усі читання Firestore проходять через ліміт
+      DECLARATION_BATCH_READS_PER_SECOND;
+    - декларація з тими самими даними, що вже збережена (ключі рендеру сторінки — одним
+      читанням індексу документів), не рендериться вдруге — повторний запуск після зміни
+      доходів перегенерує лише змінені; метадані сторінки публікуються одним оновленням;
+    - рендер — в окремому пулі процесів (DECLARATION_BATCH_WORKERS) зі зниженим пріоритетом
+      (nice), тож інтерактивний пул services/render_pool.py не чекає на CPU;
+    - стан завдання — declaration_jobs/{рік}-Q{квартал}: лічильники, last_uid (чекпоінт після
+      кожної сторінки), filled_date (фіксована на все завдання — ключі рендеру не змінюються
+      між перезапусками). Перерваний запуск продовжується з чекпоінта (--reset — спочатку).
+      Завдання, що не оновлювалося LEASE_SECONDS (процес упав), можна перезапустити.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, status
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from core.money import apply_rate, from_kopiykas
+from models.user import UserInDB
+from services import income_totals, ledger_repository, render_cache, render_pool, user_stats
+from services.calendar_service import TaxCalendarService
+from services.declaration_service import build_form_context, declaration_3_defaults_for, declaration_documents
+from services.document_service import DocumentService
+from services.pdf_service import PDFService
+
+JOBS_COLLECTION = "declaration_jobs"
+# Користувачів на сторінку: між сторінками — чекпоінт
+PAGE_SIZE = 50
+# Через скільки секунд без оновлення завдання зі статусом running вважається покинутим
+LEASE_SECONDS = 300
+# Пріоритет процесів масового рендеру (nice): інтерактивні рендери отримують CPU першими
+WORKER_NICENESS = 10
+COUNTERS = ("processed", "ineligible", "generated", "skipped", "failed")
+
+
+class _Throttle:
+    """Не більше rate читань Firestore за секунду (маркерне відро)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.allowance = rate
+        self.last = time.monotonic()
+
+    def wait(self, reads: int = 1) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+        self.last = now
+        self.allowance -= reads
+        if self.allowance < 0:
+            time.sleep(-self.allowance / self.rate)
+
+
+def job_id(year: int, quarter: int) -> str:
+    return f"{year}-Q{quarter}"
+
+
+def _job_ref(db, year: int, quarter: int):
+    return db.collection(JOBS_COLLECTION).document(job_id(year, quarter))
+
+
+def _deadline(year: int, quarter: int) -> str | None:
+    for item in TaxCalendarService.get_declaration_deadlines(year):
+        if item["quarter"] == quarter:
+            return item["deadline"]
+    return None
+
+
+def _is_stale(job: dict) -> bool:
+    heartbeat = job.get("heartbeat_at")
+    return heartbeat is None or (datetime.now(timezone.utc) - heartbeat).total_seconds() > LEASE_SECONDS
+
+
+def _with_progress(job: dict) -> dict:
+    total = job.get("total") or 0
+    job["progress"] = round(min(job.get("processed", 0) / total, 1.0), 3) if total else None
+    return job
+
+
+def get_job(year: int, quarter: int) -> dict | None:
+    snap = _job_ref(ensure_initialized(), year, quarter).get()
+    return _with_progress(snap.to_dict()) if snap.exists else None
+
+
+def claim_job(year: int, quarter: int, reset: bool = False) -> dict:
+    """
+    Переводить завдання в running (транзакцією — два запуски одночасно не стартують).
+    Повертає стан; status == "done" — генерувати нічого (завершене без reset).
+    """
+    if quarter not in {1, 2, 3, 4}:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Квартал має бути в діапазоні 1..4")
+
+    db = ensure_initialized()
+    ref = _job_ref(db, year, quarter)
+    users = db.collection(ledger_repository.USERS_COLLECTION)
+
+    @firestore.transactional
+    def _claim(transaction):
+        snap = ref.get(transaction=transaction)
+        job = snap.to_dict() if snap.exists else {}
+        if job.get("status") == "running" and not _is_stale(job):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Генерація декларацій {job_id(year, quarter)} вже виконується",
+            )
+        if job.get("status") == "done" and not reset:
+            return job
+
+        now = datetime.now(timezone.utc)
+        if reset or not job:
+            job = {
+                "year": year,
+                "quarter": quarter,
+                "deadline": _deadline(year, quarter),
+                "filled_date": now.strftime("%d.%m.%Y"),
+                "last_uid": None,
+                "started_at": now,
+                **{name: 0 for name in COUNTERS},
+            }
+        # Кількість — лише для прогресу: користувачі, що зареєструються під час завдання, теж потраплять
+        job.update({
+            "status": "running",
+            "total": int(users.count().get()[0][0].value),
+            "heartbeat_at": now,
+            "error": None,
+        })
+        transaction.set(ref, job)
+        return job
+
+    return _with_progress(_claim(db.transaction()))
+
+
+def _init_worker() -> None:
+    try:
+        os.nice(WORKER_NICENESS)
+    except (AttributeError, OSError) as e:
+        print(f"Не вдалося знизити пріоритет процесу масового рендеру: {e}")
+    render_pool._warm_up()
+
+
+def _quarter_totals(db, throttle: _Throttle, profiles: list[UserInDB], year: int, quarter: int) -> dict[str, dict]:
+    """Суми за квартал для сторінки користувачів: агрегати одним get_all, перебудова — лише без повного агрегату."""
+    refs = [db.collection(income_totals.COLLECTION).document(income_totals.totals_doc_id(p.uid, year)) for p in profiles]
+    throttle.wait(len(refs))
+    year_docs = {}
+    for snap in db.get_all(refs):
+        if snap.exists:
+            data = snap.to_dict()
+            year_docs[data.get("user_uid")] = data
+
+    totals = {}
+    for profile in profiles:
+        data = year_docs.get(profile.uid)
+        if not income_totals.is_complete(data):
+            throttle.wait()
+            data = income_totals.ensure_complete(profile.uid, year, data)
+        total_kop = int((data.get("quarters") or {}).get(str(quarter), 0))
+        single_tax_kop = apply_rate(total_kop, profile.tax_rate or 0.05)
+        totals[profile.uid] = {
+            "total_income": from_kopiykas(total_kop),
+            "single_tax": from_kopiykas(single_tax_kop),
+        }
+    return totals
+
+
+def _active_profiles(page) -> list[UserInDB]:
+    profiles = []
+    for doc in page:
+        data = doc.to_dict() or {}
+        data.setdefault("uid", doc.id)
+        try:
+            profile = UserInDB(**data)
+        except Exception as e:
+            print(f"Пропускаю профіль {doc.id}: {e}")
+            continue
+        if profile.onboarding_completed and profile.fop_group == 3:
+            profiles.append(profile)
+    return profiles
+
+
+def _render_page(executor, db, throttle: _Throttle, job: dict, page) -> dict:
+    year, quarter = job["year"], job["quarter"]
+    counts = {name: 0 for name in COUNTERS}
+    counts["processed"] = len(page)
+    profiles = _active_profiles(page)
+    counts["ineligible"] = len(page) - len(profiles)
+    if not profiles:
+        return counts
+
+    totals = _quarter_totals(db, throttle, profiles, year, quarter)
+    # Уже збережені декларації сторінки — одним читанням індексу документів
+    stored = DocumentService.local_documents_by_field("declaration", "renderKey", [p.uid for p in profiles])
+    futures = []
+    for profile in profiles:
+        form_data = declaration_3_defaults_for(profile, year, quarter, totals[profile.uid], job["filled_date"])
+        form_context = build_form_context(form_data)
+        key = render_cache.render_key(form_context)
+        if render_cache.verified_document(stored.get((profile.uid, key))) is not None:
+            counts["skipped"] += 1
+            continue
+        futures.append((profile.uid, form_context, key, executor.submit(PDFService.render_declaration, form_context)))
+
+    metas = []
+    generated = []
+    for uid, form_context, key, future in futures:
+        try:
+            metas += declaration_documents(uid, form_context, future.result(), key)
+            generated.append(uid)
+        except Exception as e:
+            print(f"[declaration-batch] {uid}: декларацію не сформовано: {e}")
+            counts["failed"] += 1
+    # Метадані всієї сторінки — одним оновленням архіву
+    DocumentService.publish_documents(metas)
+    for uid in generated:
+        user_stats.bump(uid, "declarations")
+    counts["generated"] = len(generated)
+    return counts
+
+
+def run_job(year: int, quarter: int) -> dict:
+    """Обробляє користувачів від чекпоінта до кінця; завдання має бути заклеймлене claim_job."""
+    db = ensure_initialized()
+    ref = _job_ref(db, year, quarter)
+    job = ref.get().to_dict()
+    users = db.collection(ledger_repository.USERS_COLLECTION)
+    throttle = _Throttle(settings.DECLARATION_BATCH_READS_PER_SECOND)
+
+    try:
+        # spawn: дочірні процеси не успадковують gRPC-з'єднання Firestore батьківського
+        with ProcessPoolExecutor(
+            max_workers=max(settings.DECLARATION_BATCH_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            while True:
+                query = users.order_by("__name__").limit(PAGE_SIZE)
+                if job["last_uid"]:
+                    query = query.where(filter=FieldFilter("__name__", ">", users.document(job["last_uid"])))
+                throttle.wait(PAGE_SIZE)
+                page = list(query.stream())
+                if not page:
+                    break
+
+                counts = _render_page(executor, db, throttle, job, page)
+                for name in COUNTERS:
+                    job[name] += counts[name]
+                job["last_uid"] = page[-1].id
+                job["heartbeat_at"] = datetime.now(timezone.utc)
+                ref.update({
+                    **{name: job[name] for name in COUNTERS},
+                    "last_uid": job["last_uid"],
+                    "heartbeat_at": job["heartbeat_at"],
+                })
+                print(
+                    f"[declaration-batch] {job_id(year, quarter)}: оброблено {job['processed']}/{job.get('total')}, "
+                    f"сформовано {job['generated']}, помилок {job['failed']}"
+                )
+    except Exception as e:
+        print(f"[declaration-batch] {job_id(year, quarter)} зупинено: {e}")
+        ref.update({"status": "failed", "error": str(e), "heartbeat_at": datetime.now(timezone.utc)})
+        raise
+
+    job.update({"status": "done", "finished_at": datetime.now(timezone.utc)})
+    ref.update({"status": "done", "finished_at": job["finished_at"]})
+    return _with_progress(job)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Масова генерація декларацій 3 групи за квартал")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--quarter", type=int, required=True, choices=(1, 2, 3, 4))
+    parser.add_argument("--reset", action="store_true", help="ігнорувати чекпоінт і почати спочатку")
+    args = parser.parse_args()
+
+    try:
+        claimed = claim_job(args.year, args.quarter, reset=args.reset)
+    except HTTPException as e:
+        parser.error(e.detail)
+    if claimed["status"] == "done":
+        print(f"Завдання вже завершене (--reset — згенерувати заново): {claimed}")
+    else:
+        print(run_job(args.year, args.quarter))
@@ -1,23 +1,21 @@
 # services/declaration_service.py
+import asyncio
 from datetime import datetime
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from typing import Any, Mapping
 
-from services import auth_service
+from core.money import format_kopiykas, to_kopiykas
+from services import auth_service, declaration_xml, render_cache, render_pool, user_stats
 from core.templates import TEMPLATES_DIR
-from core.templates import env as templates_env
-from services.pdf_service import PDFService
 from services.document_service import DocumentService  # твой локальный сторидж
+from services.income_service import get_totals_for_quarter
 
 
 def _format_money(value: float | Decimal) -> str:
-    if value is None:
-        value = 0
     try:
-        dec = Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    except Exception:
-        dec = Decimal("0.00")
-    return dec.to_eng_string()
+        return format_kopiykas(to_kopiykas(value))
+    except ValueError:
+        return "0.00"
 
 
 def _build_full_name(profile) -> str:
@@ -47,6 +45,17 @@ def build_declaration_3_defaults(
     except Exception as e:
         print(f"Не вдалося отримати профіль користувача {user_uid}: {e}")
         profile = None
+    return declaration_3_defaults_for(profile, year, quarter, totals)
+
+
+def declaration_3_defaults_for(
+    profile,
+    year: int,
+    quarter: int,
+    totals: Mapping[str, Any],
+    filled_date: str | None = None,
+) -> dict:
+    """Дефолтні дані декларації з уже прочитаного профілю (масова генерація — без повторних читань)."""
     quarter_map = {1: "I квартал", 2: "II квартал", 3: "III квартал", 4: "IV квартал"}
     period_text = f"{quarter_map.get(quarter, '')} {year}"
 
@@ -58,7 +67,7 @@ def build_declaration_3_defaults(
         "tax_id": _extract_tax_id(profile),
         "total_income": float(totals.get("total_income", 0)),
         "single_tax": float(totals.get("single_tax", 0)),
-        "filled_date": datetime.now().strftime("%d.%m.%Y"),
+        "filled_date": filled_date or datetime.now().strftime("%d.%m.%Y"),
     }
 
 
@@ -72,12 +81,42 @@ def merge_declaration_overrides(base: dict, overrides: Mapping[str, Any] | None)
     return merged
 
 
+async def get_declaration_3_prefill(user_uid: str, year: int, quarter: int) -> dict:
+    """Дані форми декларації 3 групи: суми за квартал + ПІБ/ІПН з профілю."""
+    totals = await get_totals_for_quarter(user_uid, year, quarter)
+    return build_declaration_3_defaults(user_uid, year, quarter, totals)
+
+
+async def generate_declaration_3(user_uid: str, year: int, quarter: int, overrides: Mapping[str, Any]) -> dict:
+    """
+    Декларація за квартал з правками користувача поверх префілу (форма й пакетні операції).
+    Повертає метадані збереженого PDF.
+    """
+    base_data = await get_declaration_3_prefill(user_uid, year, quarter)
+    # Фіксуємо рік/квартал навіть якщо фронт їх не редагує
+    merged = merge_declaration_overrides(base_data, {**overrides, "year": year, "quarter": quarter})
+    return await generate_declaration_3_pdf(user_uid=user_uid, form_data=merged)
+
+
 async def generate_declaration_3_pdf(user_uid: str, form_data: Mapping[str, Any]) -> dict:
     """
     Приймає готові дані для декларації (можуть бути відредаговані користувачем) і зберігає PDF.
     """
-    template = templates_env.get_template("declaration_3_group.html")
-    form_context = {
+    form_context = build_form_context(form_data)
+
+    async def render(render_key: str) -> dict:
+        # Без WeasyPrint: векторний бланк або плаский рендер (Pillow) — див. PDFService.render_declaration.
+        # Рендер — у пулі процесів, запис файлу й метаданих (Firestore) — у потоці, не в event loop
+        pdf_bytes = await render_pool.render_declaration(form_context)
+        return await asyncio.to_thread(store_declaration, user_uid, form_context, pdf_bytes, render_key)
+
+    # Ті самі дані вже формувались — повертаємо збережений документ без рендеру
+    return await render_cache.get_or_render(user_uid, form_context, render)
+
+
+def build_form_context(form_data: Mapping[str, Any]) -> dict:
+    """Контекст рендеру декларації (ключ кешу render_cache) з даних форми."""
+    return {
         "full_name": form_data.get("full_name", ""),
         "tax_id": form_data.get("tax_id", ""),
         "year": form_data.get("year"),
@@ -88,18 +127,60 @@ async def generate_declaration_3_pdf(user_uid: str, form_data: Mapping[str, Any]
         "filled_date": form_data.get("filled_date", datetime.now().strftime("%d.%m.%Y")),
     }
 
-    # Завжди використовуємо плаский рендер (Pillow), щоб не залежати від WeasyPrint
-    pdf_bytes = PDFService.render_declaration_flat(form_context)
-    year = form_data.get("year")
-    quarter = form_data.get("quarter")
-    filename = f"declaration_3_group_{year}_Q{quarter}.pdf"
 
-    meta = DocumentService.save_user_document(
+def _declaration_xml_document(user_uid: str, form_context: dict) -> dict | None:
+    """
+    XML-копія даних декларації у форматі FOPilot (services/declaration_xml.py).
+    Документ, що не проходить перевірку за XSD (напр. без ІПН), не зберігається — лише лог.
+    """
+    xml_bytes = declaration_xml.build_declaration(form_context)
+    errors = declaration_xml.validate(xml_bytes)
+    if errors:
+        print(f"XML-копію декларації для {user_uid} не збережено, не відповідає схемі: {'; '.join(errors)}")
+        return None
+    year = form_context.get("year")
+    quarter = form_context.get("quarter")
+    return DocumentService.write_user_document(
+        user_id=user_uid,
+        doc_type="declaration_xml",
+        pdf_bytes=xml_bytes,
+        filename=f"declaration_3_group_{year}_Q{quarter}_data.xml",
+        extra_meta={
+            "year": year,
+            "quarter": quarter,
+            "sha256": render_cache.pdf_digest(xml_bytes),
+        },
+    )
+
+
+def declaration_documents(user_uid: str, form_context: dict, pdf_bytes: bytes, render_key: str) -> list[dict]:
+    """
+    Файли декларації — XML (якщо валідний) і PDF з ключем рендеру (services/render_cache.py);
+    id XML-документа — у метаданих PDF (xmlDocumentId), тож кеш повертає обидва.
+    Метадані ще не опубліковані (DocumentService.publish_documents); PDF — останній.
+    """
+    year = form_context.get("year")
+    quarter = form_context.get("quarter")
+    xml_meta = _declaration_xml_document(user_uid, form_context)
+    pdf_meta = DocumentService.write_user_document(
         user_id=user_uid,
         doc_type="declaration",
         pdf_bytes=pdf_bytes,
-        filename=filename,
-        extra_meta={"year": year, "quarter": quarter},
+        filename=f"declaration_3_group_{year}_Q{quarter}.pdf",
+        extra_meta={
+            "year": year,
+            "quarter": quarter,
+            "renderKey": render_key,
+            "sha256": render_cache.pdf_digest(pdf_bytes),
+            "xmlDocumentId": xml_meta["id"] if xml_meta else None,
+        },
     )
+    return [xml_meta, pdf_meta] if xml_meta else [pdf_meta]
+
 
-    return meta
+def store_declaration(user_uid: str, form_context: dict, pdf_bytes: bytes, render_key: str) -> dict:
+    """Зберігає PDF і XML декларації одним оновленням архіву, рахує її в статистиці."""
+    metas = declaration_documents(user_uid, form_context, pdf_bytes, render_key)
+    DocumentService.publish_documents(metas)
+    user_stats.bump(user_uid, "declarations")
+    return metas[-1]
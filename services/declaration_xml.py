@@ -0,0 +1,137 @@
+# services/declaration_xml.py
+"""
+XML-копія даних декларації 3 групи (формат FOPilot).
+
+Це не формат електронної звітності ДПС: офіційної схеми в репозиторії немає, тож файл
+не видає себе за неї — кореневий елемент FOPILOT_DECLARATION, без кодів форми C_DOC.
+Значення лежать під кодами рядків паперового бланка, графа 4 (ставка 5 %), так само,
+як їх заповнює PDF (pdf_service.DECLARATION_FIELDS): R01G4 — рядок 1 тощо.
+
+Формується з того ж form_context, що й PDF (declaration_service.build_form_context),
+потоковим записувачем (xml.sax XMLGenerator) — без дерева документа в пам'яті.
+
+Перевірка — за схемою templates/declaration_3_group_data.xsd через lxml. Без lxml
+validate() повертає помилку: неперевірений XML не зберігається.
+"""
+import io
+from functools import lru_cache
+from xml.sax.saxutils import XMLGenerator
+from xml.sax.xmlreader import AttributesImpl
+
+from core.templates import TEMPLATES_DIR
+
+XSD_PATH = TEMPLATES_DIR / "declaration_3_group_data.xsd"
+ENCODING = "utf-8"
+SOFTWARE = "FOPilot"
+# Входить у ключ рендеру (render_cache): зміна формату XML — нові документи
+FORMAT_VERSION = "fopilot-decl3-3"
+# (елемент, ключ form_context): рядки розділів II і III бланка, графа 4 — змінювати разом зі схемою
+BODY_ROWS = (
+    ("R01G4", "total_income"),  # 1 — сума доходу за звітний період
+    ("R05G4", "total_income"),  # 5 — загальна сума доходу (рядки 1–4)
+    ("R06G4", "single_tax"),    # 6 — сума єдиного податку (рядок 1 × ставка)
+    ("R08G4", "single_tax"),    # 8 — загальна сума нарахованого податку (6 + 7)
+    ("R12G4", "single_tax"),    # 12 — до сплати (10 + 11)
+)
+
+def _date(value) -> str:
+    """"19.10.2025" -> "2025-10-19" (xs:date); інше лишається як є і не пройде схему."""
+    parts = str(value or "").split(".")
+    if len(parts) != 3:
+        return str(value or "")
+    day, month, year = parts
+    return f"{year}-{month}-{day}"
+
+class _Writer:
+    def __init__(self, out):
+        self._gen = XMLGenerator(out, encoding=ENCODING, short_empty_elements=True)
+        self._depth = 0
+
+    def _indent(self) -> None:
+        self._gen.ignorableWhitespace("\n" + "  " * self._depth)
+
+    def start(self, name: str, attrs: dict | None = None) -> None:
+        self._indent()
+        self._gen.startElement(name, AttributesImpl(attrs or {}))
+        self._depth += 1
+
+    def end(self, name: str) -> None:
+        self._depth -= 1
+        self._indent()
+        self._gen.endElement(name)
+
+    def field(self, name: str, value) -> None:
+        self._indent()
+        self._gen.startElement(name, AttributesImpl({}))
+        self._gen.characters("" if value is None else str(value).strip())
+        self._gen.endElement(name)
+
+    def document(self):
+        self._gen.startDocument()
+        return self
+
+    def close(self) -> None:
+        self._gen.ignorableWhitespace("\n")
+        self._gen.endDocument()
+
+
+def write_declaration(form_context: dict, out) -> None:
+    """Пише XML-копію декларації у бінарний потік out (файл, BytesIO, відповідь)."""
+    quarter = int(form_context.get("quarter") or 0)
+    filled = _date(form_context.get("filled_date"))
+
+    w = _Writer(out).document()
+    w.start("FOPILOT_DECLARATION", {
+        "format": FORMAT_VERSION,
+        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        "xsi:noNamespaceSchemaLocation": XSD_PATH.name,
+    })
+    w.start("HEAD")
+    w.field("TIN", form_context.get("tax_id"))
+    w.field("PERIOD_YEAR", form_context.get("year"))
+    w.field("PERIOD_QUARTER", quarter)
+    w.field("D_FILL", filled)
+    w.field("SOFTWARE", SOFTWARE)
+    w.end("HEAD")
+
+    w.start("BODY")
+    w.field("HNAME", form_context.get("full_name"))
+    w.field("HTIN", form_context.get("tax_id"))
+    for element, key in BODY_ROWS:
+        w.field(element, form_context.get(key))
+    w.end("BODY")
+    w.end("FOPILOT_DECLARATION")
+    w.close()
+
+
+def build_declaration(form_context: dict) -> bytes:
+    out = io.BytesIO()
+    write_declaration(form_context, out)
+    return out.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _schema():
+    """Розібрана XSD — один раз на процес; None, якщо lxml не встановлено."""
+    try:
+        from lxml import etree
+    except ImportError as e:
+        print(f"lxml недоступний, XML-копії декларацій не зберігаються: {e}")
+        return None
+    return etree.XMLSchema(etree.parse(str(XSD_PATH)))
+
+
+def validate(xml_bytes: bytes) -> list[str]:
+    """Помилки перевірки за XSD (порожній список — документ валідний)."""
+    schema = _schema()
+    if schema is None:
+        return ["lxml не встановлено, перевірка за схемою неможлива"]
+    from lxml import etree
+
+    try:
+        document = etree.fromstring(xml_bytes)
+    except etree.XMLSyntaxError as e:
+        return [str(e)]
+    if schema.validate(document):
+        return []
+    return [f"рядок {error.line}: {error.message}" for error in schema.error_log]
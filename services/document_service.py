@@ -1,17 +1,28 @@
 # services/document_service.py
+from contextlib import contextmanager
 from pathlib import Path
 from uuid import uuid4
 from typing import Literal
+import argparse
 from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from fastapi import HTTPException
+import fcntl
 import json
+import os
+import threading
 from datetime import datetime
 
 from core.firebase import ensure_initialized
+from services import ledger_repository, sync_service
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DOCUMENTS_DIR = BASE_DIR / "storage" / "documents"
 LOCAL_INDEX = DOCUMENTS_DIR / "index.json"
+LOCAL_INDEX_LOCK = DOCUMENTS_DIR / "index.json.lock"
+# Збереження документів іде з потоків (asyncio.to_thread, масова генерація) і з окремих
+# процесів (CLI) — кожне читання-зміна-запис індексу виконується під замком
+_index_lock = threading.Lock()
 
 
 def _db():
@@ -28,34 +39,100 @@ def _load_local_index() -> list[dict]:
 
 
 def _save_local_index(items: list[dict]) -> None:
+    """Атомарний запис: читач бачить або старий, або новий індекс, а не обрізаний файл."""
     LOCAL_INDEX.parent.mkdir(parents=True, exist_ok=True)
-    LOCAL_INDEX.write_text(json.dumps(items, ensure_ascii=False, indent=2))
+    tmp = LOCAL_INDEX.with_name(f".{LOCAL_INDEX.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(items, ensure_ascii=False, indent=2))
+    os.replace(tmp, LOCAL_INDEX)
 
 
-DocumentType = Literal["declaration", "invoice", "other"]
+@contextmanager
+def _locked_index():
+    """
+    Індекс для зміни на місці: запис після виходу з блоку (виняток — без запису).
+    threading.Lock — між потоками процесу, flock — між процесами.
+    """
+    with _index_lock:
+        LOCAL_INDEX_LOCK.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOCAL_INDEX_LOCK, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                items = _load_local_index()
+                yield items
+                _save_local_index(items)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Метадані, які не вдалося записати у Firestore: лишаються в локальному індексі з цією позначкою
+# і публікуються повторно — з наступним publish_documents користувача або republish_pending
+PENDING_FIELD = "pendingPublish"
+
+# declaration_xml — XML-копія даних декларації у форматі FOPilot (не окрема декларація)
+DocumentType = Literal["declaration", "declaration_xml", "invoice", "other"]
 
 
 class DocumentService:
     @staticmethod
-    def _save_meta_firestore(meta: dict) -> None:
-        # Тимчасово пропускаємо запис у Firestore, щоб не блокувало без зовнішніх залежностей/мережі
-        return
+    def _save_meta_firestore(user_id: str, metas: list[dict]) -> bool:
+        """
+        Метадані в documents (розміщення — ledger_repository) разом з версіями синку однією
+        транзакцією: /sync не побачить нову версію раніше за сам документ.
+        Без Firestore (local-dev) — лише локальний індекс, без версії.
+        Якщо запис не вдався — метадані позначаються PENDING_FIELD і повертається False.
+        """
+        for meta in metas:
+            meta["version"] = None
+            meta.pop(PENDING_FIELD, None)
+        if user_id == "local-dev":
+            return True
+
+        def _write(transaction, allocate):
+            first = allocate(len(metas))
+            for offset, meta in enumerate(metas):
+                meta["version"] = first + offset
+                ledger_repository.set(transaction, "documents", user_id, meta["id"], meta)
+
+        try:
+            sync_service.run_versioned(user_id, _write)
+            return True
+        except Exception as e:
+            for meta in metas:
+                meta["version"] = None
+                meta[PENDING_FIELD] = True
+            print(f"Firestore недоступний у save_user_document, {len(metas)} документів чекають повторної публікації: {e}")
+            return False
 
     @staticmethod
-    def _append_local_meta(meta: dict) -> None:
-        items = _load_local_index()
-        items = [m for m in items if m.get("id") != meta["id"]]
-        items.append(meta)
-        _save_local_index(items)
+    def _publish(by_user: dict[str, list[dict]]) -> list[dict]:
+        """Публікує метадані по користувачах разом з їх невідправленими раніше; повертає все опубліковане."""
+        pending: dict[str, list[dict]] = {}
+        for item in _load_local_index():
+            if item.get(PENDING_FIELD) and item.get("userId") in by_user:
+                pending.setdefault(item["userId"], []).append(item)
+
+        published = []
+        for user_id, user_metas in by_user.items():
+            ids = {meta["id"] for meta in user_metas}
+            batch = [m for m in pending.get(user_id, []) if m["id"] not in ids] + user_metas
+            DocumentService._save_meta_firestore(user_id, batch)
+            published.extend(batch)
+
+        ids = {meta["id"] for meta in published}
+        with _locked_index() as items:
+            items[:] = [m for m in items if m.get("id") not in ids]
+            items.extend(published)
+        return published
 
     @staticmethod
-    def save_user_document(
+    def write_user_document(
         user_id: str,
         doc_type: DocumentType,
         pdf_bytes: bytes,
         filename: str,
         extra_meta: dict | None = None,
     ) -> dict:
+        """Записує файл і повертає метадані; в архіві документ з'явиться після publish_documents."""
         doc_id = str(uuid4())
 
         user_dir = DOCUMENTS_DIR / user_id
@@ -75,15 +152,50 @@ class DocumentService:
         }
         if extra_meta:
             meta.update(extra_meta)
+        return meta
 
-        DocumentService._save_meta_firestore(meta)
-        DocumentService._append_local_meta(meta)
+    @staticmethod
+    def publish_documents(metas: list[dict]) -> None:
+        """
+        Метадані кількох документів (можна різних користувачів): одна транзакція Firestore на
+        користувача і одне оновлення локального індексу на всю пачку.
+        """
+        if not metas:
+            return
+        by_user: dict[str, list[dict]] = {}
+        for meta in metas:
+            by_user.setdefault(meta["userId"], []).append(meta)
+        DocumentService._publish(by_user)
+
+    @staticmethod
+    def republish_pending(user_id: str | None = None) -> int:
+        """
+        Повторна публікація метаданих з PENDING_FIELD (планувальник і CLI) — для користувачів,
+        які після збою більше нічого не зберігали. Повертає кількість уже опублікованих.
+        """
+        users = {
+            item["userId"] for item in _load_local_index()
+            if item.get(PENDING_FIELD) and (user_id is None or item.get("userId") == user_id)
+        }
+        published = DocumentService._publish({uid: [] for uid in users}) if users else []
+        return sum(1 for meta in published if not meta.get(PENDING_FIELD))
+
+    @staticmethod
+    def save_user_document(
+        user_id: str,
+        doc_type: DocumentType,
+        pdf_bytes: bytes,
+        filename: str,
+        extra_meta: dict | None = None,
+    ) -> dict:
+        meta = DocumentService.write_user_document(user_id, doc_type, pdf_bytes, filename, extra_meta)
+        DocumentService.publish_documents([meta])
         return meta
 
     @staticmethod
-    def get_document_meta(doc_id: str) -> dict:
+    def get_document_meta(doc_id: str, user_id: str) -> dict:
         try:
-            doc = _db().collection("documents").document(doc_id).get()
+            doc = ledger_repository.document("documents", user_id, doc_id).get()
             if doc.exists:
                 return doc.to_dict()
         except Exception as e:
@@ -91,20 +203,48 @@ class DocumentService:
 
         items = _load_local_index()
         for item in items:
-            if item.get("id") == doc_id:
+            if item.get("id") == doc_id and item.get("userId") == user_id:
                 return item
         raise HTTPException(status_code=404, detail="Документ не знайдено")
 
+    @staticmethod
+    def find_user_document(user_id: str, doc_type: DocumentType, **fields) -> dict | None:
+        """Перший документ користувача заданого типу з такими значеннями полів (Firestore, потім локальний індекс)."""
+        try:
+            query = ledger_repository.query("documents", user_id).where(filter=FieldFilter("type", "==", doc_type))
+            for name, value in fields.items():
+                query = query.where(filter=FieldFilter(name, "==", value))
+            for doc in query.limit(1).stream():
+                return doc.to_dict()
+        except Exception as e:
+            print(f"Firestore недоступний у find_user_document: {e}")
+
+        for item in _load_local_index():
+            if item.get("userId") == user_id and item.get("type") == doc_type and all(
+                item.get(name) == value for name, value in fields.items()
+            ):
+                return item
+        return None
+
+    @staticmethod
+    def local_documents_by_field(doc_type: DocumentType, field: str, user_ids) -> dict[tuple[str, object], dict]:
+        """
+        {(userId, значення поля): метадані} для кількох користувачів одним читанням локального
+        індексу (масова генерація). Файли лежать на диску цього сервера, тож індекс поруч із ними
+        повний — Firestore тут не потрібен.
+        """
+        user_ids = set(user_ids)
+        found = {}
+        for item in _load_local_index():
+            if item.get("type") == doc_type and item.get("userId") in user_ids and item.get(field) is not None:
+                found[(item["userId"], item[field])] = item
+        return found
+
     @staticmethod
     def list_user_documents(user_id: str) -> list[dict]:
         docs: list[dict] = []
         try:
-            fs_docs = (
-                _db()
-                .collection("documents")
-                .where("userId", "==", user_id)
-                .stream()
-            )
+            fs_docs = ledger_repository.query("documents", user_id).stream()
             docs = [d.to_dict() for d in fs_docs]
         except Exception as e:
             print(f"Firestore недоступний у list_user_documents: {e}")
@@ -139,34 +279,57 @@ class DocumentService:
         return docs
 
     @staticmethod
-    def update_document_meta(doc_id: str, updates: dict) -> dict:
-        # Firestore (best effort)
-        try:
-            _db().collection("documents").document(doc_id).update(updates)
-        except Exception as e:
-            print(f"Firestore недоступний у update_document_meta: {e}")
+    def update_document_meta(doc_id: str, updates: dict, user_id: str) -> dict:
+        updates = dict(updates)
+        # Firestore (best effort): зміна і її версія синку — однією транзакцією
+        if user_id != "local-dev":
+            current = DocumentService.get_document_meta(doc_id, user_id)
+
+            def _write(transaction, allocate):
+                updates["version"] = allocate()
+                # Повним документом: метадані, що були лише в локальному індексі, потрапляють у Firestore
+                ledger_repository.set(transaction, "documents", user_id, doc_id, {**current, **updates})
+
+            try:
+                sync_service.run_versioned(user_id, _write)
+            except Exception as e:
+                updates.pop("version", None)
+                print(f"Firestore недоступний у update_document_meta: {e}")
 
         # Локальний індекс
-        items = _load_local_index()
-        updated = None
-        for item in items:
-            if item.get("id") == doc_id:
-                item.update(updates)
-                updated = item
-                break
-        if updated:
-            _save_local_index(items)
-            return updated
+        with _locked_index() as items:
+            for item in items:
+                if item.get("id") == doc_id:
+                    item.update(updates)
+                    return item
+        if user_id != "local-dev":
+            return {**current, **updates}
         raise HTTPException(status_code=404, detail="Документ не знайдено")
 
     @staticmethod
-    def delete_document(doc_id: str) -> None:
-        # Firestore (best effort)
-        try:
-            _db().collection("documents").document(doc_id).delete()
-        except Exception as e:
-            print(f"Firestore недоступний у delete_document: {e}")
+    def delete_document(doc_id: str, user_id: str) -> None:
+        # Firestore (best effort): надгробок і видалення — однією транзакцією
+        if user_id != "local-dev":
+            def _write(transaction, allocate):
+                sync_service.add_tombstone(transaction, user_id, "documents", doc_id, allocate())
+                ledger_repository.delete(transaction, "documents", user_id, doc_id)
 
-        items = _load_local_index()
-        filtered = [i for i in items if i.get("id") != doc_id]
-        _save_local_index(filtered)
+            try:
+                sync_service.run_versioned(user_id, _write)
+            except Exception as e:
+                print(f"Firestore недоступний у delete_document: {e}")
+
+        with _locked_index() as items:
+            items[:] = [i for i in items if i.get("id") != doc_id]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Метадані документів")
+    sub = parser.add_subparsers(dest="command", required=True)
+    republish_cmd = sub.add_parser("republish", help="повторно опублікувати метадані, не записані у Firestore")
+    republish_cmd.add_argument("--user", help="лише для одного користувача (uid)")
+    args = parser.parse_args()
+
+    if args.command == "republish":
+        count = DocumentService.republish_pending(args.user)
+        print(f"Опубліковано документів: {count}")
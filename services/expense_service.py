@@ -0,0 +1,62 @@
+from fastapi import HTTPException
+
+from services import idempotency, ledger_repository, sync_service, user_stats
+
+
+# Записів в одній транзакції (ліміт Firestore — 500 записів)
+WRITE_CHUNK_SIZE = 400
+
+
+def create_expenses(user_uid: str, items: list[dict], ids: list[str] | None = None) -> list[str]:
+    """
+    Зберігає кілька витрат: одна транзакція на WRITE_CHUNK_SIZE записів разом з лічильником
+    статистики та версіями синку. Повертає id документів у порядку items.
+    """
+    # Заданим id (Idempotency-Key) не перезаписуємо наявний запис: create після читання в транзакції
+    write = ledger_repository.create if ids else ledger_repository.set
+    ids = ids or [ledger_repository.document("expenses", user_uid).id for _ in items]
+    chunk_size = WRITE_CHUNK_SIZE // ledger_repository.write_factor()
+    for start in range(0, len(items), chunk_size):
+        chunk = list(zip(items[start:start + chunk_size], ids[start:start + chunk_size]))
+
+        def _write(transaction, allocate, chunk=chunk):
+            if write is ledger_repository.create:
+                refs = [ledger_repository.document("expenses", user_uid, doc_id) for _, doc_id in chunk]
+                for snap in transaction.get_all(refs):
+                    if snap.exists:
+                        raise idempotency.AlreadyStored(snap.id, snap.to_dict())
+            first_version = allocate(len(chunk))
+            for offset, (data, doc_id) in enumerate(chunk):
+                payload = {**data, "user_uid": user_uid, "version": first_version + offset}
+                write(transaction, "expenses", user_uid, doc_id, payload)
+            user_stats.increment(transaction, user_uid, "expenses", len(chunk))
+
+        sync_service.run_versioned(user_uid, _write)
+    return ids
+
+
+def create_expense(user_uid: str, data: dict, doc_id: str | None = None) -> str:
+    """
+    Зберігає витрату разом з лічильником статистики та версією синку. doc_id — як у
+    income_service.create_income (Idempotency-Key). Повертає id документа.
+    """
+    return create_expenses(user_uid, [data], [doc_id] if doc_id else None)[0]
+
+
+def delete_expense(user_uid: str, expense_id: str) -> None:
+    doc_ref = ledger_repository.document("expenses", user_uid, expense_id)
+
+    def _delete(transaction, allocate):
+        doc = doc_ref.get(transaction=transaction)
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Запис не знайдено")
+
+        data = doc.to_dict()
+        if data.get("user_uid") != user_uid:
+            raise HTTPException(status_code=403, detail="Немає доступу до запису")
+
+        ledger_repository.delete(transaction, "expenses", user_uid, expense_id)
+        sync_service.add_tombstone(transaction, user_uid, "expenses", expense_id, allocate())
+        user_stats.increment(transaction, user_uid, "expenses", -1)
+
+    sync_service.run_versioned(user_uid, _delete)
@@ -0,0 +1,296 @@
+# services/export_service.py
+"""
+Потоковий експорт доходів/витрат (CSV, XLSX, JSON Lines) і PDF «Книга обліку доходів».
+
+Записи читаються з Firestore сторінками (order_by date + start_after), кожен формат —
+генератор bytes, який StreamingResponse віддає клієнту по мірі готовності. У пам'яті
+одночасно лише одна сторінка запитів і один шматок вихідного файлу, тож експорт 50 тис.
+рядків не залежить від розміру журналу. PDF так само: сторінка за сторінкою
+(services/pdf_stream.py).
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import date, datetime, time
+from xml.sax.saxutils import escape
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core import fonts
+from core.money import doc_kopiykas, format_kopiykas
+from services import ledger_repository
+from services.pdf_stream import StreamingPDF
+
+PAGE_SIZE = 500
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "pdf": ("application/pdf", "pdf"),
+}
+# Колонки експорту: (заголовок, ключ рядка)
+COLUMNS = {
+    "incomes": [("Дата", "date"), ("Опис", "description"), ("Сума, грн", "amount"), ("Джерело", "source"), ("ID", "id")],
+    "expenses": [("Дата", "date"), ("Опис", "description"), ("Сума, грн", "amount"), ("Категорія", "category"), ("ID", "id")],
+}
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def iter_records(user_uid: str, collection: str, date_from: date | None = None, date_to: date | None = None):
+    """Документи користувача за зростанням дати, сторінками по PAGE_SIZE."""
+    query = ledger_repository.query(collection, user_uid)
+    if date_from:
+        query = query.where(filter=FieldFilter("date", ">=", datetime.combine(date_from, time.min)))
+    if date_to:
+        query = query.where(filter=FieldFilter("date", "<=", datetime.combine(date_to, time.max)))
+    query = query.order_by("date").limit(PAGE_SIZE)
+
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        last = page[-1]
+
+
+def iter_rows(user_uid: str, collection: str, date_from: date | None = None, date_to: date | None = None):
+    for doc in iter_records(user_uid, collection, date_from, date_to):
+        data = doc.to_dict()
+        d = data.get("date")
+        amount_kop = doc_kopiykas(data)
+        row = {
+            "id": doc.id,
+            "date": d.date() if isinstance(d, datetime) else d,
+            "description": data.get("description") or "",
+            "amount_kop": amount_kop,
+            "amount": format_kopiykas(amount_kop),
+        }
+        if collection == "incomes":
+            row["source"] = data.get("source") or "manual"
+        else:
+            row["category"] = data.get("category") or ""
+        yield row
+
+
+def _cell_text(value) -> str:
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    return "" if value is None else str(value)
+
+
+def stream_csv(rows, collection: str, flush_every: int = PAGE_SIZE):
+    columns = COLUMNS[collection]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # BOM — щоб Excel відкрив UTF-8 з кирилицею
+    buf.write("\ufeff")
+    writer.writerow([title for title, _ in columns])
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_cell_text(row[key]) for _, key in columns])
+        if n % flush_every == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def stream_jsonl(rows):
+    chunk: list[str] = []
+    for row in rows:
+        item = {k: v for k, v in row.items() if k != "amount_kop"}
+        item["amount"] = float(row["amount"])
+        item["amount_kop"] = row["amount_kop"]
+        item["date"] = row["date"].isoformat() if isinstance(row["date"], date) else row["date"]
+        chunk.append(json.dumps(item, ensure_ascii=False))
+        if len(chunk) >= PAGE_SIZE:
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+
+class ZipStream:
+    """Неперемотуваний потік для zipfile: накопичує записане, генератор періодично забирає."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value, numeric: bool = False) -> str:
+    if numeric:
+        return f'<c t="n"><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub("", _cell_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(rows, collection: str, sheet_name: str = "Журнал"):
+    """Мінімальний XLSX (inline-рядки, без стилів), аркуш пишеться потоково в zip."""
+    columns = COLUMNS[collection]
+    sink = ZipStream()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC.items():
+            zf.writestr(name, content)
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(("<row>" + "".join(_xlsx_cell(title) for title, _ in columns) + "</row>").encode("utf-8"))
+            for n, row in enumerate(rows, 1):
+                cells = "".join(_xlsx_cell(row[key], numeric=(key == "amount")) for _, key in columns)
+                sheet.write(f"<row>{cells}</row>".encode("utf-8"))
+                if n % PAGE_SIZE == 0:
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+# --- PDF «Книга обліку доходів» ---
+
+BOOK_ROWS_PER_PAGE = 40
+# A4 у пунктах, поле, висота рядка таблиці
+BOOK_PAGE_SIZE = (595.28, 841.89)
+BOOK_MARGIN = 34
+BOOK_ROW_HEIGHT = 16
+
+
+def _book_chunks(rows):
+    """(рядки сторінки, номер сторінки, № першого рядка); порожній журнал — одна порожня сторінка."""
+    page: list[dict] = []
+    page_no, start_no = 1, 1
+    for row in rows:
+        page.append(row)
+        if len(page) == BOOK_ROWS_PER_PAGE:
+            yield page, page_no, start_no
+            start_no += len(page)
+            page_no += 1
+            page = []
+    if page or page_no == 1:
+        yield page, page_no, start_no
+
+
+def _book_page(pdf, rows: list[dict], page_no: int, start_no: int, carried_kop: int, title: str, owner: str) -> int:
+    width, height = BOOK_PAGE_SIZE
+    margin, row_h = BOOK_MARGIN, BOOK_ROW_HEIGHT
+
+    y = height - margin - 14
+    pdf.setFont("bold", 14)
+    pdf.drawString(margin, y, title)
+    y -= 20
+    if owner:
+        pdf.setFont("regular", 8.5)
+        pdf.drawString(margin, y, owner)
+        y -= 14
+
+    # № | Дата | Зміст операції | Сума доходу — y тут і далі: низ рядка
+    cols = [margin, margin + 38, margin + 106, width - margin - 106, width - margin]
+    headers = ["№", "Дата", "Зміст операції", "Сума доходу, грн"]
+    y -= row_h
+    pdf.setLineWidth(1)
+    pdf.rect(cols[0], y, cols[-1] - cols[0], row_h)
+    pdf.setFont("bold", 8.5)
+    for i, text in enumerate(headers):
+        pdf.drawString(cols[i] + 4, y + 5, text)
+
+    page_kop = 0
+    pdf.setLineWidth(0.5)
+    pdf.setFont("regular", 8.5)
+    for offset, row in enumerate(rows):
+        y -= row_h
+        pdf.rect(cols[0], y, cols[-1] - cols[0], row_h)
+        for x in cols[1:-1]:
+            pdf.line(x, y, x, y + row_h)
+        description = row["description"]
+        while description and pdf.stringWidth(description, "regular", 8.5) > cols[3] - cols[2] - 8:
+            description = description[:-2] + "…" if len(description) > 2 else ""
+        pdf.drawString(cols[0] + 4, y + 5, str(start_no + offset))
+        pdf.drawString(cols[1] + 4, y + 5, _cell_text(row["date"]))
+        pdf.drawString(cols[2] + 4, y + 5, description)
+        pdf.drawRightString(cols[4] - 4, y + 5, row["amount"])
+        page_kop += row["amount_kop"]
+
+    total_kop = carried_kop + page_kop
+    y -= 8
+    pdf.setFont("bold", 8.5)
+    for label, kop in (("Разом на сторінці:", page_kop), ("Разом з початку періоду:", total_kop)):
+        y -= 13
+        pdf.drawString(cols[2] + 4, y, label)
+        pdf.drawRightString(cols[4] - 4, y, format_kopiykas(kop))
+
+    pdf.setFont("regular", 8.5)
+    pdf.drawRightString(width - margin, margin, f"Сторінка {page_no}")
+    return total_kop
+
+
+def stream_income_book(rows, title: str = "Книга обліку доходів", owner: str = ""):
+    """
+    Книга векторним текстом (services/pdf_stream.py): кожна сторінка на 40 рядків віддається
+    одразу після малювання, тож пам'ять не залежить від розміру журналу, а текст виділяється
+    й шукається. Шрифт (DejaVu з кирилицею) вбудовується підмножиною в кінці файлу.
+    """
+    faces = {"regular": fonts.font_path(), "bold": fonts.font_path(bold=True)}
+    if None in faces.values():
+        raise RuntimeError("Не знайдено TTF-шрифт з кирилицею для книги обліку доходів")
+    # Шрифти перевіряються до першого байта відповіді, сторінки — вже в генераторі
+    return _iter_book(StreamingPDF(BOOK_PAGE_SIZE, faces, title=title), rows, title, owner)
+
+
+def _iter_book(pdf: StreamingPDF, rows, title: str, owner: str):
+    yield pdf.header()
+    total_kop = 0
+    for chunk, page_no, start_no in _book_chunks(rows):
+        page = pdf.page()
+        total_kop = _book_page(page, chunk, page_no, start_no, total_kop, title, owner)
+        yield pdf.finish_page(page)
+    yield pdf.close()
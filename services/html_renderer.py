@@ -0,0 +1,74 @@
+# services/html_renderer.py
+"""
+HTML -> PDF через WeasyPrint.
+
+Найдорожче у WeasyPrint — імпорт (pango/cairo, fontconfig) і розбір CSS зі шрифтами,
+тож вони робляться один раз на процес (_engine) і тримаються в прогрітих процесах пулу
+рендеру (services/render_pool.py). Шаблони — з core.templates (Jinja кешує скомпільовані).
+
+Якщо WeasyPrint не встановлено або немає системних бібліотек (pango), available() —
+False, і PDFService.html_to_pdf повертається до растрового фолбеку.
+"""
+from functools import lru_cache
+
+from core import fonts
+from core.config import settings
+from core.templates import TEMPLATES_DIR
+from core.templates import env as templates_env
+
+# Оцінка пам'яті одного HTML-рендеру (дерево розмітки, шрифти, вихідний PDF)
+ESTIMATED_RENDER_BYTES = 64 * 1024 * 1024
+
+
+def _font_face_css() -> str:
+    """@font-face для вбудованого DejaVu Sans: шаблони виглядають однаково на будь-якому сервері."""
+    rules = []
+    for bold in (False, True):
+        path = fonts.font_path(bold)
+        if path is None:
+            continue
+        rules.append(
+            '@font-face { font-family: "DejaVu Sans"; '
+            f'src: url("{path.as_uri()}"); font-weight: {"bold" if bold else "normal"}; }}'
+        )
+    rules.append('body { font-family: "DejaVu Sans", sans-serif; }')
+    return "\n".join(rules)
+
+
+@lru_cache(maxsize=1)
+def _engine() -> tuple:
+    """Імпорт WeasyPrint, конфігурація шрифтів і розібраний базовий CSS — один раз на процес."""
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    stylesheet = CSS(string=_font_face_css(), font_config=font_config)
+    return HTML, stylesheet, font_config
+
+
+@lru_cache(maxsize=1)
+def available() -> bool:
+    if settings.HTML_PDF_BACKEND != "weasyprint":
+        return False
+    try:
+        _engine()
+        return True
+    except (ImportError, OSError) as e:
+        print(f"WeasyPrint недоступний, HTML -> PDF через фолбек: {e}")
+        return False
+
+
+def write_pdf(html: str, base_url: str | None = None) -> bytes:
+    HTML, stylesheet, font_config = _engine()
+    document = HTML(string=html, base_url=base_url or str(TEMPLATES_DIR))
+    return document.write_pdf(stylesheets=[stylesheet], font_config=font_config)
+
+
+def render_template(name: str, context: dict) -> bytes:
+    return write_pdf(templates_env.get_template(name).render(**context))
+
+
+def warm_up() -> None:
+    """Для ініціалізатора процесу пулу: перший макет прогріває кеші шрифтів і розмітки."""
+    if available():
+        write_pdf("<p>FOPilot</p>")
@@ -0,0 +1,208 @@
+# services/idempotency.py
+"""
+Ідемпотентні записи за заголовком Idempotency-Key.
+
+Мобільні клієнти повторюють POST при обриві мережі; повтор з тим самим ключем повертає
+відповідь першого запиту без другого запису у Firestore.
+
+Гарантію дає сам Firestore: запис з ключем отримує детермінований id (record_id — хеш uid
+і ключа) і створюється в транзакції, яка спершу читає цей документ. Повтор на іншому
+воркері чи після рестарту натрапляє на збережений запис (AlreadyStored) і отримує відповідь,
+зібрану з нього. Кеш у пам'яті процесу лише прискорює повтори на тому ж воркері:
+LRU ключів на користувача (IDEMPOTENCY_MAX_KEYS_PER_USER) і LRU користувачів
+(IDEMPOTENCY_MAX_USERS), запис живе IDEMPOTENCY_TTL_SECONDS.
+
+Якщо повтор приходить, поки перший запит ще виконується в цьому ж процесі, він чекає на
+його результат. Той самий ключ з іншим тілом запиту — 422 (відбиток зберігається в записі,
+FINGERPRINT_FIELD).
+
+Для вже накопичених дублікатів — duplicate_report().
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.money import doc_kopiykas, from_kopiykas
+from services import ledger_repository
+
+MAX_KEY_LENGTH = 255
+# Поле запису з відбитком тіла запиту, що його створив
+FINGERPRINT_FIELD = "idempotency_fingerprint"
+# Скільки повтор чекає на перший запит з тим самим ключем
+INFLIGHT_WAIT_SECONDS = 30
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "result", "done", "expires_at", "event")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.result = None
+        self.done = False
+        self.expires_at = float("inf")
+        self.event = threading.Event()
+
+
+class AlreadyStored(Exception):
+    """Запис з id ключа вже є у Firestore: data — його поля (зокрема FINGERPRINT_FIELD)."""
+
+    def __init__(self, doc_id: str, data: dict):
+        super().__init__(doc_id)
+        self.doc_id = doc_id
+        self.data = data
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, OrderedDict[str, _Entry]]" = OrderedDict()
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def record_id(user_uid: str, key: str) -> str:
+    """Id запису для (користувач, ключ); в глобальному розміщенні id спільні, тож uid входить у хеш."""
+    return "idem_" + hashlib.sha256(f"{user_uid}\n{key}".encode("utf-8")).hexdigest()[:40]
+
+
+def _lookup(user_uid: str, key: str) -> _Entry | None:
+    keys = _cache.get(user_uid)
+    if keys is None:
+        return None
+    _cache.move_to_end(user_uid)
+    entry = keys.get(key)
+    if entry is None:
+        return None
+    if entry.done and entry.expires_at < time.monotonic():
+        del keys[key]
+        return None
+    keys.move_to_end(key)
+    return entry
+
+
+def _store(user_uid: str, key: str, entry: _Entry) -> None:
+    keys = _cache.setdefault(user_uid, OrderedDict())
+    _cache.move_to_end(user_uid)
+    keys[key] = entry
+    while len(keys) > settings.IDEMPOTENCY_MAX_KEYS_PER_USER:
+        keys.popitem(last=False)
+    while len(_cache) > settings.IDEMPOTENCY_MAX_USERS:
+        _cache.popitem(last=False)
+
+
+def _discard(user_uid: str, key: str, entry: _Entry) -> None:
+    keys = _cache.get(user_uid)
+    if keys is not None and keys.get(key) is entry:
+        del keys[key]
+
+
+def execute(user_uid: str, key: str | None, request_fingerprint: str, write, respond):
+    """
+    Створює запис один раз на (користувач, ключ). Повертає (відповідь, replayed).
+    write(doc_id) зберігає запис з цим id (None — без ключа, id обирає сервіс) і повертає id;
+    якщо запис уже є, write піднімає AlreadyStored. respond(id) будує відповідь.
+    Якщо write впав — ключ звільняється, повтор виконається заново.
+    """
+    if not key:
+        return respond(write(None)), False
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key задовгий")
+
+    while True:
+        with _lock:
+            entry = _lookup(user_uid, key)
+            owner = entry is None
+            if owner:
+                entry = _Entry(request_fingerprint)
+                _store(user_uid, key, entry)
+        if owner:
+            break
+        if entry.fingerprint != request_fingerprint:
+            raise _fingerprint_mismatch()
+        if not entry.event.wait(timeout=INFLIGHT_WAIT_SECONDS):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Запит з цим Idempotency-Key ще виконується")
+        if entry.done:
+            return entry.result, True
+        # Перший запит впав — пробуємо виконати самі
+
+    replayed = False
+    try:
+        try:
+            doc_id = write(record_id(user_uid, key))
+        except AlreadyStored as stored:
+            if stored.data.get(FINGERPRINT_FIELD) != request_fingerprint:
+                raise _fingerprint_mismatch()
+            doc_id, replayed = stored.doc_id, True
+        result = respond(doc_id)
+    except BaseException:
+        with _lock:
+            _discard(user_uid, key, entry)
+        entry.event.set()
+        raise
+    entry.result = result
+    entry.done = True
+    entry.expires_at = time.monotonic() + settings.IDEMPOTENCY_TTL_SECONDS
+    entry.event.set()
+    return result, replayed
+
+
+def _fingerprint_mismatch() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key вже використано з іншими даними запиту",
+    )
+
+
+def _normalize(text) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def duplicate_report(user_uid: str, collection: str) -> dict:
+    """
+    Групи ймовірних дублікатів серед уже збережених записів: однакові дата (день), сума
+    та опис. Перший запис групи (за id) вважається оригіналом, решта — кандидати на видалення.
+    """
+    query = (
+        ledger_repository.query(collection, user_uid)
+        .select(["amount_kop", "amount", "date", "description", "source"])
+    )
+    groups: dict[tuple, list[tuple[str, dict]]] = {}
+    for doc in query.stream():
+        data = doc.to_dict()
+        d = data.get("date")
+        day = d.date().isoformat() if isinstance(d, datetime) else str(d)
+        key = (day, doc_kopiykas(data), _normalize(data.get("description")))
+        groups.setdefault(key, []).append((doc.id, data))
+
+    report = []
+    duplicate_records = 0
+    excess_kop = 0
+    for (day, amount_kop, _), docs in groups.items():
+        if len(docs) < 2:
+            continue
+        docs.sort(key=lambda item: item[0])
+        extra = len(docs) - 1
+        duplicate_records += extra
+        excess_kop += extra * amount_kop
+        report.append({
+            "date": day,
+            "amount": float(from_kopiykas(amount_kop)),
+            "description": docs[0][1].get("description"),
+            "count": len(docs),
+            "keep_id": docs[0][0],
+            "duplicate_ids": [doc_id for doc_id, _ in docs[1:]],
+            "sources": sorted({data.get("source") or "manual" for _, data in docs}),
+        })
+    report.sort(key=lambda g: (g["date"], -g["count"]))
+    return {
+        "collection": collection,
+        "groups": report,
+        "duplicate_records": duplicate_records,
+        "excess_amount": float(from_kopiykas(excess_kop)),
+    }
@@ -0,0 +1,146 @@
+# services/income_limit.py
+"""
+Контроль граничного річного доходу ФОП.
+
+Ліміт = MIN_WAGE × коефіцієнт групи (167 / 834 / 1167 мінімальних зарплат).
+Сума за рік і місячні суми беруться з income_totals (оновлюються при кожному записі доходу),
+тож залишок ліміту — O(1), а префіксні суми по місяцях — 12 додавань.
+"""
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from core.money import from_kopiykas, to_kopiykas
+from services import auth_service, income_totals
+
+LIMIT_MULTIPLIERS = {1: 167, 2: 834, 3: 1167}
+# Які пороги вже сповіщено: income_limit_alerts/{uid}_{year} -> {"sent": [0.8, ...]}
+ALERTS_COLLECTION = "income_limit_alerts"
+NOTIFICATIONS_COLLECTION = "notifications"
+
+
+def _thresholds() -> list[float]:
+    values = []
+    for raw in settings.INCOME_LIMIT_ALERT_THRESHOLDS.split(","):
+        raw = raw.strip()
+        if raw:
+            values.append(float(raw))
+    return sorted(values)
+
+
+def annual_limit_kop(fop_group: int | None) -> int | None:
+    multiplier = LIMIT_MULTIPLIERS.get(fop_group or 3)
+    if multiplier is None:
+        return None
+    return to_kopiykas(settings.MIN_WAGE) * multiplier
+
+
+def prefix_sums(months: dict | None) -> list[int]:
+    """Накопичений дохід на кінець кожного місяця (12 значень, копійки)."""
+    months = months or {}
+    running = 0
+    result = []
+    for month in range(1, 13):
+        running += int(months.get(f"{month:02d}", 0))
+        result.append(running)
+    return result
+
+
+def build_status(year: int, year_totals: dict | None, fop_group: int | None) -> dict:
+    year_totals = year_totals or {}
+    total_kop = int(year_totals.get("year_total", 0))
+    limit_kop = annual_limit_kop(fop_group)
+    cumulative = prefix_sums(year_totals.get("months"))
+
+    status = {
+        "year": year,
+        "fop_group": fop_group or 3,
+        "total_income": float(from_kopiykas(total_kop)),
+        "cumulative_by_month": [float(from_kopiykas(v)) for v in cumulative],
+        "limit": None,
+        "remaining": None,
+        "used_ratio": None,
+        "exceeded": False,
+    }
+    if limit_kop:
+        status.update({
+            "limit": float(from_kopiykas(limit_kop)),
+            "remaining": float(from_kopiykas(max(limit_kop - total_kop, 0))),
+            "used_ratio": round(total_kop / limit_kop, 4),
+            "exceeded": total_kop > limit_kop,
+        })
+    return status
+
+
+def get_limit_status(user_uid: str, year: int, profile=None) -> dict:
+    if profile is None:
+        profile = auth_service.get_user_profile(user_uid)
+    fop_group = getattr(profile, "fop_group", 3) if profile else 3
+    return build_status(year, income_totals.get_complete_year_totals(user_uid, year), fop_group)
+
+
+def check_thresholds(user_uid: str, years, profile=None) -> list[dict]:
+    """
+    Викликається після запису/видалення доходу. Для кожного порогу, який щойно перетнули,
+    створює подію в notifications; пороги, нижче яких сума знову опустилась, скидаються,
+    щоб повторне перетинання теж сповістило.
+    """
+    years = [y for y in years if y]
+    if not years:
+        return []
+    db = ensure_initialized()
+    if profile is None:
+        profile = auth_service.get_user_profile(user_uid)
+    limit_kop = annual_limit_kop(getattr(profile, "fop_group", 3) if profile else 3)
+    if not limit_kop:
+        return []
+
+    thresholds = _thresholds()
+    emitted: list[dict] = []
+
+    @firestore.transactional
+    def _update(transaction, state_ref, year: int, total_kop: int) -> list[dict]:
+        snap = state_ref.get(transaction=transaction)
+        sent = set((snap.to_dict() or {}).get("sent", [])) if snap.exists else set()
+        crossed = {t for t in thresholds if total_kop >= limit_kop * t}
+        if crossed == sent:
+            return []
+        events = []
+        for threshold in sorted(crossed - sent):
+            event = {
+                "user_uid": user_uid,
+                "type": "income_limit",
+                "year": year,
+                "threshold": threshold,
+                "total_income": float(from_kopiykas(total_kop)),
+                "limit": float(from_kopiykas(limit_kop)),
+                "created_at": datetime.now(timezone.utc),
+                "read": False,
+            }
+            transaction.set(db.collection(NOTIFICATIONS_COLLECTION).document(), event)
+            events.append(event)
+        transaction.set(state_ref, {"user_uid": user_uid, "year": year, "sent": sorted(crossed)})
+        return events
+
+    for year in years:
+        totals = income_totals.get_complete_year_totals(user_uid, year)
+        total_kop = int(totals.get("year_total", 0))
+        state_ref = db.collection(ALERTS_COLLECTION).document(income_totals.totals_doc_id(user_uid, year))
+        events = _update(db.transaction(), state_ref, year, total_kop)
+        for event in events:
+            print(
+                f"[income-limit] {user_uid}: дохід {event['total_income']:.2f} з {event['limit']:.2f} "
+                f"за {year} перетнув поріг {int(event['threshold'] * 100)}%"
+            )
+        emitted.extend(events)
+    return emitted
+
+
+def safe_check_thresholds(user_uid: str, years) -> None:
+    """Перевірка порогів не повинна ламати сам запис доходу."""
+    try:
+        check_thresholds(user_uid, years)
+    except Exception as e:
+        print(f"Не вдалося перевірити ліміт доходу для {user_uid}: {e}")
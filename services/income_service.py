@@ -1,10 +1,10 @@
 from datetime import datetime
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from fastapi import HTTPException, status
-from google.cloud.firestore_v1.base_query import FieldFilter
 
 from core.firebase import ensure_initialized
-from services import auth_service
+from core.money import apply_rate, doc_kopiykas, from_kopiykas
+from services import auth_service, idempotency, income_limit, income_totals, ledger_repository, sync_service, user_stats
 
 
 def _quarter_date_range(year: int, quarter: int) -> tuple[datetime, datetime]:
@@ -24,13 +24,80 @@ def _quarter_date_range(year: int, quarter: int) -> tuple[datetime, datetime]:
     return start, end
 
 
-def _to_money(value: float | int | Decimal) -> Decimal:
-    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+# Записів доходів в одній транзакції (ліміт Firestore — 500 записів, лишаємо запас на агрегати)
+WRITE_CHUNK_SIZE = 400
+
+
+def create_incomes(user_uid: str, items: list[dict], ids: list[str] | None = None) -> list[str]:
+    """
+    Зберігає кілька доходів: на кожні WRITE_CHUNK_SIZE записів — одна транзакція,
+    в якій також один раз оновлюються квартальні суми, лічильник і версії синку.
+    Повертає id документів у порядку items.
+    """
+    # Заданим id (Idempotency-Key) не перезаписуємо наявний запис: create після читання в транзакції
+    write = ledger_repository.create if ids else ledger_repository.set
+    ids = ids or [ledger_repository.document("incomes", user_uid).id for _ in items]
+    chunk_size = WRITE_CHUNK_SIZE // ledger_repository.write_factor()
+    years: set[int] = set()
+    for start in range(0, len(items), chunk_size):
+        chunk = list(zip(items[start:start + chunk_size], ids[start:start + chunk_size]))
+
+        def _write(transaction, allocate, chunk=chunk):
+            if write is ledger_repository.create:
+                refs = [ledger_repository.document("incomes", user_uid, doc_id) for _, doc_id in chunk]
+                for snap in transaction.get_all(refs):
+                    if snap.exists:
+                        raise idempotency.AlreadyStored(snap.id, snap.to_dict())
+            deltas: dict = {}
+            first_version = allocate(len(chunk))
+            for offset, (data, doc_id) in enumerate(chunk):
+                payload = {**data, "user_uid": user_uid, "version": first_version + offset}
+                write(transaction, "incomes", user_uid, doc_id, payload)
+                income_totals.collect_delta(deltas, payload.get("date"), doc_kopiykas(payload))
+            income_totals.write_deltas(transaction, user_uid, deltas)
+            user_stats.increment(transaction, user_uid, "incomes", len(chunk))
+            return deltas
+
+        years |= income_totals.affected_years(sync_service.run_versioned(user_uid, _write))
+    income_limit.safe_check_thresholds(user_uid, years)
+    return ids
+
+
+def create_income(user_uid: str, data: dict, doc_id: str | None = None) -> str:
+    """
+    Зберігає дохід і в тій же транзакції оновлює квартальні суми та версію синку.
+    doc_id — id з Idempotency-Key (idempotency.record_id): якщо запис уже є, нічого не пишеться
+    і піднімається idempotency.AlreadyStored. Повертає id документа.
+    """
+    return create_incomes(user_uid, [data], [doc_id] if doc_id else None)[0]
+
+
+def delete_income(user_uid: str, income_id: str) -> None:
+    doc_ref = ledger_repository.document("incomes", user_uid, income_id)
+
+    def _delete(transaction, allocate):
+        doc = doc_ref.get(transaction=transaction)
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Запис не знайдено")
+
+        data = doc.to_dict()
+        if data.get("user_uid") != user_uid:
+            raise HTTPException(status_code=403, detail="Немає доступу до запису")
+
+        ledger_repository.delete(transaction, "incomes", user_uid, income_id)
+        sync_service.add_tombstone(transaction, user_uid, "incomes", income_id, allocate())
+        user_stats.increment(transaction, user_uid, "incomes", -1)
+        return income_totals.apply_income(transaction, user_uid, data.get("date"), doc_kopiykas(data), sign=-1)
+
+    deltas = sync_service.run_versioned(user_uid, _delete)
+    income_limit.safe_check_thresholds(user_uid, income_totals.affected_years(deltas))
 
 
 async def get_totals_for_quarter(user_uid: str, year: int, quarter: int) -> dict:
     """
     Повертає суму доходів за квартал та розрахований ЄП.
+    Сума береться з агрегату income_totals (одне читання документа).
+    Розрахунок ведеться в цілих копійках; Decimal — лише у відповіді.
     """
     try:
         db = ensure_initialized()
@@ -38,36 +105,22 @@ async def get_totals_for_quarter(user_uid: str, year: int, quarter: int) -> dict
         print(f"Не вдалося ініціалізувати Firestore, повертаю 0: {e}")
         return {"total_income": Decimal("0.00"), "single_tax": Decimal("0.00")}
 
-    start, end = _quarter_date_range(year, quarter)
+    _quarter_date_range(year, quarter)  # валідація кварталу
 
     try:
-        income_query = (
-            db.collection("incomes")
-            .where(filter=FieldFilter("user_uid", "==", user_uid))
-            .stream()
-        )
+        total_kop = income_totals.get_quarter_total_kop(user_uid, year, quarter)
     except Exception as e:
         # Якщо Firestore недоступний, повертаємо нулі, щоб не падати
         print(f"Не вдалося отримати доходи, повертаю 0: {e}")
         return {"total_income": Decimal("0.00"), "single_tax": Decimal("0.00")}
 
-    total_income = Decimal("0.00")
-    for doc in income_query:
-        amount = doc.to_dict().get("amount", 0)
-        date_val = doc.to_dict().get("date")
-        if isinstance(date_val, datetime):
-            # Приводимо таймзону до naive, щоб уникнути порівняння aware/naive
-            if date_val.tzinfo:
-                date_val = date_val.replace(tzinfo=None)
-            if not (start <= date_val < end):
-                continue
-        total_income += _to_money(amount)
-
     profile = auth_service.get_user_profile(user_uid)
-    tax_rate = Decimal(str(profile.tax_rate)) if profile and profile.tax_rate else Decimal("0.05")
-    single_tax = (total_income * tax_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    tax_rate = profile.tax_rate if profile and profile.tax_rate else 0.05
+    single_tax_kop = apply_rate(total_kop, tax_rate)
 
     return {
-        "total_income": total_income,
-        "single_tax": single_tax,
+        "total_income": from_kopiykas(total_kop),
+        "single_tax": from_kopiykas(single_tax_kop),
+        "total_income_kop": total_kop,
+        "single_tax_kop": single_tax_kop,
     }
@@ -0,0 +1,220 @@
+# services/income_totals.py
+"""
+Накопичувальні суми доходів по кварталах: income_totals/{uid}_{year}.
+
+Документ року:
+    {"user_uid": ..., "year": 2025, "year_total": <копійки>,
+     "quarters": {"1": <копійки>, ...}, "counts": {"1": <кількість записів>, ...},
+     "months": {"01": <копійки>, ..., "12": ...}, "complete": true}
+
+Місячні суми дають префіксні суми року за 12 кроків, year_total — залишок ліміту за O(1)
+(див. services/income_limit.py).
+
+Оновлюється в тому ж batch/transaction, що й сам дохід (firestore.Increment),
+тож префіл декларації — одне читання документа замість скану всіх доходів.
+complete ставить лише перебудова: документ, створений інкрементами до неї (перший запис
+після деплою, новий користувач чи новий рік), містить тільки частину доходів року.
+Читачі беруть суми через get_complete_year_totals: неповний документ перебудовується
+одразу, в транзакції користувача, — один скан доходів на користувача й рік, далі
+інкременти лягають уже на повний документ (як лінивий перерахунок у services/user_stats.py).
+
+Перебудова (backfill) з наявних доходів:
+    python -m services.income_totals rebuild [--user UID]
+"""
+import argparse
+from datetime import datetime
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.firebase import ensure_initialized
+from core.money import doc_kopiykas
+from services import ledger_repository
+
+COLLECTION = "income_totals"
+# Позначка документа року, перерахованого з усіх доходів (rebuild)
+COMPLETE_FIELD = "complete"
+
+
+def totals_doc_id(user_uid: str, year: int) -> str:
+    return f"{user_uid}_{year}"
+
+
+def income_period(date_val) -> tuple[int, int] | None:
+    """(рік, місяць) для дати доходу; None, якщо дата відсутня/некоректна."""
+    if isinstance(date_val, str):
+        try:
+            date_val = datetime.fromisoformat(date_val)
+        except ValueError:
+            return None
+    if not hasattr(date_val, "year") or not hasattr(date_val, "month"):
+        return None
+    return date_val.year, date_val.month
+
+
+def _year_payload(user_uid: str, year: int, deltas: dict, wrap) -> dict:
+    """Збирає документ року з {місяць: [копійки, кількість]}; wrap = Increment або identity."""
+    quarters: dict[str, int] = {}
+    counts: dict[str, int] = {}
+    months: dict[str, int] = {}
+    total = 0
+    for month, (kop, count) in deltas.items():
+        q = str((month - 1) // 3 + 1)
+        quarters[q] = quarters.get(q, 0) + kop
+        counts[q] = counts.get(q, 0) + count
+        months[f"{month:02d}"] = months.get(f"{month:02d}", 0) + kop
+        total += kop
+    return {
+        "user_uid": user_uid,
+        "year": year,
+        "year_total": wrap(total),
+        "quarters": {k: wrap(v) for k, v in quarters.items()},
+        "counts": {k: wrap(v) for k, v in counts.items()},
+        "months": {k: wrap(v) for k, v in months.items()},
+    }
+
+
+def _by_year(deltas: dict) -> dict[int, dict]:
+    grouped: dict[int, dict] = {}
+    for (year, month), acc in deltas.items():
+        if acc[0] == 0 and acc[1] == 0:
+            continue
+        grouped.setdefault(year, {})[month] = acc
+    return grouped
+
+
+def collect_delta(deltas: dict, date_val, amount_kop: int, sign: int = 1) -> None:
+    """Додає зміну одного доходу в локальний акумулятор {(рік, місяць): [копійки, кількість]}."""
+    period = income_period(date_val)
+    if period is None:
+        return
+    acc = deltas.setdefault(period, [0, 0])
+    acc[0] += sign * amount_kop
+    acc[1] += sign
+
+
+def write_deltas(writer, user_uid: str, deltas: dict) -> None:
+    """
+    Записує накопичені зміни одним set(merge) на кожен рік.
+    writer — WriteBatch або Transaction: зміна сум комітиться атомарно разом з доходами.
+    """
+    db = ensure_initialized()
+    for year, months in _by_year(deltas).items():
+        ref = db.collection(COLLECTION).document(totals_doc_id(user_uid, year))
+        writer.set(ref, _year_payload(user_uid, year, months, firestore.Increment), merge=True)
+
+
+def affected_years(deltas: dict) -> set[int]:
+    return set(_by_year(deltas))
+
+
+def apply_income(writer, user_uid: str, date_val, amount_kop: int, sign: int = 1) -> dict:
+    deltas: dict = {}
+    collect_delta(deltas, date_val, amount_kop, sign)
+    write_deltas(writer, user_uid, deltas)
+    return deltas
+
+
+def get_year_totals(user_uid: str, year: int) -> dict | None:
+    db = ensure_initialized()
+    snap = db.collection(COLLECTION).document(totals_doc_id(user_uid, year)).get()
+    return snap.to_dict() if snap.exists else None
+
+
+def is_complete(totals: dict | None) -> bool:
+    return bool(totals and totals.get(COMPLETE_FIELD))
+
+
+def get_complete_year_totals(user_uid: str, year: int) -> dict:
+    """Повний документ року; якщо його немає або він неповний — перебудовує доходи користувача."""
+    return ensure_complete(user_uid, year, get_year_totals(user_uid, year))
+
+
+def ensure_complete(user_uid: str, year: int, totals: dict | None) -> dict:
+    """Вже прочитаний документ року, якщо він повний; інакше — результат rebuild_user."""
+    if is_complete(totals):
+        return totals
+    return rebuild_user(user_uid, [year])[year]
+
+
+def get_quarter_total_kop(user_uid: str, year: int, quarter: int) -> int:
+    """Сума доходів за квартал у копійках."""
+    quarters = get_complete_year_totals(user_uid, year).get("quarters") or {}
+    return int(quarters.get(str(quarter), 0))
+
+
+def rebuild_user(user_uid: str, years=()) -> dict[int, dict]:
+    """
+    Перераховує агрегати користувача з його доходів в одній транзакції: доходи й наявні
+    документи читаються через неї, тож дохід, записаний між читанням і записом, змушує
+    Firestore повторити перебудову замість того, щоб загубитись.
+    years — роки, для яких потрібен повний документ навіть без доходів (нульові суми).
+    Повертає {рік: документ}.
+    """
+    db = ensure_initialized()
+    incomes = ledger_repository.query("incomes", user_uid)
+    existing = db.collection(COLLECTION).where(filter=FieldFilter("user_uid", "==", user_uid))
+
+    @firestore.transactional
+    def _rebuild(transaction) -> dict[int, dict]:
+        deltas: dict = {}
+        for doc in transaction.get(incomes):
+            data = doc.to_dict()
+            collect_delta(deltas, data.get("date"), doc_kopiykas(data))
+        stale_refs = [doc.reference for doc in transaction.get(existing)]
+
+        by_year = _by_year(deltas)
+        for year in years:
+            by_year.setdefault(year, {})
+        docs = {}
+        for year, months in by_year.items():
+            payload = _year_payload(user_uid, year, months, lambda v: v)
+            payload[COMPLETE_FIELD] = True
+            transaction.set(db.collection(COLLECTION).document(totals_doc_id(user_uid, year)), payload)
+            docs[year] = payload
+        kept = {totals_doc_id(user_uid, year) for year in docs}
+        for ref in stale_refs:
+            if ref.id not in kept:
+                transaction.delete(ref)
+        return docs
+
+    return _rebuild(db.transaction())
+
+
+def rebuild(user_uid: str | None = None) -> int:
+    """
+    Перераховує агрегати з колекції incomes: кожен користувач — окремою транзакцією
+    rebuild_user, тож запускати можна й під час активних записів.
+    """
+    if user_uid:
+        return len(rebuild_user(user_uid))
+
+    db = ensure_initialized()
+    users: set[str] = set()
+    for source in ledger_repository.read_collections("incomes"):
+        for doc in source.select(["user_uid"]).stream():
+            uid = doc.to_dict().get("user_uid")
+            if uid:
+                users.add(uid)
+    # Агрегати користувачів, у яких доходів уже немає, теж прибираються
+    for doc in db.collection(COLLECTION).select(["user_uid"]).stream():
+        uid = doc.to_dict().get("user_uid")
+        if uid:
+            users.add(uid)
+
+    written = 0
+    for uid in sorted(users):
+        written += len(rebuild_user(uid))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Агрегати доходів по кварталах")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="перебудувати income_totals з колекції incomes")
+    rebuild_cmd.add_argument("--user", help="лише для одного користувача (uid)")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        count = rebuild(args.user)
+        print(f"Перебудовано документів income_totals: {count}")
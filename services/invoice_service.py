@@ -0,0 +1,146 @@
+# services/invoice_service.py
+"""
+Інвойси клієнтам (колекція clients): нумерація, рендер і збереження через DocumentService
+з типом invoice.
+
+Номери — «{рік}-{NNNN}», окремий лічильник на користувача й рік: invoice_sequences/{uid}_{рік}.
+Пачка з N інвойсів резервує N номерів однією транзакцією — лічильник змінюється раз на
+запит, а не на інвойс, і користувачі не конкурують за спільний документ. Номери видаються до
+рендеру: якщо рендер пачки не вдався, вони лишаються пропуском у нумерації.
+
+Клієнти пачки читаються одним get_all, PDF — у пулі рендеру (render_pool.render_invoices,
+бекенд settings.INVOICE_RENDERER), частинами за кількістю процесів.
+"""
+import asyncio
+from datetime import date
+
+from fastapi import HTTPException, status
+from firebase_admin import firestore
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from core.money import format_kopiykas, to_kopiykas
+from services import auth_service, ledger_repository, render_pool
+from services.document_service import DocumentService
+
+SEQUENCES_COLLECTION = "invoice_sequences"
+
+
+def format_number(year: int, sequence: int) -> str:
+    return f"{year}-{sequence:04d}"
+
+
+def allocate_numbers(user_uid: str, year: int, count: int) -> list[str]:
+    """count послідовних номерів за рік однією транзакцією."""
+    db = ensure_initialized()
+    ref = db.collection(SEQUENCES_COLLECTION).document(f"{user_uid}_{year}")
+
+    @firestore.transactional
+    def _allocate(transaction):
+        snap = ref.get(transaction=transaction)
+        last = int((snap.to_dict() or {}).get("last", 0)) if snap.exists else 0
+        transaction.set(ref, {"user_uid": user_uid, "year": year, "last": last + count})
+        return last + 1
+
+    first = _allocate(db.transaction())
+    return [format_number(year, sequence) for sequence in range(first, first + count)]
+
+
+def _load_clients(user_uid: str, client_ids: list[str]) -> dict[str, dict]:
+    """Клієнти користувача одним get_all; 404, якщо якогось немає."""
+    db = ensure_initialized()
+    refs = [ledger_repository.document("clients", user_uid, client_id) for client_id in dict.fromkeys(client_ids)]
+    clients = {}
+    for snap in db.get_all(refs):
+        data = snap.to_dict() if snap.exists else None
+        if data and data.get("user_uid") == user_uid:
+            clients[snap.id] = data
+    missing = [client_id for client_id in client_ids if client_id not in clients]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Клієнта не знайдено: {', '.join(dict.fromkeys(missing))}",
+        )
+    return clients
+
+
+def _fop_name(user_uid: str) -> str:
+    try:
+        profile = auth_service.get_user_profile(user_uid)
+    except Exception as e:
+        print(f"Не вдалося отримати профіль користувача {user_uid}: {e}")
+        return ""
+    if not profile:
+        return ""
+    return " ".join(p for p in (profile.last_name, profile.first_name, profile.middle_name) if p)
+
+
+def _store_invoices(user_uid: str, invoices: list[dict], pdfs: list[bytes]) -> list[dict]:
+    """Файли пишуться по одному, метадані всієї пачки — одним publish_documents."""
+    metas = []
+    for invoice, pdf_bytes in zip(invoices, pdfs):
+        metas.append(DocumentService.write_user_document(
+            user_id=user_uid,
+            doc_type="invoice",
+            pdf_bytes=pdf_bytes,
+            filename=f"invoice_{invoice['number']}.pdf",
+            extra_meta={
+                "invoiceNumber": invoice["number"],
+                "clientId": invoice["client_id"],
+                "clientName": invoice["client_name"],
+                "serviceName": invoice["service_name"],
+                "amountKop": invoice["amount_kop"],
+                "currency": invoice["currency"],
+                "date": invoice["date"],
+            },
+        ))
+    DocumentService.publish_documents(metas)
+    return metas
+
+
+async def generate_invoices(user_uid: str, items: list[dict], invoice_date: date | None = None) -> list[dict]:
+    """
+    Інвойси для кількох клієнтів одним запитом. items — {client_id, service_name, amount, currency}.
+    Повертає метадані збережених документів у порядку items.
+    """
+    if len(items) > settings.INVOICE_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не більше {settings.INVOICE_BATCH_LIMIT} інвойсів за запит",
+        )
+    invoice_date = invoice_date or date.today()
+    try:
+        amounts = [to_kopiykas(item["amount"]) for item in items]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    clients = await asyncio.to_thread(_load_clients, user_uid, [item["client_id"] for item in items])
+    fop_name = await asyncio.to_thread(_fop_name, user_uid)
+    numbers = await asyncio.to_thread(allocate_numbers, user_uid, invoice_date.year, len(items))
+
+    invoices = [
+        {
+            "number": number,
+            "client_id": item["client_id"],
+            "client_name": clients[item["client_id"]].get("name", ""),
+            "service_name": item["service_name"],
+            "amount_kop": amount_kop,
+            "currency": item.get("currency") or "USD",
+            "date": invoice_date.isoformat(),
+        }
+        for item, number, amount_kop in zip(items, numbers, amounts)
+    ]
+    contexts = [
+        {
+            "invoice_number": invoice["number"],
+            "date": invoice_date.strftime("%d.%m.%Y"),
+            "fop_name": fop_name,
+            "client_name": invoice["client_name"],
+            "service_name": invoice["service_name"],
+            "amount": format_kopiykas(invoice["amount_kop"]),
+            "currency": invoice["currency"],
+        }
+        for invoice in invoices
+    ]
+    pdfs = await render_pool.render_invoices(contexts)
+    return await asyncio.to_thread(_store_invoices, user_uid, invoices, pdfs)
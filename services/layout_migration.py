@@ -0,0 +1,134 @@
+# services/layout_migration.py
+"""
+Онлайн-перенесення записів з глобальних колекцій у підколекції users/{uid}/...
+(див. services/ledger_repository.py).
+
+Порядок переходу:
+    1. DATA_LAYOUT=dual і деплой — нові записи, зміни й видалення пишуться в обидва місця;
+    2. python -m services.layout_migration [--collection incomes] [--batch 200]
+       — копіює наявні документи пачками; кожна пачка — транзакція, яка перечитує документи
+       і разом з копіями записує чекпоінт у layout_migrations/{колекція}. Перерваний запуск
+       продовжується з чекпоінта (--reset — почати спочатку);
+    3. python -m services.layout_migration --verify — кількість документів збігається;
+    4. DATA_LAYOUT=user і деплой. Глобальні колекції можна видалити пізніше.
+
+Транзакція перечитує документи пачки, тож конкурентна зміна (вона вже пишеться в обидва
+місця) або повторить пачку, або закомітиться після копії — старі дані не перезапишуть нові.
+"""
+import argparse
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from services import ledger_repository
+
+CHECKPOINTS_COLLECTION = "layout_migrations"
+COLLECTIONS = tuple(ledger_repository.OWNER_FIELDS)
+# Документів у транзакції (ліміт Firestore — 500 записів, +1 на чекпоінт)
+BATCH_SIZE = 200
+
+
+def _load_checkpoint(db, name: str) -> dict:
+    snap = db.collection(CHECKPOINTS_COLLECTION).document(name).get()
+    return snap.to_dict() if snap.exists else {}
+
+
+def migrate_collection(name: str, batch_size: int = BATCH_SIZE, reset: bool = False, dry_run: bool = False) -> dict:
+    db = ensure_initialized()
+    owner_field = ledger_repository.OWNER_FIELDS[name]
+    source = db.collection(name)
+    checkpoint_ref = db.collection(CHECKPOINTS_COLLECTION).document(name)
+    checkpoint = {} if reset else _load_checkpoint(db, name)
+    stats = {
+        "collection": name,
+        "copied": int(checkpoint.get("copied", 0)),
+        "orphans": int(checkpoint.get("orphans", 0)),
+        "last_id": checkpoint.get("last_id"),
+    }
+    if checkpoint.get("done") and not reset:
+        stats["done"] = True
+        return stats
+
+    while True:
+        query = source.order_by("__name__").limit(batch_size)
+        if stats["last_id"]:
+            query = query.where(filter=FieldFilter("__name__", ">", source.document(stats["last_id"])))
+        refs = [doc.reference for doc in query.select([]).stream()]
+        if not refs:
+            break
+
+        @firestore.transactional
+        def _copy(transaction, refs=refs):
+            copied = orphans = 0
+            writes = []
+            for snap in transaction.get_all(refs):
+                if not snap.exists:
+                    continue  # видалено після вибірки (у dual видаляється в обох місцях)
+                data = snap.to_dict() or {}
+                owner = data.get(owner_field)
+                if not owner:
+                    orphans += 1
+                    continue
+                target = db.collection(ledger_repository.USERS_COLLECTION).document(owner).collection(name)
+                writes.append((target.document(snap.id), data))
+                copied += 1
+            if dry_run:
+                return copied, orphans
+            for target_ref, data in writes:
+                transaction.set(target_ref, data)
+            transaction.set(checkpoint_ref, {
+                "last_id": refs[-1].id,
+                "copied": stats["copied"] + copied,
+                "orphans": stats["orphans"] + orphans,
+                "done": False,
+                "updated_at": datetime.now(timezone.utc),
+            })
+            return copied, orphans
+
+        copied, orphans = _copy(db.transaction())
+        stats["copied"] += copied
+        stats["orphans"] += orphans
+        stats["last_id"] = refs[-1].id
+        print(f"[layout-migration] {name}: скопійовано {stats['copied']}, до {stats['last_id']}")
+
+    if not dry_run:
+        checkpoint_ref.set({"done": True, "updated_at": datetime.now(timezone.utc)}, merge=True)
+    stats["done"] = True
+    return stats
+
+
+def _count(query) -> int:
+    return int(query.count().get()[0][0].value)
+
+
+def verify_collection(name: str) -> dict:
+    """Кількість документів у глобальній колекції та сумарно в підколекціях користувачів."""
+    db = ensure_initialized()
+    global_count = _count(db.collection(name))
+    # collection_group охоплює і глобальну колекцію з тим самим id
+    user_count = _count(db.collection_group(name)) - global_count
+    return {"collection": name, "global": global_count, "user": user_count, "match": global_count == user_count}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенесення записів у підколекції users/{uid}/...")
+    parser.add_argument("--collection", choices=COLLECTIONS, help="лише одна колекція")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="документів у транзакції (до 499)")
+    parser.add_argument("--reset", action="store_true", help="ігнорувати чекпоінт і почати спочатку")
+    parser.add_argument("--dry-run", action="store_true", help="лише порахувати, без запису")
+    parser.add_argument("--verify", action="store_true", help="порівняти кількість документів")
+    args = parser.parse_args()
+
+    if not 1 <= args.batch <= 499:
+        parser.error("--batch має бути в межах 1..499")
+    if not (args.verify or args.dry_run) and settings.DATA_LAYOUT != "dual":
+        parser.error("копіювання запускається при DATA_LAYOUT=dual, інакше зміни під час міграції загубляться")
+
+    for collection in [args.collection] if args.collection else COLLECTIONS:
+        if args.verify:
+            print(verify_collection(collection))
+        else:
+            print(migrate_collection(collection, batch_size=args.batch, reset=args.reset, dry_run=args.dry_run))
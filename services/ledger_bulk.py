@@ -0,0 +1,146 @@
+# services/ledger_bulk.py
+"""
+Масове видалення й редагування доходів/витрат.
+
+Цілі задаються списком id (до MAX_IDS) або діапазоном дат. Записи обробляються пачками
+по WRITE_CHUNK_SIZE: кожна пачка — одна транзакція, в якій документи читаються через
+get_all (перевірка власника), змінюються, а квартальні суми, лічильник статистики й версії
+синку оновлюються один раз на пачку, а не на кожен запис. Перевірка ліміту доходу — один
+раз наприкінці.
+"""
+from datetime import date, datetime, time
+
+from fastapi import HTTPException, status
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.money import doc_kopiykas
+from services import income_limit, income_totals, ledger_repository, sync_service, user_stats
+
+MAX_IDS = 5000
+# Видалення пише документ + надгробок, тож 200 записів = ~400 операцій у транзакції
+WRITE_CHUNK_SIZE = 200
+
+# Колекція -> (лічильник статистики, чи ведуться квартальні суми)
+COLLECTIONS = {
+    "incomes": ("incomes", True),
+    "expenses": ("expenses", False),
+}
+
+
+def _target_refs(collection: str, user_uid: str, ids, date_from: date | None, date_to: date | None):
+    if ids:
+        if len(ids) > MAX_IDS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Не більше {MAX_IDS} id за запит")
+        return [ledger_repository.document(collection, user_uid, doc_id) for doc_id in dict.fromkeys(ids)]
+    if date_from is None and date_to is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вкажіть ids або діапазон дат (date_from / date_to)",
+        )
+    query = ledger_repository.query(collection, user_uid)
+    if date_from:
+        query = query.where(filter=FieldFilter("date", ">=", datetime.combine(date_from, time.min)))
+    if date_to:
+        query = query.where(filter=FieldFilter("date", "<=", datetime.combine(date_to, time.max)))
+    refs = [doc.reference for doc in query.select([]).stream()]
+    if len(refs) > MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Під фільтр потрапляє {len(refs)} записів; максимум {MAX_IDS} за запит",
+        )
+    return refs
+
+
+def _apply(collection: str, user_uid: str, refs: list, change) -> dict:
+    """
+    Проганяє refs пачками. change(transaction, ref, data, version, deltas) робить зміну одного
+    запису і повертає зміну лічильника записів (-1 для видалення, 0 для редагування).
+    """
+    counter, with_totals = COLLECTIONS[collection]
+    result = {"processed": 0, "not_found": [], "forbidden": []}
+    years: set[int] = set()
+
+    chunk_size = WRITE_CHUNK_SIZE // ledger_repository.write_factor()
+    for start in range(0, len(refs), chunk_size):
+        chunk = refs[start:start + chunk_size]
+
+        def _write(transaction, allocate, chunk=chunk):
+            outcome = {"processed": 0, "not_found": [], "forbidden": [], "deltas": {}}
+            owned = []
+            for snap in transaction.get_all(chunk):
+                if not snap.exists:
+                    outcome["not_found"].append(snap.id)
+                elif (snap.to_dict() or {}).get("user_uid") != user_uid:
+                    outcome["forbidden"].append(snap.id)
+                else:
+                    owned.append(snap)
+            if not owned:
+                return outcome
+            first_version = allocate(len(owned))
+            count_delta = 0
+            for offset, snap in enumerate(owned):
+                count_delta += change(transaction, snap.reference, snap.to_dict(), first_version + offset, outcome["deltas"])
+            if with_totals:
+                income_totals.write_deltas(transaction, user_uid, outcome["deltas"])
+            user_stats.increment(transaction, user_uid, counter, count_delta)
+            outcome["processed"] = len(owned)
+            return outcome
+
+        outcome = sync_service.run_versioned(user_uid, _write)
+        result["processed"] += outcome["processed"]
+        result["not_found"] += outcome["not_found"]
+        result["forbidden"] += outcome["forbidden"]
+        years |= income_totals.affected_years(outcome["deltas"])
+
+    if with_totals and years:
+        income_limit.safe_check_thresholds(user_uid, years)
+    return result
+
+
+def bulk_delete(
+    collection: str,
+    user_uid: str,
+    ids: list[str] | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> dict:
+    refs = _target_refs(collection, user_uid, ids, date_from, date_to)
+    _, with_totals = COLLECTIONS[collection]
+
+    def _delete(transaction, ref, data, version, deltas) -> int:
+        ledger_repository.delete(transaction, collection, user_uid, ref.id)
+        sync_service.add_tombstone(transaction, user_uid, collection, ref.id, version)
+        if with_totals:
+            income_totals.collect_delta(deltas, data.get("date"), doc_kopiykas(data), sign=-1)
+        return -1
+
+    result = _apply(collection, user_uid, refs, _delete)
+    return {"deleted": result["processed"], "not_found": result["not_found"], "forbidden": result["forbidden"]}
+
+
+def bulk_update(
+    collection: str,
+    user_uid: str,
+    changes: dict,
+    ids: list[str] | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> dict:
+    """
+    changes — поля документа Firestore (description, date як datetime, amount_kop, ...).
+    """
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Немає полів для зміни")
+    refs = _target_refs(collection, user_uid, ids, date_from, date_to)
+    _, with_totals = COLLECTIONS[collection]
+
+    def _update(transaction, ref, data, version, deltas) -> int:
+        ledger_repository.update(transaction, collection, user_uid, ref.id, {**changes, "version": version})
+        if with_totals and ("amount_kop" in changes or "date" in changes):
+            income_totals.collect_delta(deltas, data.get("date"), doc_kopiykas(data), sign=-1)
+            updated = {**data, **changes}
+            income_totals.collect_delta(deltas, updated.get("date"), doc_kopiykas(updated))
+        return 0
+
+    result = _apply(collection, user_uid, refs, _update)
+    return {"updated": result["processed"], "not_found": result["not_found"], "forbidden": result["forbidden"]}
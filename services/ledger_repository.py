@@ -0,0 +1,127 @@
+# services/ledger_repository.py
+"""
+Доступ до записів користувача (доходи, витрати, клієнти, повідомлення, документи)
+незалежно від розміщення в Firestore (settings.DATA_LAYOUT):
+
+    global — колекції верхнього рівня incomes/... з полем власника user_uid (userId у documents);
+    user   — підколекції users/{uid}/incomes/...: дані користувача в одному діапазоні ключів,
+             запити без фільтра за власником і без композитних індексів;
+    dual   — перехідний режим міграції: читання з global, кожен запис — в обидва місця
+             в тій самій транзакції/батчі.
+
+id документа однаковий в обох розміщеннях. Перенесення даних — services/layout_migration.py.
+"""
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.config import settings
+from core.firebase import ensure_initialized
+
+USERS_COLLECTION = "users"
+# Колекція -> поле власника у глобальному розміщенні
+OWNER_FIELDS = {
+    "incomes": "user_uid",
+    "expenses": "user_uid",
+    "clients": "user_uid",
+    "messages": "user_uid",
+    "documents": "userId",
+}
+
+
+def layout() -> str:
+    return settings.DATA_LAYOUT
+
+
+def write_factor() -> int:
+    """У скільки місць пишеться кожен запис — для розміру пачок у транзакціях (ліміт 500)."""
+    return 2 if layout() == "dual" else 1
+
+
+def _global_collection(db, name: str):
+    return db.collection(name)
+
+
+def _user_collection(db, name: str, user_uid: str):
+    return db.collection(USERS_COLLECTION).document(user_uid).collection(name)
+
+
+def query(name: str, user_uid: str):
+    """Записи користувача для читання (у global — з фільтром за власником)."""
+    db = ensure_initialized()
+    if layout() == "user":
+        return _user_collection(db, name, user_uid)
+    return _global_collection(db, name).where(filter=FieldFilter(OWNER_FIELDS[name], "==", user_uid))
+
+
+def document(name: str, user_uid: str, doc_id: str | None = None):
+    """Документ для читання; без doc_id — новий (id потім передається в set/create)."""
+    db = ensure_initialized()
+    if layout() == "user":
+        collection = _user_collection(db, name, user_uid)
+    else:
+        collection = _global_collection(db, name)
+    return collection.document(doc_id) if doc_id else collection.document()
+
+
+def _write_refs(name: str, user_uid: str, doc_id: str) -> list:
+    """Основний документ і (у dual) його копія в підколекції."""
+    db = ensure_initialized()
+    current = layout()
+    if current == "user":
+        return [_user_collection(db, name, user_uid).document(doc_id)]
+    refs = [_global_collection(db, name).document(doc_id)]
+    if current == "dual":
+        refs.append(_user_collection(db, name, user_uid).document(doc_id))
+    return refs
+
+
+def set(writer, name: str, user_uid: str, doc_id: str, data: dict) -> None:
+    for ref in _write_refs(name, user_uid, doc_id):
+        writer.set(ref, data)
+
+
+def create(writer, name: str, user_uid: str, doc_id: str, data: dict) -> None:
+    """create на основному документі (падає, якщо він уже є); копія пишеться через set."""
+    primary, *mirrors = _write_refs(name, user_uid, doc_id)
+    writer.create(primary, data)
+    for ref in mirrors:
+        writer.set(ref, data)
+
+
+def update(writer, name: str, user_uid: str, doc_id: str, changes: dict) -> None:
+    """
+    update основного документа. Копія оновлюється через set(merge=True): якщо міграція
+    до неї ще не дійшла, вона потім перезапише копію повним документом.
+    """
+    primary, *mirrors = _write_refs(name, user_uid, doc_id)
+    writer.update(primary, changes)
+    for ref in mirrors:
+        writer.set(ref, changes, merge=True)
+
+
+def delete(writer, name: str, user_uid: str, doc_id: str) -> None:
+    for ref in _write_refs(name, user_uid, doc_id):
+        writer.delete(ref)
+
+
+def _user_collections(db, name: str):
+    for user_ref in db.collection(USERS_COLLECTION).list_documents():
+        yield user_ref.collection(name)
+
+
+def read_collections(name: str):
+    """Колекції з записами всіх користувачів, з яких читає поточне розміщення (для CLI-перерахунків)."""
+    db = ensure_initialized()
+    if layout() == "user":
+        yield from _user_collections(db, name)
+    else:
+        yield _global_collection(db, name)
+
+
+def physical_collections(name: str):
+    """Усі фізичні копії записів (у dual — і глобальна, і підколекції) — для міграцій полів."""
+    db = ensure_initialized()
+    current = layout()
+    if current != "user":
+        yield _global_collection(db, name)
+    if current != "global":
+        yield from _user_collections(db, name)
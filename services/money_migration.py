@@ -0,0 +1,85 @@
+# services/money_migration.py
+"""
+Міграція сум доходів/витрат з float amount (гривні) у цілі копійки amount_kop.
+
+Читачі працюють з обома форматами (core.money.doc_kopiykas), тож міграцію можна
+запускати на живій базі; документи, що вже мають amount_kop, пропускаються. Обробляються
+всі фізичні копії записів (services/ledger_repository.py, у DATA_LAYOUT=dual — обидві).
+
+    python -m services.money_migration [--collection incomes] [--drop-float] [--dry-run]
+
+--drop-float прибирає старе поле amount після перенесення (запускати, коли всі
+клієнти вже читають amount_kop).
+"""
+import argparse
+
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+from core.firebase import ensure_initialized
+from core.money import to_kopiykas
+from services import ledger_repository
+
+COLLECTIONS = ("incomes", "expenses")
+PAGE_SIZE = 500
+WRITE_BATCH_SIZE = 400
+
+
+def _iter_pages(collection):
+    last = None
+    while True:
+        query = collection.order_by("__name__").limit(PAGE_SIZE)
+        if last is not None:
+            query = query.start_after(last)
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield from docs
+        last = docs[-1]
+
+
+def migrate_collection(name: str, drop_float: bool = False, dry_run: bool = False) -> dict:
+    db = ensure_initialized()
+    stats = {"collection": name, "scanned": 0, "migrated": 0, "invalid": 0}
+    batch = db.batch()
+    ops = 0
+
+    for collection in ledger_repository.physical_collections(name):
+        for doc in _iter_pages(collection):
+            stats["scanned"] += 1
+            data = doc.to_dict() or {}
+            update = {}
+            if data.get("amount_kop") is None:
+                try:
+                    update["amount_kop"] = to_kopiykas(data.get("amount", 0))
+                except ValueError:
+                    stats["invalid"] += 1
+                    print(f"[money-migration] {name}/{doc.id}: некоректна сума {data.get('amount')!r}, пропускаю")
+                    continue
+            if drop_float and "amount" in data:
+                update["amount"] = DELETE_FIELD
+            if not update:
+                continue
+            stats["migrated"] += 1
+            if dry_run:
+                continue
+            batch.update(doc.reference, update)
+            ops += 1
+            if ops >= WRITE_BATCH_SIZE:
+                batch.commit()
+                batch = db.batch()
+                ops = 0
+
+    if ops:
+        batch.commit()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенесення сум у копійки (amount_kop)")
+    parser.add_argument("--collection", choices=COLLECTIONS, help="лише одна колекція")
+    parser.add_argument("--drop-float", action="store_true", help="видалити старе поле amount")
+    parser.add_argument("--dry-run", action="store_true", help="лише порахувати, без запису")
+    args = parser.parse_args()
+
+    for collection in [args.collection] if args.collection else COLLECTIONS:
+        print(migrate_collection(collection, drop_float=args.drop_float, dry_run=args.dry_run))
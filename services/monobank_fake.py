@@ -0,0 +1,83 @@
+# services/monobank_fake.py
+"""
+Локальний фейковий сервер personal API Монобанку для перевірки синхронізації.
+
+Запуск:
+    uvicorn services.monobank_fake:app --port 8089
+і в .env:
+    MONOBANK_API_URL=http://127.0.0.1:8089
+    MONOBANK_STATEMENT_INTERVAL_SECONDS=1
+"""
+import random
+import time
+from uuid import uuid4
+
+from fastapi import FastAPI, Header, HTTPException
+
+STATEMENT_LIMIT = 500
+RATE_LIMIT_SECONDS = 1.0
+
+app = FastAPI(title="Fake Monobank")
+
+_accounts = [
+    {"id": "fake-fop-uah", "currencyCode": 980, "type": "fop", "balance": 0},
+    {"id": "fake-black-uah", "currencyCode": 980, "type": "black", "balance": 0},
+]
+_transactions: dict[str, list[dict]] = {a["id"]: [] for a in _accounts}
+_last_request: dict[str, float] = {}
+
+
+def _check_rate(token: str | None) -> None:
+    if not token:
+        raise HTTPException(status_code=403, detail="Unknown 'X-Token'")
+    now = time.monotonic()
+    last = _last_request.get(token)
+    if last is not None and now - last < RATE_LIMIT_SECONDS:
+        raise HTTPException(status_code=429, detail="Too many requests")
+    _last_request[token] = now
+
+
+def seed(account: str, count: int, since: int, until: int, credit_ratio: float = 0.6) -> None:
+    """Генерує випадкові транзакції у проміжку [since, until]."""
+    for _ in range(count):
+        credit = random.random() < credit_ratio
+        amount = random.randint(100, 5_000_000)
+        _transactions[account].append({
+            "id": uuid4().hex,
+            "time": random.randint(since, until),
+            "description": "Оплата за послуги" if credit else "Покупка",
+            "amount": amount if credit else -amount,
+            "currencyCode": 980,
+            "hold": False,
+        })
+
+
+@app.post("/_seed")
+def seed_endpoint(account: str = "fake-fop-uah", count: int = 100, days: int = 60):
+    now = int(time.time())
+    seed(account, count, now - days * 24 * 3600, now)
+    return {"account": account, "total": len(_transactions[account])}
+
+
+@app.get("/personal/client-info")
+def client_info(x_token: str | None = Header(default=None)):
+    _check_rate(x_token)
+    return {"clientId": "fake", "name": "ФОП Тестовий", "accounts": _accounts}
+
+
+@app.post("/personal/webhook")
+def set_webhook(payload: dict, x_token: str | None = Header(default=None)):
+    _check_rate(x_token)
+    return {"status": "ok"}
+
+
+@app.get("/personal/statement/{account}/{from_ts}/{to_ts}")
+def statement(account: str, from_ts: int, to_ts: int, x_token: str | None = Header(default=None)):
+    _check_rate(x_token)
+    if account not in _transactions:
+        raise HTTPException(status_code=400, detail="Unknown account")
+    if to_ts - from_ts > 31 * 24 * 3600 + 3600:
+        raise HTTPException(status_code=400, detail="Period must be no more than 31 days")
+    items = [t for t in _transactions[account] if from_ts <= t["time"] <= to_ts]
+    items.sort(key=lambda t: t["time"], reverse=True)
+    return items[:STATEMENT_LIMIT]
@@ -0,0 +1,340 @@
+# services/monobank_sync.py
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+from cryptography.fernet import Fernet, InvalidToken
+from fastapi import HTTPException, status
+from firebase_admin import firestore
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from services import income_limit, income_totals, ledger_repository, sync_service, user_stats
+
+LINKS_COLLECTION = "monobank_links"
+# Токен користувача зберігається лише зашифрованим (Fernet, ключ MONOBANK_TOKEN_KEY)
+TOKEN_FIELD = "token_encrypted"
+# Дати доходів — календарний час України без таймзони, як і в ручно внесених доходах:
+# за ним рахуються квартали (services/income_totals.py)
+KYIV_TZ = ZoneInfo("Europe/Kyiv")
+
+# Монобанк віддає виписку максимум за 31 добу + 1 годину за один запит
+STATEMENT_WINDOW_SECONDS = 31 * 24 * 3600
+# Якщо у вікні більше 500 транзакцій — API повертає лише останні 500
+STATEMENT_PAGE_LIMIT = 500
+# Firestore дозволяє до 500 операцій в одному batch, лишаємо запас під чекпоінт
+WRITE_BATCH_SIZE = 400
+UAH_CODE = 980
+# Транзакції останніх хвилин можуть ще з'являтися у виписці — не закриваємо їх чекпоінтом
+SETTLE_SECONDS = 300
+
+
+class MonobankRateLimited(Exception):
+    pass
+
+
+class _TokenGate:
+    """
+    Черга запитів одного токена: наступний запит не раніше ніж через interval секунд.
+    asyncio.Lock віддає блокування у порядку очікування, тож це FIFO-черга.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def __aenter__(self):
+        await self._lock.acquire()
+        delay = self._next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._next_at = time.monotonic() + self.interval
+        self._lock.release()
+
+
+_gates: dict[str, _TokenGate] = {}
+
+
+def _gate_for(token: str) -> _TokenGate:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    gate = _gates.get(key)
+    if gate is None:
+        gate = _TokenGate(settings.MONOBANK_STATEMENT_INTERVAL_SECONDS)
+        _gates[key] = gate
+    return gate
+
+
+class MonobankPersonalClient:
+    """
+    Мінімальний клієнт personal API Монобанку.
+    Базова адреса береться з MONOBANK_API_URL, тож для локальної перевірки
+    достатньо підняти services/monobank_fake.py і вказати його URL.
+    """
+
+    def __init__(self, token: str, http: httpx.AsyncClient, retries: int = 3):
+        self.token = token
+        self.http = http
+        self.retries = retries
+
+    async def _request(self, method: str, path: str, json: dict | None = None):
+        url = f"{settings.MONOBANK_API_URL.rstrip('/')}{path}"
+        for _ in range(self.retries):
+            async with _gate_for(self.token):
+                resp = await self.http.request(method, url, headers={"X-Token": self.token}, json=json)
+            if resp.status_code == 429:
+                # Лічильник на боці банку ще не скинувся — чекаємо наступного слоту в черзі
+                continue
+            resp.raise_for_status()
+            return resp.json() if resp.content else None
+        raise MonobankRateLimited(f"Monobank rate limit for {path}")
+
+    async def _get(self, path: str):
+        return await self._request("GET", path)
+
+    async def post(self, path: str, payload: dict):
+        return await self._request("POST", path, json=payload)
+
+    async def client_info(self) -> dict:
+        return await self._get("/personal/client-info")
+
+    async def statement(self, account: str, from_ts: int, to_ts: int) -> list[dict]:
+        """
+        Повертає всі транзакції за вікно (не довше 31 доби), дочитуючи сторінки по 500.
+        """
+        items: dict[str, dict] = {}
+        upper = to_ts
+        while True:
+            page = await self._get(f"/personal/statement/{account}/{from_ts}/{upper}")
+            items.update((i["id"], i) for i in page)
+            if len(page) < STATEMENT_PAGE_LIMIT:
+                return list(items.values())
+            # Транзакції відсортовані від новіших; наступна сторінка включає секунду найстарішої
+            # отриманої (у ній можуть бути ще не прочитані), повтори прибирає id
+            oldest = min(int(i["time"]) for i in page)
+            # Уся сторінка в одній секунді — інакше не зрушити; решту цієї секунди API не віддасть
+            upper = oldest if oldest < upper else oldest - 1
+            if upper < from_ts:
+                return list(items.values())
+
+
+def _select_accounts(client_info: dict, wanted: list[str] | None) -> list[str]:
+    accounts = client_info.get("accounts") or []
+    if wanted:
+        known = {a.get("id") for a in accounts}
+        return [a for a in wanted if a in known]
+    fop = [a["id"] for a in accounts if a.get("type") == "fop" and a.get("currencyCode") == UAH_CODE]
+    if fop:
+        return fop
+    return [a["id"] for a in accounts if a.get("currencyCode") == UAH_CODE]
+
+
+def _fernet() -> Fernet:
+    if not settings.MONOBANK_TOKEN_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Шифрування токенів Monobank не налаштовано (MONOBANK_TOKEN_KEY)",
+        )
+    return Fernet(settings.MONOBANK_TOKEN_KEY)
+
+
+def encrypt_token(token: str) -> str:
+    return _fernet().encrypt(token.encode()).decode()
+
+
+def link_token(link: dict) -> str:
+    """
+    Токен підключення з документа monobank_links. Записи, збережені до шифрування,
+    ще містять відкрите поле token — sync_user переписує їх зашифрованими.
+    """
+    if link.get(TOKEN_FIELD):
+        try:
+            return _fernet().decrypt(link[TOKEN_FIELD].encode()).decode()
+        except InvalidToken:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Токен Monobank не розшифровується, підключіть рахунок заново")
+    if link.get("token"):
+        return link["token"]
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Для Monobank не збережено токен, підключіть рахунок заново")
+
+
+def _income_date(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, tz=KYIV_TZ).replace(tzinfo=None)
+
+
+def _income_from_item(user_uid: str, account: str, item: dict) -> dict:
+    return {
+        "amount_kop": int(item["amount"]),
+        "description": item.get("description") or "Надходження Monobank",
+        "date": _income_date(int(item["time"])),
+        "user_uid": user_uid,
+        "source": "monobank",
+        "mono_id": item["id"],
+        "account": account,
+    }
+
+
+def store_credits(db, user_uid: str, account: str, items: list[dict], on_last_batch=None) -> int:
+    """
+    Зберігає вхідні надходження як доходи пачками. Id документа = mono_<id транзакції>;
+    вже імпортовані транзакції (синк + вебхук можуть принести ту саму) пропускаються.
+    Кожна пачка — одна транзакція з версіями синку (services/sync_service.py); наявність
+    документів перевіряється в ній же, тож одночасні синк і вебхук не конфліктують.
+    on_last_batch(writer) дозволяє дописати службові записи атомарно з останньою пачкою.
+    """
+    # dict прибирає повтори всередині пачки (вебхук може доставити подію двічі)
+    credits = list({i["id"]: i for i in items if int(i.get("amount", 0)) > 0}.values())
+    chunk_size = WRITE_BATCH_SIZE // ledger_repository.write_factor()
+    chunks = [credits[i:i + chunk_size] for i in range(0, len(credits), chunk_size)] or [[]]
+    written = 0
+    years: set[int] = set()
+    for idx, chunk in enumerate(chunks):
+        refs = [ledger_repository.document("incomes", user_uid, f"mono_{item['id']}") for item in chunk]
+        is_last = idx == len(chunks) - 1
+
+        def _write(transaction, allocate, chunk=chunk, refs=refs, is_last=is_last):
+            # Читаємо в тій самій транзакції: паралельний запис тієї ж транзакції (синк/вебхук)
+            # змусить Firestore повторити її, а не впасти на create
+            existing = {snap.id for snap in transaction.get_all(refs) if snap.exists} if refs else set()
+            fresh = [(item, ref) for item, ref in zip(chunk, refs) if ref.id not in existing]
+            deltas: dict = {}
+            first_version = allocate(len(fresh)) if fresh else 0
+            for offset, (item, ref) in enumerate(fresh):
+                income = _income_from_item(user_uid, account, item)
+                income["version"] = first_version + offset
+                ledger_repository.create(transaction, "incomes", user_uid, ref.id, income)
+                income_totals.collect_delta(deltas, income["date"], income["amount_kop"])
+            if fresh:
+                income_totals.write_deltas(transaction, user_uid, deltas)
+                user_stats.increment(transaction, user_uid, "incomes", len(fresh))
+            if on_last_batch and is_last:
+                on_last_batch(transaction)
+            return len(fresh), deltas
+
+        if chunk or (on_last_batch and is_last):
+            count, deltas = sync_service.run_versioned(user_uid, _write)
+            written += count
+            years |= income_totals.affected_years(deltas)
+    income_limit.safe_check_thresholds(user_uid, years)
+    return written
+
+
+async def sync_user(user_uid: str, http: httpx.AsyncClient | None = None) -> dict:
+    """
+    Інкрементально підтягує виписку по всіх підключених рахунках користувача
+    і зберігає лише нові вхідні надходження як доходи.
+    """
+    db = ensure_initialized()
+    link_ref = db.collection(LINKS_COLLECTION).document(user_uid)
+    snap = link_ref.get()
+    if not snap.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Monobank не підключено")
+
+    link = snap.to_dict()
+    token = link_token(link)
+    checkpoints: dict = link.get("checkpoints") or {}
+
+    own_http = http is None
+    http = http or httpx.AsyncClient(timeout=30.0)
+    result = {"accounts": {}, "imported": 0}
+    try:
+        client = MonobankPersonalClient(token, http)
+        accounts = _select_accounts(await client.client_info(), link.get("accounts"))
+
+        now = int(time.time())
+        earliest = now - settings.MONOBANK_SYNC_LOOKBACK_DAYS * 24 * 3600
+        for account in accounts:
+            checkpoint = int(checkpoints.get(account) or 0)
+            window_from = max(checkpoint + 1, earliest)
+            imported = 0
+            while window_from <= now:
+                window_to = min(window_from + STATEMENT_WINDOW_SECONDS, now)
+                items = await client.statement(account, window_from, window_to)
+                fresh = [i for i in items if int(i["time"]) > checkpoint]
+                fresh.sort(key=lambda i: int(i["time"]))
+                # Чекпоінт не заходить в останні SETTLE_SECONDS: їх перечитає наступний синк,
+                # уже збережені транзакції відсіє id mono_<id>. Порожнє вікно теж зсуває чекпоінт
+                checkpoint = max(checkpoint, min(window_to, now - SETTLE_SECONDS))
+                imported += store_credits(
+                    db, user_uid, account, fresh,
+                    on_last_batch=lambda batch, acc=account, cp=checkpoint: batch.set(
+                        link_ref, {"checkpoints": {acc: cp}}, merge=True
+                    ),
+                )
+                window_from = window_to + 1
+            result["accounts"][account] = {"imported": imported, "checkpoint": checkpoint}
+            result["imported"] += imported
+    finally:
+        if own_http:
+            await http.aclose()
+
+    summary = {"last_sync_at": datetime.now(timezone.utc), "last_sync_result": result}
+    if link.get("token"):
+        summary.update({TOKEN_FIELD: encrypt_token(token), "token": firestore.DELETE_FIELD})
+    link_ref.set(summary, merge=True)
+    return result
+
+
+async def connect_user(user_uid: str, token: str | None, accounts: list[str] | None) -> dict:
+    """
+    Перевіряє токен користувача запитом client-info і зберігає підключення
+    з токеном, зашифрованим MONOBANK_TOKEN_KEY.
+    """
+    if not token:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Потрібен токен Monobank (api.monobank.ua)")
+    encrypted = encrypt_token(token)
+    async with httpx.AsyncClient(timeout=30.0) as http:
+        try:
+            info = await MonobankPersonalClient(token, http).client_info()
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Monobank відхилив токен: {e.response.text}")
+        except MonobankRateLimited:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Monobank: забагато запитів, спробуйте за хвилину")
+
+    selected = _select_accounts(info, accounts)
+    db = ensure_initialized()
+    db.collection(LINKS_COLLECTION).document(user_uid).set(
+        {"user_uid": user_uid, TOKEN_FIELD: encrypted, "token": firestore.DELETE_FIELD, "accounts": selected},
+        merge=True,
+    )
+    # Кеш вебхука тримає список рахунків — після зміни підключення він застарів
+    from services import monobank_webhook
+    monobank_webhook.forget_user(user_uid)
+    return {"accounts": selected, "client_name": info.get("name")}
+
+
+def get_link_status(user_uid: str) -> dict | None:
+    db = ensure_initialized()
+    snap = db.collection(LINKS_COLLECTION).document(user_uid).get()
+    if not snap.exists:
+        return None
+    data = snap.to_dict()
+    data.pop("token", None)
+    data.pop(TOKEN_FIELD, None)
+    return data
+
+
+async def sync_all_users() -> None:
+    """Фонова задача планувальника: синхронізує всіх підключених користувачів."""
+    try:
+        db = ensure_initialized()
+        user_ids = [doc.id for doc in db.collection(LINKS_COLLECTION).stream()]
+    except Exception as e:
+        print(f"Monobank sync: не вдалося прочитати підключення: {e}")
+        return
+
+    async with httpx.AsyncClient(timeout=30.0) as http:
+        async def _one(uid: str):
+            try:
+                result = await sync_user(uid, http=http)
+                print(f"Monobank sync {uid}: імпортовано {result['imported']}")
+            except Exception as e:
+                print(f"Monobank sync {uid} failed: {e}")
+
+        # Різні токени не конкурують між собою; запити одного токена серіалізує _TokenGate
+        await asyncio.gather(*(_one(uid) for uid in user_ids))
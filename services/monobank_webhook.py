@@ -0,0 +1,217 @@
+# services/monobank_webhook.py
+"""
+Вебхук Монобанку: події StatementItem ставляться в чергу, воркер пише їх пачками.
+
+Запис подій не рухає чекпоінт виписки (його зсуває лише sync_user), тож кожна подія,
+яку не вдалося зберегти або яка лишилась у черзі при зупинці, є в наступній синхронізації
+виписки. Для групи, що впала при записі, синк користувача запускається одразу
+(_schedule_resync), решту підбирає періодичний sync_all_users.
+"""
+import asyncio
+import secrets
+import time
+
+import httpx
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.firebase import ensure_initialized
+from services.monobank_sync import (
+    LINKS_COLLECTION,
+    MonobankPersonalClient,
+    MonobankRateLimited,
+    link_token,
+    store_credits,
+    sync_user,
+)
+
+HOOKS_COLLECTION = "monobank_webhooks"
+QUEUE_MAXSIZE = 10_000
+# Скільки подій воркер забирає з черги за один прохід (одна пачка запису в Firestore)
+DRAIN_LIMIT = 200
+
+# Скільки секунд живе запис кешу вебхуків: інші процеси побачать зміну рахунків не пізніше
+HOOKS_CACHE_SECONDS = 300
+
+_queue: asyncio.Queue | None = None
+_worker: asyncio.Task | None = None
+# hook_id -> (user_uid, дозволені рахунки, до коли дійсний); вебхук приходить на кожну транзакцію,
+# тож не читаємо Firestore щоразу
+_hooks_cache: dict[str, tuple[str, set[str], float]] = {}
+# Синки після невдалого запису подій: не більше одного на користувача одночасно
+_resyncs: dict[str, asyncio.Task] = {}
+
+
+def _get_queue() -> asyncio.Queue:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=QUEUE_MAXSIZE)
+    return _queue
+
+
+def _cached_hook(hook_id: str) -> tuple[str, set[str]] | None:
+    cached = _hooks_cache.get(hook_id)
+    if cached is None or cached[2] < time.monotonic():
+        return None
+    return cached[0], cached[1]
+
+
+def forget_user(user_uid: str) -> None:
+    """Скидає кеш вебхуків користувача (після зміни рахунків у connect_user)."""
+    for hook_id in [h for h, cached in _hooks_cache.items() if cached[0] == user_uid]:
+        _hooks_cache.pop(hook_id, None)
+
+
+def resolve_hook(hook_id: str) -> tuple[str, set[str]] | None:
+    cached = _cached_hook(hook_id)
+    if cached:
+        return cached
+    db = ensure_initialized()
+    snap = db.collection(HOOKS_COLLECTION).document(hook_id).get()
+    if not snap.exists:
+        return None
+    user_uid = snap.to_dict().get("user_uid")
+    link = db.collection(LINKS_COLLECTION).document(user_uid).get()
+    accounts = set((link.to_dict() or {}).get("accounts") or []) if link.exists else set()
+    _hooks_cache[hook_id] = (user_uid, accounts, time.monotonic() + HOOKS_CACHE_SECONDS)
+    return user_uid, accounts
+
+
+async def enqueue_event(hook_id: str, payload: dict) -> bool:
+    """
+    Перевіряє подію від Монобанку і ставить її в чергу воркера.
+    Повертає False, якщо подія не стосується доходів (не StatementItem або списання).
+    """
+    hook = _cached_hook(hook_id) or await asyncio.to_thread(resolve_hook, hook_id)
+    if hook is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Невідомий вебхук")
+    user_uid, accounts = hook
+
+    if payload.get("type") != "StatementItem":
+        return False
+    data = payload.get("data") or {}
+    account = data.get("account")
+    item = data.get("statementItem") or {}
+    if not account or not item.get("id") or "time" not in item or "amount" not in item:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некоректна подія StatementItem")
+    if accounts and account not in accounts:
+        return False
+    if int(item["amount"]) <= 0:
+        return False
+
+    try:
+        _get_queue().put_nowait((user_uid, account, item))
+    except asyncio.QueueFull:
+        # Монобанк повторить доставку пізніше
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Черга переповнена")
+    return True
+
+
+def _store_events(events: list[tuple[str, str, dict]]) -> set[str]:
+    """Пише події пачками по (користувач, рахунок); повертає користувачів, чиї події не записались."""
+    db = ensure_initialized()
+    grouped: dict[tuple[str, str], list[dict]] = {}
+    for user_uid, account, item in events:
+        grouped.setdefault((user_uid, account), []).append(item)
+    failed: set[str] = set()
+    for (user_uid, account), items in grouped.items():
+        # Помилка одного користувача не повинна губити події решти пачки
+        try:
+            store_credits(db, user_uid, account, items)
+        except Exception as e:
+            print(f"Monobank webhook: не вдалося зберегти {len(items)} подій {user_uid}/{account}, буде синк виписки: {e}")
+            failed.add(user_uid)
+    return failed
+
+
+async def _resync(user_uid: str) -> None:
+    try:
+        result = await sync_user(user_uid)
+        print(f"Monobank webhook: синк {user_uid} після невдалого запису, імпортовано {result['imported']}")
+    except Exception as e:
+        print(f"Monobank webhook: синк {user_uid} не вдався, лишається періодичний: {e}")
+    finally:
+        _resyncs.pop(user_uid, None)
+
+
+def _schedule_resync(user_uids) -> None:
+    for user_uid in user_uids:
+        if user_uid not in _resyncs:
+            _resyncs[user_uid] = asyncio.get_running_loop().create_task(_resync(user_uid))
+
+
+async def _worker_loop() -> None:
+    queue = _get_queue()
+    while True:
+        events = [await queue.get()]
+        while len(events) < DRAIN_LIMIT:
+            try:
+                events.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            # Клієнт Firestore синхронний — пишемо поза event loop
+            _schedule_resync(await asyncio.to_thread(_store_events, events))
+        except Exception as e:
+            print(f"Monobank webhook worker: не вдалося зберегти {len(events)} подій, буде синк виписки: {e}")
+            _schedule_resync({user_uid for user_uid, _, _ in events})
+        finally:
+            for _ in events:
+                queue.task_done()
+
+
+def start_worker() -> None:
+    global _worker
+    if _worker is None or _worker.done():
+        _worker = asyncio.get_running_loop().create_task(_worker_loop())
+
+
+async def stop_worker() -> None:
+    global _worker
+    if _worker is None:
+        return
+    queue = _get_queue()
+    try:
+        await asyncio.wait_for(queue.join(), timeout=10)
+    except asyncio.TimeoutError:
+        # Ці події підбере наступна синхронізація виписки (чекпоінт їх не пропустив)
+        print(f"Monobank webhook worker: зупинка з {queue.qsize()} подіями в черзі, їх підбере синк виписки")
+    _worker.cancel()
+    _worker = None
+    for task in list(_resyncs.values()):
+        task.cancel()
+
+
+async def register_webhook(user_uid: str) -> dict:
+    """
+    Видає користувачу секретний hook_id і реєструє URL вебхука в Монобанку.
+    Секрет у шляху — єдина перевірка, яку дозволяє personal API (підпису немає).
+    """
+    if not settings.PUBLIC_BASE_URL:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="PUBLIC_BASE_URL не налаштовано")
+
+    db = ensure_initialized()
+    link_ref = db.collection(LINKS_COLLECTION).document(user_uid)
+    snap = link_ref.get()
+    if not snap.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Monobank не підключено")
+    link = snap.to_dict()
+
+    hook_id = secrets.token_urlsafe(24)
+    url = f"{settings.PUBLIC_BASE_URL.rstrip('/')}/api/v1/monobank/webhook/{hook_id}"
+    token = link_token(link)
+
+    db.collection(HOOKS_COLLECTION).document(hook_id).set({"user_uid": user_uid})
+    async with httpx.AsyncClient(timeout=30.0) as http:
+        try:
+            await MonobankPersonalClient(token, http).post("/personal/webhook", {"webHookUrl": url})
+        except (httpx.HTTPStatusError, MonobankRateLimited) as e:
+            db.collection(HOOKS_COLLECTION).document(hook_id).delete()
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Monobank не прийняв вебхук: {e}")
+
+    old_hook = link.get("webhook_id")
+    if old_hook:
+        db.collection(HOOKS_COLLECTION).document(old_hook).delete()
+        _hooks_cache.pop(old_hook, None)
+    link_ref.set({"webhook_id": hook_id}, merge=True)
+    return {"webhook_url": url}
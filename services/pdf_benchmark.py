@@ -0,0 +1,70 @@
+# services/pdf_benchmark.py
+"""
+Замір часу рендеру декларації:
+
+    python -m services.pdf_benchmark [--runs 30]
+
+Порівнює растровий рендер з повним перемальовуванням форми, растровий з кешованим
+статичним шаром (PDFService.declaration_background) у режимах rgb/gray/mono і векторний
+(якщо доступний). Виводить медіану, p95 і розмір PDF для кожного варіанта.
+"""
+import argparse
+import statistics
+import time
+
+from services.pdf_service import PDFService
+
+SAMPLE_CONTEXT = {
+    "full_name": "Шевченко Тарас Григорович",
+    "tax_id": "1234567890",
+    "year": 2025,
+    "quarter": 2,
+    "filled_date": "10.07.2025",
+    "total_income": "482150.37",
+    "single_tax": "24107.52",
+    "esv": "5280.00",
+}
+
+
+def _measure(render, runs: int) -> dict:
+    render()  # прогрів: шрифти, кеші, шаблони
+    timings = []
+    size = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        size = len(render())
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 1),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+        "size_kb": round(size / 1024, 1),
+    }
+
+
+def run(runs: int) -> dict:
+    variants = {
+        "raster_full": lambda: PDFService.render_declaration_flat(SAMPLE_CONTEXT, use_cache=False, mode="rgb"),
+        "raster_cached": lambda: PDFService.render_declaration_flat(SAMPLE_CONTEXT, mode="rgb"),
+        "raster_gray": lambda: PDFService.render_declaration_flat(SAMPLE_CONTEXT, mode="gray"),
+        "raster_mono": lambda: PDFService.render_declaration_flat(SAMPLE_CONTEXT, mode="mono"),
+        "vector": lambda: PDFService.render_declaration_vector(SAMPLE_CONTEXT),
+    }
+    results = {}
+    for name, render in variants.items():
+        try:
+            results[name] = _measure(render, runs)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замір часу рендеру декларації")
+    parser.add_argument("--runs", type=int, default=30, help="кількість рендерів на варіант")
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs має бути додатним")
+
+    for name, result in run(args.runs).items():
+        print(f"{name:>14}: {result}")
@@ -4,9 +4,69 @@ from io import BytesIO
 from datetime import datetime
 from textwrap import wrap
 from pathlib import Path
+from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
+import zlib
 from decimal import Decimal, ROUND_HALF_UP
 from PIL import Image, ImageDraw, ImageFont
 
+from core import fonts
+from core.config import settings
+from core.money import format_kopiykas, to_kopiykas
+from core.templates import TEMPLATES_DIR
+from core.templates import env as templates_env
+from services import html_renderer
+
+# Офіційний бланк декларації 3 групи і координати полів, виміряні за текстом і лініями
+# templates/declaration_3_page*.pdf (tests/test_declaration_vector.py перевіряє рядки):
+# (сторінка, ключ, x мм від лівого краю, базова лінія мм від верху сторінки, вирівнювання по x)
+DECLARATION_TEMPLATE_PAGES = ("declaration_3_page1.pdf", "declaration_3_page2.pdf")
+DECLARATION_FIELDS = (
+    (0, "report_mark", 44.7, 53.4, "center"),    # тип декларації: «звітна»
+    (0, "full_name", 119.0, 87.5, "left"),       # лінія після «повне найменування…»
+    (0, "total_income", 197.8, 162.9, "right"),  # розділ II, рядок 1, графа 4 (5 %)
+    (0, "total_income", 197.8, 185.5, "right"),  # рядок 5 — загальна сума доходу
+    (0, "single_tax", 197.8, 216.7, "right"),    # розділ III, рядок 6
+    (0, "single_tax", 197.8, 223.6, "right"),    # рядок 8
+    (0, "single_tax", 197.8, 244.9, "right"),    # рядок 12 — до сплати
+    (1, "full_name", 75.0, 198.3, "left"),       # над лінією «(власне ім'я та прізвище)» керівника
+)
+# Значення по клітинках, по символу в клітинці від правої межі (крапки дати надруковані на бланку):
+# (сторінка, ключ, права межа мм, базова лінія мм, ширина клітинки мм)
+DECLARATION_CELL_FIELDS = (
+    (0, "year_short", 188.8, 66.1, 4.2),   # «20__ року» — дві останні цифри
+    (0, "tax_id", 198.6, 97.6, 4.2),
+    (1, "filled_date", 67.8, 188.0, 5.6),  # дд.мм.рррр
+    (1, "tax_id", 67.8, 202.3, 5.6),       # РНОКПП керівника
+)
+# Позначка податкового періоду: центр клітинки після «І квартал» / «півріччя» / «три квартали» / «рік»
+DECLARATION_PERIOD_MARKS = {1: 36.3, 2: 61.5, 3: 124.1, 4: 141.6}
+DECLARATION_PERIOD_BASELINE = 66.1
+DECLARATION_FONT_SIZE = 9
+# Ширина графи 4 розділів II–III: довші суми друкуються дрібнішим кеглем, щоб не заходити в графу 3
+DECLARATION_AMOUNT_WIDTH_MM = 12.4
+_MM = 72 / 25.4
+
+# Растрова декларація: A4 @ 300dpi. Версію макета змінювати при будь-якій зміні
+# _draw_declaration_static — від неї залежить ключ кешу статичного шару.
+DECLARATION_RASTER_SIZE = (2480, 3508)
+DECLARATION_LAYOUT_VERSION = "3-group-2025.1"
+RENDER_CACHE_DIR = Path(__file__).resolve().parent.parent / "storage" / "cache"
+# Режими растру (settings.DECLARATION_RASTER_MODE) -> режим Pillow і байтів на піксель полотна.
+# gray і mono малюються одразу в L і пишуться через iter_raster_pdf. Pillow тримає режим "1"
+# по байту на піксель, тож у пам'яті mono = gray; виграш mono — 1 біт на піксель у PDF
+RASTER_MODES = {"rgb": ("RGB", 3), "gray": ("L", 1), "mono": ("1", 1)}
+# Оцінка пам'яті одного векторного рендеру (бланк, оверлей, вихідний PDF)
+VECTOR_RENDER_BYTES = 24 * 1024 * 1024
+# Інвойс (як templates/invoice.html): A4 у пунктах, поля сторінки
+INVOICE_PAGE_SIZE = (595.28, 841.89)
+INVOICE_MARGIN = 50
+# pypdf читає сторінки бланка ліниво зі спільного потоку — копіювання під замком
+_template_lock = threading.Lock()
+
 
 class PDFService:
     @staticmethod
@@ -53,129 +113,259 @@ class PDFService:
 
     @staticmethod
     def html_to_pdf(html: str, base_path: str | None = None, context: dict | None = None) -> bytes:
+        """WeasyPrint (services/html_renderer.py), якщо доступний; інакше — растровий _fallback_pdf."""
+        if html_renderer.available():
+            try:
+                return html_renderer.write_pdf(html, base_url=base_path)
+            except Exception as e:
+                print(f"WeasyPrint не зміг зрендерити HTML, фолбек: {e}")
         return PDFService._fallback_pdf(html, context=context)
 
     @staticmethod
-    def render_declaration_flat(context: dict) -> bytes:
+    def _money(value) -> str:
+        try:
+            return format_kopiykas(to_kopiykas(value))
+        except ValueError:
+            return "0.00"
+
+    @staticmethod
+    def _declaration_values(context: dict) -> dict:
+        period_text = context.get("period_text") or context.get("quarter_text")
+        year = context.get("year") or ""
+        if not period_text:
+            try:
+                quarter = int(context.get("quarter"))
+            except (TypeError, ValueError):
+                quarter = None
+            roman = {1: "I", 2: "II", 3: "III", 4: "IV"}.get(quarter, "")
+            period_text = f"{roman} квартал {year}".strip() if roman else ""
+        return {
+            "full_name": str(context.get("full_name") or ""),
+            "tax_id": str(context.get("tax_id") or ""),
+            "year": str(year),
+            "period_text": str(period_text),
+            "total_income": PDFService._money(context.get("total_income", 0)),
+            "single_tax": PDFService._money(context.get("single_tax", 0)),
+            "filled_date": str(context.get("filled_date") or ""),
+            "year_short": str(year)[-2:],
+            "report_mark": "X",
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _declaration_template() -> list:
+        """Сторінки офіційного бланка, розібрані один раз на процес."""
+        from pypdf import PdfReader
+
+        return [PdfReader(str(TEMPLATES_DIR / name)).pages[0] for name in DECLARATION_TEMPLATE_PAGES]
+
+    @staticmethod
+    @lru_cache(maxsize=2)
+    def _vector_font(bold: bool = False) -> str:
+        """Реєструє TTF з кирилицею в reportlab (вбудовується в PDF підмножиною гліфів)."""
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        path = fonts.font_path(bold)
+        if path is None:
+            raise RuntimeError("Не знайдено TTF-шрифт з кирилицею для векторного PDF")
+        name = "DeclarationSans-Bold" if bold else "DeclarationSans"
+        pdfmetrics.registerFont(TTFont(name, str(path)))
+        return name
+
+    @staticmethod
+    def render_declaration_vector(context: dict) -> bytes:
         """
-        Спрощена, але візуально максимально «офіційна» декларація
-        у вигляді заповненої форми без WeasyPrint (Pillow + текст/таблиці).
+        Декларація на офіційному бланку: значення накладаються векторним текстом поверх
+        сторінок templates/declaration_3_page*.pdf. Текст лишається пошуковим, файл —
+        розміру бланка, без растру.
         """
-        # A4 @ 300dpi
-        width, height = 2480, 3508
-        margin_x, margin_y = 160, 220
+        from pypdf import PdfReader, PdfWriter
+        from reportlab.pdfgen import canvas
 
-        def load_font(size: int, bold: bool = False):
-            try:
-                candidates = []
-                if bold:
-                    candidates += [
-                        Path("/System/Library/Fonts/Supplemental/Arial Unicode.ttf"),
-                        Path("/System/Library/Fonts/Supplemental/Arial Bold.ttf"),
-                        Path("/Library/Fonts/Arial Unicode.ttf"),
-                        Path("/Library/Fonts/Arial Bold.ttf"),
-                    ]
+        pages = PDFService._declaration_template()
+        font = PDFService._vector_font()
+        values = PDFService._declaration_values(context)
+        try:
+            quarter = int(context.get("quarter"))
+        except (TypeError, ValueError):
+            quarter = None
+
+        overlay_buf = BytesIO()
+        overlay = canvas.Canvas(overlay_buf, pagesize=(float(pages[0].mediabox.width), float(pages[0].mediabox.height)))
+        for index, template_page in enumerate(pages):
+            height = float(template_page.mediabox.height)
+            overlay.setPageSize((float(template_page.mediabox.width), height))
+            overlay.setFont(font, DECLARATION_FONT_SIZE)
+            for page_no, key, x_mm, base_mm, align in DECLARATION_FIELDS:
+                text = values.get(key)
+                if page_no != index or not text:
+                    continue
+                baseline = height - base_mm * _MM
+                if align == "right":
+                    width = overlay.stringWidth(text, font, DECLARATION_FONT_SIZE)
+                    size = min(DECLARATION_FONT_SIZE, DECLARATION_FONT_SIZE * DECLARATION_AMOUNT_WIDTH_MM * _MM / width)
+                    overlay.setFont(font, size)
+                    overlay.drawRightString(x_mm * _MM, baseline, text)
+                    overlay.setFont(font, DECLARATION_FONT_SIZE)
+                elif align == "center":
+                    overlay.drawCentredString(x_mm * _MM, baseline, text)
                 else:
-                    candidates += [
-                        Path("/System/Library/Fonts/Supplemental/Arial Unicode.ttf"),
-                        Path("/System/Library/Fonts/Supplemental/Arial.ttf"),
-                        Path("/Library/Fonts/Arial Unicode.ttf"),
-                        Path("/Library/Fonts/Arial.ttf"),
-                    ]
-
-                font_name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
-                candidates += [
-                    Path(ImageFont.__file__).resolve().parent / font_name,
-                    Path(ImageFont.__file__).resolve().parent / "fonts" / font_name,
-                ]
-
-                for p in candidates:
-                    if p.exists():
-                        return ImageFont.truetype(str(p), size)
-                return ImageFont.truetype(font_name, size)
-            except Exception:
-                return ImageFont.load_default()
-
-        font_title = load_font(50, bold=True)
-        font_bold = load_font(42, bold=True)
-        font_regular = load_font(36, bold=False)
-        font_small = load_font(24, bold=False)
-        font_small_bold = load_font(30, bold=True)
-
-        img = Image.new("RGB", (width, height), "white")
-        draw = ImageDraw.Draw(img)
+                    overlay.drawString(x_mm * _MM, baseline, text)
+            for page_no, key, right_mm, base_mm, cell_mm in DECLARATION_CELL_FIELDS:
+                text = values.get(key)
+                if page_no != index or not text:
+                    continue
+                first_mm = right_mm - cell_mm * (len(text) - 0.5)
+                for offset, char in enumerate(text):
+                    if char != ".":
+                        overlay.drawCentredString((first_mm + offset * cell_mm) * _MM, height - base_mm * _MM, char)
+            if index == 0 and quarter in DECLARATION_PERIOD_MARKS:
+                overlay.drawCentredString(
+                    DECLARATION_PERIOD_MARKS[quarter] * _MM, height - DECLARATION_PERIOD_BASELINE * _MM, "X"
+                )
+            overlay.showPage()
+        overlay.save()
+        layers = PdfReader(BytesIO(overlay_buf.getvalue())).pages
+
+        writer = PdfWriter()
+        with _template_lock:
+            for template_page in pages:
+                writer.add_page(template_page)
+        for page, layer in zip(writer.pages, layers):
+            page.merge_page(layer)
 
-        # Внешняя рамка робочої області (як у справжньої форми)
-        frame_x1 = margin_x - 40
-        frame_y1 = margin_y - 80
-        frame_x2 = width - margin_x + 40
-        frame_y2 = height - margin_y + 40
-        draw.rectangle((frame_x1, frame_y1, frame_x2, frame_y2), outline="black", width=2)
+        buf = BytesIO()
+        writer.write(buf)
+        return buf.getvalue()
 
-        def measure(text: str, font) -> tuple[int, int]:
+    @staticmethod
+    def render_declaration(context: dict) -> bytes:
+        """
+        Рендер декларації обраним бекендом (settings.DECLARATION_RENDERER). html без WeasyPrint
+        переходить на векторний; якщо векторний недоступний (немає pypdf/reportlab, шрифту) —
+        растровий render_declaration_flat.
+        """
+        renderer = settings.DECLARATION_RENDERER
+        if renderer == "html":
+            if html_renderer.available():
+                try:
+                    values = PDFService._declaration_values(context)
+                    return html_renderer.render_template(
+                        "declaration_3_group.html", {**values, "quarter_text": values["period_text"]}
+                    )
+                except Exception as e:
+                    print(f"HTML-рендер декларації не вдався, векторний фолбек: {e}")
+            renderer = "vector"
+        if renderer == "vector":
             try:
-                bbox = draw.textbbox((0, 0), text, font=font)
-                return bbox[2] - bbox[0], bbox[3] - bbox[1]
-            except Exception:
-                return font.getsize(text)
+                return PDFService.render_declaration_vector(context)
+            except Exception as e:
+                print(f"Векторний рендер декларації недоступний, растровий фолбек: {e}")
+        return PDFService.render_declaration_flat(context)
 
-        def to_decimal(value) -> Decimal:
-            try:
-                return Decimal(str(value).replace(" ", "").replace(",", "."))
-            except Exception:
-                return Decimal("0.00")
+    @staticmethod
+    def render_invoice_vector(context: dict) -> bytes:
+        """Інвойс векторним текстом (reportlab) — той самий вигляд, що templates/invoice.html, без HTML-рушія."""
+        from reportlab.lib.utils import simpleSplit
+        from reportlab.pdfgen import canvas
+
+        regular = PDFService._vector_font()
+        bold = PDFService._vector_font(bold=True)
+        width, height = INVOICE_PAGE_SIZE
+        left, right = INVOICE_MARGIN, width - INVOICE_MARGIN
 
-        def money(value) -> str:
+        buf = BytesIO()
+        pdf = canvas.Canvas(buf, pagesize=INVOICE_PAGE_SIZE)
+        pdf.setTitle(f"Інвойс № {context.get('invoice_number', '')}")
+        y = height - INVOICE_MARGIN - 24
+        pdf.setFont(bold, 24)
+        pdf.drawString(left, y, f"ІНВОЙС № {context.get('invoice_number', '')}")
+
+        y -= 40
+        pdf.setFont(regular, 12)
+        for label, key in (("Дата:", "date"), ("Виконавець:", "fop_name"), ("Клієнт:", "client_name")):
+            pdf.drawString(left, y, label)
+            pdf.drawRightString(right, y, str(context.get(key) or ""))
+            y -= 22
+        pdf.line(left, y + 8, right, y + 8)
+
+        y -= 20
+        pdf.setFont(bold, 14)
+        pdf.drawString(left, y, "Послуга:")
+        pdf.setFont(regular, 12)
+        for line in simpleSplit(str(context.get("service_name") or ""), regular, 12, right - left):
+            y -= 18
+            pdf.drawString(left, y, line)
+
+        y -= 36
+        pdf.line(left, y + 24, right, y + 24)
+        pdf.setFont(bold, 20)
+        pdf.drawString(left, y, f"До сплати: {context.get('amount', '')} {context.get('currency', '')}")
+        pdf.showPage()
+        pdf.save()
+        return buf.getvalue()
+
+    @staticmethod
+    def render_invoice(context: dict) -> bytes:
+        """
+        Інвойс обраним бекендом (settings.INVOICE_RENDERER): vector — reportlab, найшвидший;
+        html — templates/invoice.html через WeasyPrint, без нього — векторний.
+        """
+        if settings.INVOICE_RENDERER == "html" and html_renderer.available():
             try:
-                dec = to_decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                return format(dec, "f")
-            except Exception:
-                return "0.00"
-
-        # ---- Числові значення ----
-        total_income_val = to_decimal(context.get("total_income", 0))
-        single_tax_val = to_decimal(context.get("single_tax", 0))
-        esv_val = to_decimal(context.get("esv", 0))
-        total_due_val = context.get("total_due")
-        if total_due_val is None:
-            total_due_val = single_tax_val + esv_val
-        else:
-            total_due_val = to_decimal(total_due_val)
+                return html_renderer.render_template("invoice.html", context)
+            except Exception as e:
+                print(f"HTML-рендер інвойсу не вдався, векторний фолбек: {e}")
+        try:
+            return PDFService.render_invoice_vector(context)
+        except Exception as e:
+            print(f"Векторний рендер інвойсу недоступний, фолбек: {e}")
+        return PDFService.html_to_pdf(templates_env.get_template("invoice.html").render(**context))
 
-        total_income = money(total_income_val)
-        single_tax = money(single_tax_val)
-        esv = money(esv_val)
-        total_due = money(total_due_val)
+    @staticmethod
+    def render_invoices(contexts: list[dict]) -> list[bytes]:
+        """Пачка інвойсів в одному процесі пулу (services/render_pool.render_invoices)."""
+        return [PDFService.render_invoice(context) for context in contexts]
 
-        tax_rate = context.get("tax_rate")
-        if tax_rate is None:
-            if total_income_val > 0:
-                try:
-                    rate = (single_tax_val / total_income_val * Decimal("100")).quantize(
-                        Decimal("0.01"), rounding=ROUND_HALF_UP
-                    )
-                    tax_rate = format(rate, "f").rstrip("0").rstrip(".")
-                except Exception:
-                    tax_rate = "5"
-            else:
-                tax_rate = "5"
-        tax_rate_str = str(tax_rate)
+    @staticmethod
+    def estimated_invoice_bytes() -> int:
+        if settings.INVOICE_RENDERER == "html" and html_renderer.available():
+            return html_renderer.ESTIMATED_RENDER_BYTES
+        return VECTOR_RENDER_BYTES
 
-        year = context.get("year", "")
-        quarter_raw = context.get("quarter")
-        try:
-            quarter_int = int(quarter_raw)
-        except (TypeError, ValueError):
-            quarter_int = None
-        quarter_text = context.get("quarter_text")
-        if not quarter_text:
-            roman = {1: "I", 2: "II", 3: "III", 4: "IV"}.get(quarter_int, quarter_raw or "")
-            if year and roman:
-                quarter_text = f"{roman} квартал {year} року"
-            elif roman:
-                quarter_text = f"{roman} квартал"
-            else:
-                quarter_text = ""
+    @staticmethod
+    def _declaration_fonts() -> dict:
+        return {
+            "title": fonts.load(50, bold=True),
+            "bold": fonts.load(42, bold=True),
+            "regular": fonts.load(36, bold=False),
+            "small": fonts.load(24, bold=False),
+            "small_bold": fonts.load(30, bold=True),
+        }
+
+    @staticmethod
+    def _draw_declaration_static(img: Image.Image) -> dict:
+        """
+        Малює незмінну частину растрової декларації (рамка, шапка, заголовки, сітки таблиць,
+        примітки, блок контролюючого органу). Повертає координати змінних полів.
+        """
+        width, height = DECLARATION_RASTER_SIZE
+        margin_x, margin_y = 160, 220
+        faces = PDFService._declaration_fonts()
+        font_title, font_bold = faces["title"], faces["bold"]
+        font_regular, font_small, font_small_bold = faces["regular"], faces["small"], faces["small_bold"]
+
+        draw = ImageDraw.Draw(img)
+        measure = fonts.text_size
+        slots: dict = {}
+
+        # Внешняя рамка робочої області (як у справжньої форми)
+        frame_x1 = margin_x - 40
+        frame_y1 = margin_y - 80
+        frame_x2 = width - margin_x + 40
+        frame_y2 = height - margin_y + 40
+        draw.rectangle((frame_x1, frame_y1, frame_x2, frame_y2), outline="black", width=2)
 
         # ---------------- ШАПКА ----------------
         y = margin_y
@@ -193,7 +383,7 @@ class PDFService:
         sy = stamp_y1 + 28
         for line in stamp_lines:
             draw.text((stamp_x1 + 24, sy), line, fill="black", font=font_small)
-            sy += measure(line, font_small)[1] + 2
+            sy += measure(font_small, line)[1] + 2
 
         # Правий верхній блок "ЗАТВЕРДЖЕНО"
         approved_lines = [
@@ -206,20 +396,20 @@ class PDFService:
         right_block_width = 0
         line_spacing = 4
         for text, font in approved_lines:
-            w, h = measure(text, font)
+            w, h = measure(font, text)
             right_block_width = max(right_block_width, w)
         block_x = width - margin_x - right_block_width
         block_y = stamp_y1
         cur_y = block_y
         for text, font in approved_lines:
-            w, h = measure(text, font)
+            w, h = measure(font, text)
             draw.text((block_x, cur_y), text, fill="black", font=font)
             cur_y += h + line_spacing
         block_bottom = cur_y
 
         # Порядковий № за рік — праворуч під шапкою
         ordinal_label = "Порядковий № за рік*"
-        ow, oh = measure(ordinal_label, font_small)
+        ow, oh = measure(font_small, ordinal_label)
         ordinal_x = width - margin_x - right_block_width
         ordinal_y = block_bottom + 30
         draw.text((ordinal_x, ordinal_y), ordinal_label, fill="black", font=font_small)
@@ -234,10 +424,10 @@ class PDFService:
         title_line2 = "(фізична особа-підприємець)"
         title_y = block_bottom + 130
 
-        tw1, th1 = measure(title_line1, font_title)
+        tw1, th1 = measure(font_title, title_line1)
         draw.text(((width - tw1) / 2, title_y), title_line1, fill="black", font=font_title)
 
-        tw2, th2 = measure(title_line2, font_regular)
+        tw2, th2 = measure(font_regular, title_line2)
         draw.text(((width - tw2) / 2, title_y + th1 + 12), title_line2, fill="black", font=font_regular)
 
         y = title_y + th1 + th2 + 80
@@ -245,7 +435,7 @@ class PDFService:
         # Тип декларації
         type_text = "Тип податкової декларації:"
         draw.text((margin_x, y), type_text, fill="black", font=font_regular)
-        tx, th = measure(type_text, font_regular)
+        tx, th = measure(font_regular, type_text)
         cb_x = margin_x + tx + 30
         cb_size = 40
         cb_gap = 30
@@ -258,7 +448,7 @@ class PDFService:
                 draw.line((x + 8, y_top + 20, x + 18, y_top + 30), fill="black", width=3)
                 draw.line((x + 18, y_top + 30, x + 32, y_top + 10), fill="black", width=3)
             draw.text((x + cb_size + 10, y_top + 4), label, fill="black", font=font_regular)
-            w, _ = measure(label, font_regular)
+            w, _ = measure(font_regular, label)
             cb_x = x + cb_size + 10 + w + cb_gap
 
         checkbox(cb_x, "звітна", checked=True)
@@ -268,16 +458,18 @@ class PDFService:
         y += th + 50
 
         # ---------------- РОЗДІЛ I ----------------
-        def draw_line(text: str, font, extra_y: int = 0):
+        def draw_field(key: str, label: str):
+            # Підпис — у фоні, значення дописується після нього при кожному рендері
             nonlocal y
-            y += extra_y
-            draw.text((margin_x, y), text, fill="black", font=font)
-            y += measure(text, font)[1] + 6
+            text = f"{label}: "
+            draw.text((margin_x, y), text, fill="black", font=font_regular)
+            slots[key] = (margin_x + fonts.text_length(font_regular, text), y)
+            y += measure(font_regular, text)[1] + 6
 
         def draw_section_title(text: str):
             nonlocal y
             draw.text((margin_x, y), text, fill="black", font=font_bold)
-            _, h = measure(text, font_bold)
+            _, h = measure(font_bold, text)
             line_y = y + h + 8  # більше повітря між заголовком і лінією
             x1 = margin_x
             x2 = width - margin_x
@@ -285,13 +477,10 @@ class PDFService:
             y = line_y + 24  # опускаємо текст нижче від лінії
 
         draw_section_title("I. Загальні відомості")
-        draw_line(f"Прізвище, ім'я, по батькові: {context.get('full_name', '')}", font_regular)
-        draw_line(
-            f"Реєстраційний номер облікової картки платника податків: {context.get('tax_id', '')}",
-            font_regular,
-        )
-        draw_line(f"Звітний (податковий) період: {quarter_text}", font_regular)
-        draw_line(f"Дата заповнення: {context.get('filled_date', '')}", font_regular)
+        draw_field("full_name", "Прізвище, ім'я, по батькові")
+        draw_field("tax_id", "Реєстраційний номер облікової картки платника податків")
+        draw_field("quarter_text", "Звітний (податковий) період")
+        draw_field("filled_date", "Дата заповнення")
 
         y += 70
 
@@ -299,7 +488,7 @@ class PDFService:
         draw_section_title("II. Дохід, що підлягає оподаткуванню")
         y += 40  # додатковий відступ перед таблицею
 
-        def draw_table(start_y: int, rows: list[tuple[str, str]]) -> int:
+        def draw_table(start_y: int, rows: list[tuple[str, str | None]]) -> int:
             table_width = width - margin_x * 2
             col_split = margin_x + int(table_width * 0.70)
 
@@ -308,26 +497,27 @@ class PDFService:
             x1, x2 = margin_x, margin_x + table_width
 
             draw.rectangle((x1, start_y, x2, start_y + header_h),
-                           outline="black", fill=(240, 240, 240), width=2)
+                           outline="black", fill="#f0f0f0", width=2)
             draw.line((col_split, start_y, col_split, start_y + header_h), fill="black", width=1)
             draw.text((x1 + 22, start_y + 26), "Показник", fill="black", font=font_bold)
             draw.text((col_split + 22, start_y + 26), "Сума, грн", fill="black", font=font_bold)
 
             cur_y = start_y + header_h
-            for label, amount in rows:
+            for label, key in rows:
                 draw.rectangle((x1, cur_y, x2, cur_y + row_h), outline="black", width=2)
                 draw.line((col_split, cur_y, col_split, cur_y + row_h), fill="black", width=1)
                 draw.text((x1 + 22, cur_y + 24), label, fill="black", font=font_regular)
-                aw, ah = measure(amount, font_regular)
-                draw.text((x2 - aw - 22, cur_y + 24), amount, fill="black", font=font_regular)
+                if key:
+                    # Сума вирівнюється по правому краю: зберігаємо праву межу
+                    slots[key] = (x2 - 22, cur_y + 24)
                 cur_y += row_h
             return cur_y
 
         rows_income = [
-            ("1. Сума доходу за податковий (звітний) період", total_income),
-            ("2. Сума доходу, що перевищує граничний обсяг доходу", ""),
-            ("3. Сума доходу від іншої діяльності (за іншими ставками)", ""),
-            ("4. Сума доходу, що не є об’єктом оподаткування", ""),
+            ("1. Сума доходу за податковий (звітний) період", "total_income"),
+            ("2. Сума доходу, що перевищує граничний обсяг доходу", None),
+            ("3. Сума доходу від іншої діяльності (за іншими ставками)", None),
+            ("4. Сума доходу, що не є об’єктом оподаткування", None),
         ]
         y = draw_table(y, rows_income)
 
@@ -338,11 +528,11 @@ class PDFService:
         y += 40  # додатковий відступ перед другою таблицею
 
         rows_tax = [
-            ("20. Ставка єдиного податку (%)", tax_rate_str),
-            ("21. Сума нарахованого єдиного податку", single_tax),
-            ("30. ЄСВ за себе", esv),
-            ("31. ЄСВ за найманих працівників", "0.00"),
-            ("40. Загальна сума до сплати", total_due),
+            ("20. Ставка єдиного податку (%)", "tax_rate"),
+            ("21. Сума нарахованого єдиного податку", "single_tax"),
+            ("30. ЄСВ за себе", "esv"),
+            ("31. ЄСВ за найманих працівників", "esv_employees"),
+            ("40. Загальна сума до сплати", "total_due"),
         ]
         y = draw_table(y, rows_tax)
 
@@ -354,21 +544,20 @@ class PDFService:
         ]
         for n in notes:
             draw.text((margin_x, y), n, fill="black", font=font_small)
-            y += measure(n, font_small)[1] + 4
+            y += measure(font_small, n)[1] + 4
 
         y += 80
 
-        # Підпис платника
-        draw.text((margin_x, y), f"«___» __________ {year} р.", fill="black", font=font_regular)
-        y += measure("X", font_regular)[1] + 24
-        signature = f"Платник податку / уповноважена особа: ______________________ ({context.get('full_name', '')})"
-        draw.text((margin_x, y), signature, fill="black", font=font_regular)
+        # Підпис платника (рядки зі значеннями — при рендері)
+        slots["date_line"] = (margin_x, y)
+        y += measure(font_regular, "X")[1] + 24
+        slots["signature"] = (margin_x, y)
 
         # ---------------- БЛОК КОНТРОЛЮЮЧОГО ОРГАНУ ----------------
         y += 140
         ctrl_title = "Ця частина заповнюється посадовою особою контролюючого органу"
         draw.text((margin_x, y), ctrl_title, fill="black", font=font_small_bold)
-        y += measure(ctrl_title, font_small_bold)[1] + 18
+        y += measure(font_small_bold, ctrl_title)[1] + 18
 
         ctrl_lines = [
             "Відмітка про внесення даних до електронної бази податкової звітності: «___» __________ 20__ року",
@@ -380,8 +569,259 @@ class PDFService:
         ]
         for line in ctrl_lines:
             draw.text((margin_x, y), line, fill="black", font=font_small)
-            y += measure(line, font_small)[1] + 6
+            y += measure(font_small, line)[1] + 6
+
+        return slots
+
+    @staticmethod
+    def _declaration_background_key() -> str:
+        paths = [str(fonts.font_path(bold) or "") for bold in (False, True)]
+        raw = "|".join([DECLARATION_LAYOUT_VERSION, *paths, Image.__version__])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def _declaration_canvas(mode: str) -> tuple[Image.Image, dict]:
+        """
+        Статичний шар, намальований заново. gray і mono малюються одразу у відтінках сірого —
+        без проміжного RGB-полотна втричі більшого розміру.
+        """
+        pil_mode = RASTER_MODES[mode][0]
+        img = Image.new("RGB" if pil_mode == "RGB" else "L", DECLARATION_RASTER_SIZE, "white")
+        slots = PDFService._draw_declaration_static(img)
+        if pil_mode == "1":
+            # Поріг без дизерингу: сіра заливка шапки таблиць стає білою, а не «шумом»
+            img = img.convert("1", dither=Image.Dither.NONE)
+        return img, slots
+
+    @staticmethod
+    @lru_cache(maxsize=len(RASTER_MODES))
+    def declaration_background(mode: str = "rgb") -> tuple[Image.Image, dict]:
+        """
+        Статичний шар растрової декларації і координати змінних полів. Малюється один раз
+        на версію макета (DECLARATION_LAYOUT_VERSION + шрифти) і режим растру та
+        зберігається в storage/cache, тож наступні процеси лише читають PNG.
+        """
+        key = PDFService._declaration_background_key()
+        png_path = RENDER_CACHE_DIR / f"declaration_bg_{key}_{mode}.png"
+        slots_path = png_path.with_suffix(".json")
+        if png_path.is_file() and slots_path.is_file():
+            try:
+                with Image.open(png_path) as cached:
+                    img = cached.convert(RASTER_MODES[mode][0])
+                slots = {k: tuple(v) for k, v in json.loads(slots_path.read_text()).items()}
+                return img, slots
+            except Exception as e:
+                print(f"Пошкоджений кеш фону декларації {png_path}: {e}")
+
+        img, slots = PDFService._declaration_canvas(mode)
+        try:
+            RENDER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_png = png_path.with_suffix(f".{os.getpid()}.tmp")
+            img.save(tmp_png, format="PNG")
+            tmp_png.replace(png_path)
+            slots_path.write_text(json.dumps(slots))
+            # Фони попередніх версій макета/шрифтів більше не знадобляться
+            for stale in RENDER_CACHE_DIR.glob("declaration_bg_*"):
+                if not stale.name.startswith(f"declaration_bg_{key}_"):
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Не вдалося зберегти кеш фону декларації: {e}")
+        return img, slots
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _declaration_template_digest() -> str:
+        digest = hashlib.sha1()
+        for name in (*DECLARATION_TEMPLATE_PAGES, "declaration_3_group.html"):
+            path = TEMPLATES_DIR / name
+            digest.update(path.read_bytes() if path.is_file() else name.encode("utf-8"))
+        # Координати полів векторного рендеру — частина вигляду, як і файли бланка
+        digest.update(repr((DECLARATION_FIELDS, DECLARATION_CELL_FIELDS, DECLARATION_PERIOD_MARKS, DECLARATION_AMOUNT_WIDTH_MM)).encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    @staticmethod
+    def declaration_render_version() -> str:
+        """
+        Версія вигляду декларації: бекенд, режим растру, макет, шрифти й файли бланка.
+        Однаковий контекст з однаковою версією дає той самий PDF (кеш services/render_cache.py).
+        """
+        return "|".join([
+            settings.DECLARATION_RENDERER,
+            settings.DECLARATION_RASTER_MODE,
+            PDFService._declaration_background_key(),
+            PDFService._declaration_template_digest(),
+        ])
+
+    @staticmethod
+    def estimated_render_bytes(renderer: str | None = None, mode: str | None = None) -> int:
+        """
+        Орієнтовна пікова пам'ять одного рендеру декларації — для обмеження паралельних
+        рендерів (services/render_budget.py). Растр: копія полотна + буфер кодування.
+        """
+        renderer = renderer or settings.DECLARATION_RENDERER
+        if renderer == "html":
+            return max(html_renderer.ESTIMATED_RENDER_BYTES, VECTOR_RENDER_BYTES)
+        if renderer == "vector":
+            return VECTOR_RENDER_BYTES
+        width, height = DECLARATION_RASTER_SIZE
+        return width * height * RASTER_MODES[mode or settings.DECLARATION_RASTER_MODE][1] * 2
+
+    @staticmethod
+    def render_declaration_flat(context: dict, use_cache: bool = True, mode: str | None = None) -> bytes:
+        """
+        Спрощена, але візуально максимально «офіційна» декларація
+        у вигляді заповненої форми без WeasyPrint (Pillow + текст/таблиці).
+        Статичний шар береться з кешу (declaration_background), при рендері малюються
+        лише значення; use_cache=False малює все заново (для порівняння у бенчмарку).
+        mode — rgb / gray / mono (за замовчуванням settings.DECLARATION_RASTER_MODE).
+        """
+        mode = mode or settings.DECLARATION_RASTER_MODE
+        if use_cache:
+            background, slots = PDFService.declaration_background(mode)
+            img = background.copy()
+        else:
+            img, slots = PDFService._declaration_canvas(mode)
+
+        font_regular = PDFService._declaration_fonts()["regular"]
+        draw = ImageDraw.Draw(img)
 
+        def to_kop(value) -> int:
+            try:
+                return to_kopiykas(value)
+            except ValueError:
+                return 0
+
+        # ---- Числові значення (цілі копійки) ----
+        total_income_kop = to_kop(context.get("total_income", 0))
+        single_tax_kop = to_kop(context.get("single_tax", 0))
+        esv_kop = to_kop(context.get("esv", 0))
+        total_due_val = context.get("total_due")
+        if total_due_val is None:
+            total_due_kop = single_tax_kop + esv_kop
+        else:
+            total_due_kop = to_kop(total_due_val)
+
+        tax_rate = context.get("tax_rate")
+        if tax_rate is None:
+            if total_income_kop > 0:
+                try:
+                    rate = (Decimal(single_tax_kop) * 100 / Decimal(total_income_kop)).quantize(
+                        Decimal("0.01"), rounding=ROUND_HALF_UP
+                    )
+                    tax_rate = format(rate, "f").rstrip("0").rstrip(".")
+                except Exception:
+                    tax_rate = "5"
+            else:
+                tax_rate = "5"
+
+        year = context.get("year", "")
+        quarter_raw = context.get("quarter")
+        try:
+            quarter_int = int(quarter_raw)
+        except (TypeError, ValueError):
+            quarter_int = None
+        quarter_text = context.get("quarter_text")
+        if not quarter_text:
+            roman = {1: "I", 2: "II", 3: "III", 4: "IV"}.get(quarter_int, quarter_raw or "")
+            if year and roman:
+                quarter_text = f"{roman} квартал {year} року"
+            elif roman:
+                quarter_text = f"{roman} квартал"
+            else:
+                quarter_text = ""
+
+        # Розділ I: значення після підписів
+        for key, value in (
+            ("full_name", context.get("full_name", "")),
+            ("tax_id", context.get("tax_id", "")),
+            ("quarter_text", quarter_text),
+            ("filled_date", context.get("filled_date", "")),
+        ):
+            draw.text(slots[key], str(value or ""), fill="black", font=font_regular)
+
+        # Суми в таблицях — по правому краю графи
+        amounts = {
+            "total_income": format_kopiykas(total_income_kop),
+            "tax_rate": str(tax_rate),
+            "single_tax": format_kopiykas(single_tax_kop),
+            "esv": format_kopiykas(esv_kop),
+            "esv_employees": "0.00",
+            "total_due": format_kopiykas(total_due_kop),
+        }
+        for key, amount in amounts.items():
+            right, top = slots[key]
+            draw.text((right - fonts.text_size(font_regular, amount)[0], top), amount, fill="black", font=font_regular)
+
+        # Підпис платника
+        draw.text(slots["date_line"], f"«___» __________ {year} р.", fill="black", font=font_regular)
+        signature = f"Платник податку / уповноважена особа: ______________________ ({context.get('full_name', '')})"
+        draw.text(slots["signature"], signature, fill="black", font=font_regular)
+
+        if img.mode != "RGB":
+            return b"".join(PDFService.iter_raster_pdf([img], dpi=300.0))
         buf = BytesIO()
         img.save(buf, format="PDF", resolution=300.0)
         return buf.getvalue()
+
+    @staticmethod
+    def iter_raster_pdf(pages, dpi: float = 150.0):
+        """
+        Потоковий PDF зі сторінок-зображень Pillow: кожна сторінка стискається й віддається
+        одразу (ітератор bytes), тож у пам'яті лише одна сторінка незалежно від їх кількості.
+        Дерево сторінок і xref дописуються в кінці.
+        """
+        offset = 0
+        offsets: dict[int, int] = {}
+        page_ids: list[int] = []
+        next_id = 3  # 1 — каталог, 2 — дерево сторінок (пишеться останнім)
+
+        def emit(obj_id: int, body: bytes) -> bytes:
+            nonlocal offset
+            offsets[obj_id] = offset
+            chunk = f"{obj_id} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+            offset += len(chunk)
+            return chunk
+
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        offset = len(header)
+        yield header + emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        for page in pages:
+            gray = page if page.mode in ("1", "L") else page.convert("L")
+            bits = 1 if gray.mode == "1" else 8
+            data = zlib.compress(gray.tobytes(), 6)
+            w_pt = gray.width * 72.0 / dpi
+            h_pt = gray.height * 72.0 / dpi
+            image_id, content_id, page_id = next_id, next_id + 1, next_id + 2
+            next_id += 3
+
+            image = emit(
+                image_id,
+                (
+                    f"<< /Type /XObject /Subtype /Image /Width {gray.width} /Height {gray.height} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent {bits} /Filter /FlateDecode /Length {len(data)} >>\nstream\n"
+                ).encode("ascii") + data + b"\nendstream",
+            )
+            content_data = f"q {w_pt:.2f} 0 0 {h_pt:.2f} 0 0 cm /Im0 Do Q".encode("ascii")
+            content = emit(
+                content_id,
+                f"<< /Length {len(content_data)} >>\nstream\n".encode("ascii") + content_data + b"\nendstream",
+            )
+            page_obj = emit(
+                page_id,
+                (
+                    f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.2f} {h_pt:.2f}] "
+                    f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+                ).encode("ascii"),
+            )
+            page_ids.append(page_id)
+            yield image + content + page_obj
+
+        kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+        tail = emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii"))
+        xref_offset = offset
+        lines = [f"xref\n0 {next_id}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, next_id):
+            lines.append(f"{offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        yield tail + "".join(lines).encode("ascii")
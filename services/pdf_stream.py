@@ -0,0 +1,255 @@
+# services/pdf_stream.py
+"""
+Потоковий векторний PDF: кожна сторінка віддається (bytes) одразу після малювання,
+тож у пам'яті лише поточна сторінка незалежно від їх кількості — як
+PDFService.iter_raster_pdf, але текст лишається текстом (виділяється й шукається).
+
+Сторінка малюється через StreamPage з підмножиною API reportlab canvas (setFont,
+drawString, drawRightString, stringWidth, rect, line, setLineWidth). Шрифти TTF
+вбудовуються в кінці файлу як CIDFontType2 (Identity-H): у тексті — номери гліфів,
+тож підмножину з використаних гліфів (fontTools, retain_gids) можна зібрати вже після
+останньої сторінки. Без fontTools вбудовується весь файл шрифту.
+
+    pdf = StreamingPDF(page_size, {"regular": path, "bold": bold_path}, title="...")
+    yield pdf.header()
+    page = pdf.page(); page.drawString(...); yield pdf.finish_page(page)
+    yield pdf.close()
+"""
+import hashlib
+import io
+import zlib
+from pathlib import Path
+
+from reportlab.pdfbase.ttfonts import TTFontFile
+
+
+def _number(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".") or "0"
+
+
+def _text_string(value: str) -> str:
+    """Рядок для словника PDF (Info): UTF-16BE з BOM, hex."""
+    return "<FEFF" + value.encode("utf-16-be").hex().upper() + ">"
+
+
+class _Face:
+    """Накреслення TTF: метрики з reportlab TTFontFile, гліфи, використані в документі."""
+
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.path = Path(path)
+        self.ttf = TTFontFile(str(self.path))
+        self.used: dict[int, str] = {0: ""}
+        self.obj_id: int | None = None
+
+    def width(self, text: str, size: float) -> float:
+        widths = self.ttf.charWidths
+        return sum(widths.get(ord(c), self.ttf.defaultWidth) for c in text) * size / 1000.0
+
+    def encode(self, text: str) -> str:
+        gids = []
+        for c in text:
+            gid = self.ttf.charToGlyph.get(ord(c), 0)
+            self.used.setdefault(gid, c)
+            gids.append(gid)
+        return "".join(f"{gid:04X}" for gid in gids)
+
+    def font_file(self) -> bytes:
+        """TTF лише з використаними гліфами (номери гліфів збережено); без fontTools — увесь файл."""
+        try:
+            from fontTools import subset
+        except ImportError:
+            return self.path.read_bytes()
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.hinting = False
+        options.drop_tables += ["FFTM"]
+        font = subset.load_font(str(self.path), options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=sorted(self.used))
+        subsetter.subset(font)
+        out = io.BytesIO()
+        subset.save_font(font, out, options)
+        return out.getvalue()
+
+    def base_name(self) -> str:
+        # Тег підмножини — 6 великих літер, однаковий для однакового набору гліфів
+        digest = hashlib.sha1(repr(sorted(self.used)).encode("ascii")).digest()
+        tag = "".join(chr(ord("A") + b % 26) for b in digest[:6])
+        name = self.ttf.name.decode("latin-1") if isinstance(self.ttf.name, bytes) else self.ttf.name
+        return f"{tag}+{name}"
+
+    def widths_array(self) -> str:
+        scale = 1000.0 / self.ttf.unitsPerEm
+        items = []
+        for gid in sorted(self.used):
+            advance, _ = self.ttf.hmetrics[min(gid, len(self.ttf.hmetrics) - 1)]
+            items.append(f"{gid} [{_number(advance * scale)}]")
+        return "[" + " ".join(items) + "]"
+
+    def to_unicode(self) -> bytes:
+        entries = [(gid, c) for gid, c in sorted(self.used.items()) if c]
+        lines = [
+            "/CIDInit /ProcSet findresource begin",
+            "12 dict begin",
+            "begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            "/CMapName /Adobe-Identity-UCS def",
+            "/CMapType 2 def",
+            "1 begincodespacerange",
+            "<0000> <FFFF>",
+            "endcodespacerange",
+        ]
+        for start in range(0, len(entries), 100):
+            chunk = entries[start:start + 100]
+            lines.append(f"{len(chunk)} beginbfchar")
+            for gid, c in chunk:
+                lines.append(f"<{gid:04X}> <{c.encode('utf-16-be').hex().upper()}>")
+            lines.append("endbfchar")
+        lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        return "\n".join(lines).encode("ascii")
+
+
+class StreamPage:
+    """Одна сторінка: команди вмісту накопичуються в списку до finish_page."""
+
+    def __init__(self, pdf: "StreamingPDF"):
+        self._pdf = pdf
+        self._ops: list[str] = []
+        self._fonts: dict[str, int] = {}
+        self._font: _Face | None = None
+        self._size = 10.0
+
+    def setFont(self, name: str, size: float) -> None:
+        self._font = self._pdf._face(name)
+        self._size = size
+        self._fonts[name] = self._font.obj_id
+
+    def setLineWidth(self, width: float) -> None:
+        self._ops.append(f"{_number(width)} w")
+
+    def stringWidth(self, text: str, name: str, size: float) -> float:
+        return self._pdf._faces[name].width(text, size)
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        if not text:
+            return
+        resource = self._pdf._resource_name(self._font.name)
+        self._ops.append(
+            f"BT /{resource} {_number(self._size)} Tf {_number(x)} {_number(y)} Td <{self._font.encode(text)}> Tj ET"
+        )
+
+    def drawRightString(self, x: float, y: float, text: str) -> None:
+        self.drawString(x - self._font.width(text, self._size), y, text)
+
+    def rect(self, x: float, y: float, width: float, height: float) -> None:
+        self._ops.append(f"{_number(x)} {_number(y)} {_number(width)} {_number(height)} re S")
+
+    def line(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        self._ops.append(f"{_number(x1)} {_number(y1)} m {_number(x2)} {_number(y2)} l S")
+
+
+class StreamingPDF:
+    def __init__(self, page_size: tuple[float, float], faces: dict[str, Path], title: str = ""):
+        self.page_size = page_size
+        self.title = title
+        self._faces = {name: _Face(name, path) for name, path in faces.items()}
+        self._offset = 0
+        self._offsets: dict[int, int] = {}
+        self._page_ids: list[int] = []
+        self._next_id = 4  # 1 — каталог, 2 — дерево сторінок, 3 — Info (пишуться в кінці)
+
+    def _allocate(self, count: int = 1) -> int:
+        first = self._next_id
+        self._next_id += count
+        return first
+
+    def _face(self, name: str) -> _Face:
+        face = self._faces[name]
+        if face.obj_id is None:
+            # Type0, CIDFont, дескриптор, файл шрифту, ToUnicode — пишуться в close()
+            face.obj_id = self._allocate(5)
+        return face
+
+    def _resource_name(self, name: str) -> str:
+        return f"F{list(self._faces).index(name) + 1}"
+
+    def _emit(self, obj_id: int, body: bytes) -> bytes:
+        self._offsets[obj_id] = self._offset
+        chunk = f"{obj_id} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+        self._offset += len(chunk)
+        return chunk
+
+    def _stream(self, obj_id: int, data: bytes, extra: str = "") -> bytes:
+        data = zlib.compress(data, 6)
+        head = f"<< /Length {len(data)} /Filter /FlateDecode{extra} >>\nstream\n".encode("ascii")
+        return self._emit(obj_id, head + data + b"\nendstream")
+
+    def header(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._offset = len(header)
+        return header
+
+    def page(self) -> StreamPage:
+        return StreamPage(self)
+
+    def finish_page(self, page: StreamPage) -> bytes:
+        content_id = self._allocate(2)
+        page_id = content_id + 1
+        width, height = self.page_size
+        fonts = " ".join(f"/{self._resource_name(name)} {obj_id} 0 R" for name, obj_id in page._fonts.items())
+        content = self._stream(content_id, "\n".join(page._ops).encode("ascii"))
+        page_obj = self._emit(
+            page_id,
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_number(width)} {_number(height)}] "
+                f"/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>"
+            ).encode("ascii"),
+        )
+        self._page_ids.append(page_id)
+        return content + page_obj
+
+    def _font_objects(self, face: _Face) -> bytes:
+        type0_id = face.obj_id
+        cid_id, descriptor_id, file_id, unicode_id = range(type0_id + 1, type0_id + 5)
+        ttf = face.ttf
+        base = face.base_name()
+        data = face.font_file()
+        bbox = " ".join(_number(v) for v in ttf.bbox)
+        return b"".join((
+            self._emit(type0_id, (
+                f"<< /Type /Font /Subtype /Type0 /BaseFont /{base} /Encoding /Identity-H "
+                f"/DescendantFonts [{cid_id} 0 R] /ToUnicode {unicode_id} 0 R >>"
+            ).encode("ascii")),
+            self._emit(cid_id, (
+                f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base} "
+                f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                f"/FontDescriptor {descriptor_id} 0 R /DW {_number(ttf.defaultWidth)} "
+                f"/W {face.widths_array()} /CIDToGIDMap /Identity >>"
+            ).encode("ascii")),
+            self._emit(descriptor_id, (
+                f"<< /Type /FontDescriptor /FontName /{base} /Flags {ttf.flags} /FontBBox [{bbox}] "
+                f"/ItalicAngle {_number(ttf.italicAngle)} /Ascent {_number(ttf.ascent)} "
+                f"/Descent {_number(ttf.descent)} /CapHeight {_number(ttf.capHeight)} "
+                f"/StemV {_number(ttf.stemV)} /FontFile2 {file_id} 0 R >>"
+            ).encode("ascii")),
+            self._stream(file_id, data, f" /Length1 {len(data)}"),
+            self._stream(unicode_id, face.to_unicode()),
+        ))
+
+    def close(self) -> bytes:
+        """Шрифти, дерево сторінок, каталог і xref."""
+        parts = [self._font_objects(face) for face in self._faces.values() if face.obj_id is not None]
+        kids = " ".join(f"{pid} 0 R" for pid in self._page_ids)
+        parts.append(self._emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode("ascii")))
+        parts.append(self._emit(1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+        info = f"<< /Producer (FOPilot) /Title {_text_string(self.title)} >>" if self.title else "<< /Producer (FOPilot) >>"
+        parts.append(self._emit(3, info.encode("ascii")))
+
+        xref_offset = self._offset
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, self._next_id):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root 1 0 R /Info 3 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return b"".join(parts) + "".join(lines).encode("ascii")
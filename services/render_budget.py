@@ -0,0 +1,99 @@
+# services/render_budget.py
+"""
+Обмеження пам'яті одночасних рендерів PDF.
+
+Кожен рендер перед стартом резервує свою оцінку пам'яті (PDFService.estimated_render_bytes)
+з бюджету RENDER_MEMORY_BUDGET_MB і звільняє її по завершенні. Якщо бюджет вичерпано,
+запит чекає в черзі (FIFO), тож сплеск декларацій у кінці кварталу розтягується в часі,
+а не впирається в OOM. Рендер, дорожчий за весь бюджет, виконується сам.
+
+release() можна викликати з будь-якого потоку (колбек завершення future пулу процесів).
+"""
+import asyncio
+import resource
+import sys
+import threading
+from collections import deque
+
+from core.config import settings
+
+_MB = 1024 * 1024
+
+_lock = threading.Lock()
+_reserved = 0
+_peak_reserved = 0
+_running = 0
+_waiters: deque = deque()
+
+
+def budget_bytes() -> int:
+    return max(settings.RENDER_MEMORY_BUDGET_MB, 0) * _MB
+
+
+def _reserve(cost: int) -> None:
+    global _reserved, _peak_reserved, _running
+    _reserved += cost
+    _running += 1
+    _peak_reserved = max(_peak_reserved, _reserved)
+
+
+def _wake(waiter: dict) -> None:
+    if not waiter["future"].done():
+        waiter["future"].set_result(None)
+
+
+async def acquire(cost: int) -> int:
+    """Резервує cost байтів (чекає, доки вистачить бюджету). Повертає зарезервовану суму для release."""
+    budget = budget_bytes()
+    if budget:
+        cost = min(cost, budget)
+    with _lock:
+        if not budget or (not _waiters and _reserved + cost <= budget):
+            _reserve(cost)
+            return cost
+        waiter = {"cost": cost, "future": asyncio.get_running_loop().create_future(), "granted": False}
+        _waiters.append(waiter)
+
+    try:
+        await waiter["future"]
+    except asyncio.CancelledError:
+        # Таймаут запиту: прибираємо себе з черги або віддаємо вже видане місце
+        with _lock:
+            granted = waiter["granted"]
+            if not granted:
+                _waiters.remove(waiter)
+        if granted:
+            release(cost)
+        raise
+    return cost
+
+
+def release(cost: int) -> None:
+    global _reserved, _running
+    with _lock:
+        _reserved -= cost
+        _running -= 1
+        budget = budget_bytes()
+        while _waiters and (not budget or _reserved + _waiters[0]["cost"] <= budget):
+            waiter = _waiters.popleft()
+            waiter["granted"] = True
+            _reserve(waiter["cost"])
+            waiter["future"].get_loop().call_soon_threadsafe(_wake, waiter)
+
+
+def peak_rss_mb() -> float:
+    """Пікова пам'ять (RSS) поточного процесу, МБ."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux рахує в КБ, macOS — у байтах
+    return round(peak / (_MB if sys.platform == "darwin" else 1024), 1)
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "budget_mb": settings.RENDER_MEMORY_BUDGET_MB,
+            "reserved_mb": round(_reserved / _MB, 1),
+            "peak_reserved_mb": round(_peak_reserved / _MB, 1),
+            "running": _running,
+            "waiting": len(_waiters),
+        }
@@ -0,0 +1,99 @@
+# services/render_cache.py
+"""
+Кеш згенерованих декларацій за вмістом.
+
+Одну й ту саму декларацію формують кілька разів поспіль (передзаповнення, перегляд,
+завантаження, «зроби декларацію» в чаті). Ключ рендеру — sha256 нормалізованого
+form_context, версії вигляду (PDFService.declaration_render_version) і формату XML-копії
+(declaration_xml.FORMAT_VERSION). Документ зберігається з полями renderKey і sha256 PDF;
+якщо документ з таким ключем уже є і файл на диску не змінився, повертається він — без
+рендеру й без запису на диск.
+
+Однакові запити, що прийшли одночасно, чекають на один рендер.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+
+from services import declaration_xml
+from services.document_service import BASE_DIR, DocumentService
+from services.pdf_service import PDFService
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "coalesced": 0, "stale": 0}
+_pending: dict[tuple[str, str], asyncio.Task] = {}
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+def render_key(form_context: dict) -> str:
+    normalized = {key: "" if value is None else str(value).strip() for key, value in form_context.items()}
+    payload = json.dumps(
+        {
+            "context": normalized,
+            "version": PDFService.declaration_render_version(),
+            "xml": declaration_xml.FORMAT_VERSION,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pdf_digest(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def stored_document(user_uid: str, key: str) -> dict | None:
+    """Документ з цим ключем, якщо його файл на диску досі той самий (ім'я файлу може бути перезаписане)."""
+    return verified_document(DocumentService.find_user_document(user_uid, "declaration", renderKey=key))
+
+
+def verified_document(meta: dict | None) -> dict | None:
+    """meta, якщо файл документа на диску збігається з його sha256; інакше None (застарілий)."""
+    if not meta or not meta.get("filePath") or not meta.get("sha256"):
+        return None
+    path = BASE_DIR / meta["filePath"]
+    try:
+        if path.is_file() and pdf_digest(path.read_bytes()) == meta["sha256"]:
+            return meta
+    except OSError as e:
+        print(f"Не вдалося прочитати {path}: {e}")
+    _count("stale")
+    return None
+
+
+async def get_or_render(user_uid: str, form_context: dict, render) -> dict:
+    """
+    Метадані документа декларації: збережений з тим самим ключем або новий —
+    render(key) рендерить і зберігає (ключ записується в метадані документа).
+    """
+    key = render_key(form_context)
+    stored = await asyncio.to_thread(stored_document, user_uid, key)
+    if stored is not None:
+        _count("hits")
+        return stored
+
+    pending = _pending.get((user_uid, key))
+    if pending is not None:
+        _count("coalesced")
+        return await asyncio.shield(pending)
+
+    _count("misses")
+    task = asyncio.ensure_future(render(key))
+    _pending[(user_uid, key)] = task
+    task.add_done_callback(lambda _: _pending.pop((user_uid, key), None))
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _counters["hits"] + _counters["misses"] + _counters["coalesced"]
+        return {
+            **_counters,
+            "hit_rate": round((_counters["hits"] + _counters["coalesced"]) / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,238 @@
+# services/render_pool.py
+"""
+Рендер PDF поза event loop: пул процесів із обмеженою чергою.
+
+Рендер декларації — секунди CPU, тож у async-обробнику він зупиняє всі інші запити
+воркера uvicorn. Тут він виконується в ProcessPoolExecutor (RENDER_WORKERS процесів,
+прогрітих шрифтами, бланком і WeasyPrint для HTML -> PDF), а запити понад RENDER_WORKERS + RENDER_QUEUE_SIZE
+отримують 429 з Retry-After — черга не росте безмежно в дедлайн. Відповідь чекає не
+довше RENDER_TIMEOUT_SECONDS; завислий рендер займає місце в черзі, доки не завершиться.
+
+Крім кількості, одночасні рендери обмежені пам'яттю (services/render_budget.py): рендер
+стартує, лише коли його оцінка вміщується в RENDER_MEMORY_BUDGET_MB.
+
+RENDER_WORKERS=0 — рендер у потоці (локальна розробка, без дочірніх процесів).
+"""
+import asyncio
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.templates import env as templates_env
+from services import html_renderer, render_budget
+from services.pdf_service import PDFService
+
+RETRY_AFTER_SECONDS = 5
+# Скільки останніх рендерів враховувати в метриках часу
+METRICS_WINDOW = 200
+
+_executor: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+_in_flight = 0
+_counters = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+_render_ms: deque = deque(maxlen=METRICS_WINDOW)
+_wait_ms: deque = deque(maxlen=METRICS_WINDOW)
+_worker_peak_rss_mb = 0.0
+
+
+def _warm_up() -> None:
+    """Ініціалізатор процесу пулу: шрифти, бланк, статичний шар і WeasyPrint — до першого запиту."""
+    try:
+        if settings.DECLARATION_RENDERER in ("vector", "html"):
+            PDFService._declaration_template()
+        PDFService._vector_font()
+        PDFService._vector_font(bold=True)
+        PDFService.declaration_background(settings.DECLARATION_RASTER_MODE)
+        html_renderer.warm_up()
+    except Exception as e:
+        print(f"Прогрів процесу рендеру не вдався: {e}")
+
+
+def _timed(render, *args) -> tuple[bytes, float, float]:
+    started = time.perf_counter()
+    pdf_bytes = render(*args)
+    return pdf_bytes, (time.perf_counter() - started) * 1000, render_budget.peak_rss_mb()
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if settings.RENDER_WORKERS <= 0:
+        return None
+    with _lock:
+        if _executor is None:
+            # spawn: дочірні процеси не успадковують gRPC-з'єднання Firestore батьківського
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+            )
+        return _executor
+
+
+def start() -> None:
+    """Піднімає процеси пулу при старті застосунку, щоб перший запит не чекав на spawn."""
+    executor = _get_executor()
+    if executor is not None:
+        for _ in range(settings.RENDER_WORKERS):
+            executor.submit(time.sleep, 0)
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _capacity() -> int:
+    return max(settings.RENDER_WORKERS, 1) + settings.RENDER_QUEUE_SIZE
+
+
+def _admit() -> None:
+    global _in_flight
+    with _lock:
+        if _in_flight >= _capacity():
+            _counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Забагато документів формується одночасно, спробуйте за кілька секунд",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        _in_flight += 1
+
+
+def _finished(future, submitted: float, reserved: int) -> None:
+    """Звільняє місце в черзі й пам'ять, коли рендер справді завершився (навіть після таймауту відповіді)."""
+    global _in_flight, _worker_peak_rss_mb
+    render_budget.release(reserved)
+    with _lock:
+        _in_flight -= 1
+        if future.cancelled() or future.exception() is not None:
+            _counters["failed"] += 1
+            return
+        _counters["completed"] += 1
+        _, render_ms, peak_rss_mb = future.result()
+        _render_ms.append(render_ms)
+        _wait_ms.append(max((time.perf_counter() - submitted) * 1000 - render_ms, 0.0))
+        _worker_peak_rss_mb = max(_worker_peak_rss_mb, peak_rss_mb)
+
+
+def _reset_broken(executor) -> None:
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _submit(render, args: tuple, cost: int, submitted: float, state: dict):
+    reserved = await render_budget.acquire(cost)
+    try:
+        state["executor"] = executor = _get_executor()
+        if executor is None:
+            future = asyncio.get_running_loop().run_in_executor(None, _timed, render, *args)
+        else:
+            future = executor.submit(_timed, render, *args)
+    except BaseException:
+        render_budget.release(reserved)
+        raise
+    state["submitted"] = True
+    future.add_done_callback(lambda f: _finished(f, submitted, reserved))
+    # shield: таймаут відповіді не скасовує рендер — місце в черзі звільниться по його завершенні
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+async def _render(render, args: tuple, cost: int) -> bytes:
+    """render(*args) у пулі; 429 — черга повна, 503 — таймаут або впав процес пулу."""
+    global _in_flight
+    _admit()
+    state = {"submitted": False, "executor": None}
+    try:
+        pdf_bytes, _, _ = await asyncio.wait_for(
+            _submit(render, args, cost, time.perf_counter(), state), settings.RENDER_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        with _lock:
+            _counters["timeouts"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Документ не сформувався вчасно, спробуйте ще раз",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    except BrokenProcessPool as e:
+        # Процес пулу впав (OOM, сигнал) — наступний запит підніме новий пул
+        print(f"Пул рендеру зламано, перезапуск: {e}")
+        _reset_broken(state["executor"])
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Сервіс документів перезапускається")
+    finally:
+        if not state["submitted"]:
+            # Не дочекався пам'яті або не вдалося поставити в пул — місце звільняємо тут
+            with _lock:
+                _in_flight -= 1
+    return pdf_bytes
+
+
+async def render_declaration(context: dict) -> bytes:
+    """PDF декларації (PDFService.render_declaration) у пулі."""
+    return await _render(PDFService.render_declaration, (context,), PDFService.estimated_render_bytes())
+
+
+async def render_html(html: str) -> bytes:
+    """HTML -> PDF (PDFService.html_to_pdf: WeasyPrint у прогрітому процесі або фолбек) у пулі."""
+    return await _render(PDFService.html_to_pdf, (html,), html_renderer.ESTIMATED_RENDER_BYTES)
+
+
+async def render_template(name: str, context: dict) -> bytes:
+    """Шаблон core.templates (Jinja, скомпільований і закешований) -> PDF у пулі."""
+    html = templates_env.get_template(name).render(**context)
+    return await render_html(html)
+
+
+async def render_invoices(contexts: list[dict]) -> list[bytes]:
+    """
+    Пачка інвойсів (PDFService.render_invoices): ділиться на частини за кількістю процесів,
+    кожна частина — одне місце в черзі й один обмін з процесом замість рендеру на інвойс.
+    """
+    if not contexts:
+        return []
+    size = -(-len(contexts) // max(settings.RENDER_WORKERS, 1))
+    chunks = [contexts[i:i + size] for i in range(0, len(contexts), size)]
+    cost = PDFService.estimated_invoice_bytes()
+    results = await asyncio.gather(*(_render(PDFService.render_invoices, (chunk,), cost) for chunk in chunks))
+    return [pdf_bytes for chunk in results for pdf_bytes in chunk]
+
+
+def _percentiles(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None, "max": None}
+    return {
+        "p50": round(statistics.median(ordered), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def metrics() -> dict:
+    with _lock:
+        workers = settings.RENDER_WORKERS
+        return {
+            "workers": workers,
+            "capacity": _capacity(),
+            "in_flight": _in_flight,
+            "queue_depth": max(_in_flight - max(workers, 1), 0),
+            **_counters,
+            "render_ms": _percentiles(_render_ms),
+            "wait_ms": _percentiles(_wait_ms),
+            "memory": render_budget.stats(),
+            "peak_rss_mb": {"app": render_budget.peak_rss_mb(), "workers": _worker_peak_rss_mb},
+        }
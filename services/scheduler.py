@@ -1,6 +1,9 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from services.monobank import get_exchange_rate
 from services.legal_ingest_service import LegalIngestService
+from services.monobank_sync import sync_all_users
+from services.document_service import DocumentService
+from core.config import settings
 
 scheduler: AsyncIOScheduler | None = None
 
@@ -21,4 +24,13 @@ def start_scheduler():
     scheduler = AsyncIOScheduler(timezone="Europe/Kiev")
     scheduler.add_job(update_currency_rates, "interval", hours=24, id="currency_update")
     scheduler.add_job(LegalIngestService.ingest_feeds, "interval", hours=24, id="legal_ingest")
+    scheduler.add_job(
+        sync_all_users,
+        "interval",
+        minutes=settings.MONOBANK_SYNC_INTERVAL_MINUTES,
+        id="monobank_sync",
+        max_instances=1,
+    )
+    # Метадані документів, які не записались у Firestore під час збою
+    scheduler.add_job(DocumentService.republish_pending, "interval", hours=1, id="document_republish", max_instances=1)
     scheduler.start()
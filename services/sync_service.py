@@ -0,0 +1,187 @@
+# services/sync_service.py
+"""
+Дельта-синхронізація для офлайн-клієнтів.
+
+Кожен запис (дохід, витрата, клієнт, документ) при створенні/зміні отримує version —
+номер з монотонного лічильника користувача sync_versions/{uid}. Видалення залишає
+надгробок у sync_tombstones з власною version. Клієнт зберігає отриманий version і при
+наступному відкритті запитує лише зміни після нього.
+
+Версії видаються в транзакції, яка читає лічильник, тож записи одного користувача
+комітяться строго в порядку версій — клієнт не пропустить запис з меншою версією,
+що закомітився пізніше.
+Тому версію не можна видати окремо від запису: запис (або надгробок) робиться в тій самій
+транзакції run_versioned, інакше /sync між ними пересуне since за версію, якої ще немає.
+
+Ціна: усі записи користувача (усіх сутностей) проходять через один документ-лічильник,
+тобто обмежені темпом записів одного документа Firestore (~1/с стабільно). Шардування
+лічильників статистики (services/user_stats.py) цього обмеження не знімає.
+"""
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from core.firebase import ensure_initialized
+from services import ledger_repository
+
+VERSIONS_COLLECTION = "sync_versions"
+TOMBSTONES_COLLECTION = "sync_tombstones"
+# Сутність синку -> колекція Firestore (документи зберігаються через DocumentService)
+ENTITIES = {
+    "incomes": "incomes",
+    "expenses": "expenses",
+    "clients": "clients",
+    "documents": None,
+}
+
+
+class _VersionAllocator:
+    def __init__(self, current: int):
+        self.current = current
+        self.allocated = 0
+
+    def __call__(self, count: int = 1) -> int:
+        """Резервує count версій, повертає першу."""
+        first = self.current + self.allocated + 1
+        self.allocated += count
+        return first
+
+
+def run_versioned(user_uid: str, func):
+    """
+    Виконує func(transaction, allocate) у транзакції з лічильником версій користувача.
+    allocate(n) повертає першу з n нових версій; лічильник записується в кінці.
+    Власні читання func має робити через transaction до будь-яких записів.
+    """
+    db = ensure_initialized()
+    counter_ref = db.collection(VERSIONS_COLLECTION).document(user_uid)
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = counter_ref.get(transaction=transaction)
+        current = int((snap.to_dict() or {}).get("version", 0)) if snap.exists else 0
+        allocate = _VersionAllocator(current)
+        result = func(transaction, allocate)
+        if allocate.allocated:
+            transaction.set(counter_ref, {"user_uid": user_uid, "version": current + allocate.allocated})
+        return result
+
+    return _run(db.transaction())
+
+
+def add_tombstone(writer, user_uid: str, entity: str, record_id: str, version: int) -> None:
+    db = ensure_initialized()
+    ref = db.collection(TOMBSTONES_COLLECTION).document(f"{user_uid}_{entity}_{record_id}")
+    writer.set(ref, {
+        "user_uid": user_uid,
+        "entity": entity,
+        "record_id": record_id,
+        "version": version,
+        "deleted_at": datetime.now(timezone.utc),
+    })
+
+
+def current_version(user_uid: str) -> int:
+    db = ensure_initialized()
+    snap = db.collection(VERSIONS_COLLECTION).document(user_uid).get()
+    return int((snap.to_dict() or {}).get("version", 0)) if snap.exists else 0
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _serialize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_serialize(v) for v in value]
+    return value
+
+
+def _changed_records(collection: str, user_uid: str, since: int, upto: int, limit: int) -> list[dict]:
+    query = ledger_repository.query(collection, user_uid)
+    if since > 0:
+        query = (
+            query.where(filter=FieldFilter("version", ">", since))
+            .where(filter=FieldFilter("version", "<=", upto))
+            .order_by("version")
+            .limit(limit + 1)
+        )
+    records = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        if since <= 0 and int(data.get("version", 0)) > upto:
+            continue
+        records.append({"id": doc.id, **_serialize(data)})
+    return records
+
+
+def _changed_documents(user_uid: str, since: int, upto: int) -> list[dict]:
+    from services.document_service import DocumentService
+
+    docs = DocumentService.list_user_documents(user_uid)
+    if since <= 0:
+        return [_serialize(d) for d in docs if int(d.get("version") or 0) <= upto]
+    return [_serialize(d) for d in docs if since < int(d.get("version") or 0) <= upto]
+
+
+def get_changes(user_uid: str, since: int = 0, limit: int = 500) -> dict:
+    """
+    Зміни після since (не включно). since=0 — повний знімок (включно з записами,
+    створеними до появи версій). Відповідь містить version для наступного запиту;
+    has_more=True означає, що треба повторити запит з цим version.
+    """
+    db = ensure_initialized()
+    # Межу фіксуємо до читань: записи з більшою версією потраплять у наступний синк
+    upto = current_version(user_uid)
+
+    changes: dict[str, list[dict]] = {}
+    for entity, collection in ENTITIES.items():
+        if collection is None:
+            changes[entity] = _changed_documents(user_uid, since, upto)
+        else:
+            changes[entity] = _changed_records(collection, user_uid, since, upto, limit)
+
+    deleted: dict[str, list[str]] = {entity: [] for entity in ENTITIES}
+    tombstones = []
+    if since > 0:
+        query = (
+            db.collection(TOMBSTONES_COLLECTION)
+            .where(filter=FieldFilter("user_uid", "==", user_uid))
+            .where(filter=FieldFilter("version", ">", since))
+            .where(filter=FieldFilter("version", "<=", upto))
+            .order_by("version")
+            .limit(limit + 1)
+        )
+        tombstones = [doc.to_dict() for doc in query.stream()]
+
+    # Обрізаємо за спільною межею версій, щоб сторінки не перекривались і нічого не губилось
+    if since > 0:
+        versions = sorted(
+            [int(r.get("version", 0)) for records in changes.values() for r in records]
+            + [int(t.get("version", 0)) for t in tombstones]
+        )
+        if len(versions) > limit:
+            upto = versions[limit - 1]
+            changes = {
+                entity: [r for r in records if int(r.get("version", 0)) <= upto]
+                for entity, records in changes.items()
+            }
+            tombstones = [t for t in tombstones if int(t.get("version", 0)) <= upto]
+            has_more = True
+        else:
+            has_more = False
+    else:
+        has_more = False
+
+    for tombstone in tombstones:
+        deleted.setdefault(tombstone.get("entity"), []).append(tombstone.get("record_id"))
+
+    return {
+        "since": since,
+        "version": upto,
+        "has_more": has_more,
+        "full": since <= 0,
+        "changes": changes,
+        "deleted": deleted,
+    }
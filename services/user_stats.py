@@ -0,0 +1,178 @@
+# services/user_stats.py
+"""
+Лічильники активності користувача для сторінки статистики.
+
+    user_stats/{uid}/shards/{n} -> {"chat_questions": ..., "incomes": ..., "expenses": ..., "declarations": ...}
+
+Лічильники оновлюються firestore.Increment у тому ж batch, що й сам запис (дохід, витрата,
+повідомлення). Шард обирається випадково з USER_STATS_SHARDS, тож часті записи одного
+користувача (вебхуки Монобанку, імпорт) не впираються в ліміт записів одного документа.
+Дата реєстрації кешується в профілі (users/{uid}.created_at), тож статистика — один
+get_all без звернень до Firebase Auth і без count()-запитів.
+
+Перерахунок лічильників з наявних даних (для користувачів, створених до лічильників):
+    python -m services.user_stats rebuild [--user UID]
+"""
+import argparse
+import random
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+import core.firebase as firebase
+from core.config import settings
+from core.firebase import ensure_initialized
+from services import ledger_repository
+
+COLLECTION = "user_stats"
+SHARDS_SUBCOLLECTION = "shards"
+COUNTERS = ("chat_questions", "incomes", "expenses", "declarations")
+# Позначка в шарді 0, яку ставить лише перерахунок: без неї лічильники бачать тільки
+# інкременти після деплою, а не дані, створені раніше
+REBUILT_FIELD = "rebuilt_at"
+
+
+def _shard_count() -> int:
+    return max(1, int(settings.USER_STATS_SHARDS))
+
+
+def _shard_ref(db, user_uid: str, shard: int):
+    return db.collection(COLLECTION).document(user_uid).collection(SHARDS_SUBCOLLECTION).document(str(shard))
+
+
+def increment(writer, user_uid: str, counter: str, delta: int = 1) -> None:
+    """
+    Додає delta до лічильника у випадковому шарді.
+    writer — WriteBatch або Transaction: лічильник комітиться разом із самим записом.
+    """
+    if counter not in COUNTERS:
+        raise ValueError(f"Невідомий лічильник: {counter}")
+    if not delta:
+        return
+    db = ensure_initialized()
+    ref = _shard_ref(db, user_uid, random.randrange(_shard_count()))
+    writer.set(ref, {counter: firestore.Increment(delta)}, merge=True)
+
+
+def bump(user_uid: str, counter: str, delta: int = 1) -> None:
+    """Окремий запис лічильника там, де немає batch. Помилка не ламає основну дію."""
+    try:
+        db = ensure_initialized()
+        batch = db.batch()
+        increment(batch, user_uid, counter, delta)
+        batch.commit()
+    except Exception as e:
+        print(f"Не вдалося оновити лічильник {counter} для {user_uid}: {e}")
+
+
+def _to_datetime(value) -> datetime | None:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _auth_created_at(user_uid: str) -> datetime | None:
+    if firebase.auth_client is None:
+        return None
+    record = firebase.auth_client.get_user(user_uid)
+    timestamp_ms = record.user_metadata.creation_timestamp
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+
+
+def get_stats(user_uid: str) -> dict:
+    """
+    Лічильники + дата реєстрації одним читанням (профіль і шарди через get_all).
+    Якщо лічильники ще не перераховувались (немає REBUILT_FIELD) — одноразово рахує їх з даних.
+    """
+    db = ensure_initialized()
+    user_ref = db.collection("users").document(user_uid)
+    shard_refs = [_shard_ref(db, user_uid, n) for n in range(_shard_count())]
+
+    counters = dict.fromkeys(COUNTERS, 0)
+    created_at = None
+    rebuilt = False
+    for snap in db.get_all([user_ref, *shard_refs]):
+        if not snap.exists:
+            continue
+        data = snap.to_dict() or {}
+        if snap.reference.path == user_ref.path:
+            created_at = _to_datetime(data.get("created_at"))
+            continue
+        rebuilt = rebuilt or bool(data.get(REBUILT_FIELD))
+        for name in COUNTERS:
+            counters[name] += int(data.get(name, 0))
+
+    if not rebuilt:
+        counters = rebuild_user(user_uid)
+
+    if created_at is None:
+        # Користувачі, створені до кешування: беремо з Auth один раз і зберігаємо в профілі
+        try:
+            created_at = _auth_created_at(user_uid)
+            if created_at:
+                user_ref.set({"created_at": created_at}, merge=True)
+        except Exception as e:
+            print(f"Не вдалося отримати дату реєстрації {user_uid}: {e}")
+
+    return {**counters, "created_at": created_at}
+
+
+def _count(query) -> int:
+    return int(query.count().get()[0][0].value)
+
+
+def rebuild_user(user_uid: str) -> dict:
+    """
+    Перераховує лічильники з колекцій і записує їх у шард 0 (інші шарди обнуляються).
+    Конкурентні записи під час перерахунку можуть загубитись — запускати разово.
+    """
+    from services.document_service import DocumentService
+
+    db = ensure_initialized()
+    counters = {
+        "chat_questions": _count(
+            ledger_repository.query("messages", user_uid).where(filter=FieldFilter("sender", "==", "user"))
+        ),
+        "incomes": _count(ledger_repository.query("incomes", user_uid)),
+        "expenses": _count(ledger_repository.query("expenses", user_uid)),
+        "declarations": sum(
+            1 for d in DocumentService.list_user_documents(user_uid) if d.get("type") == "declaration"
+        ),
+    }
+
+    batch = db.batch()
+    for shard in range(_shard_count()):
+        payload = {**counters, REBUILT_FIELD: datetime.now(timezone.utc)} if shard == 0 else dict.fromkeys(COUNTERS, 0)
+        batch.set(_shard_ref(db, user_uid, shard), payload)
+    batch.commit()
+    return counters
+
+
+def rebuild(user_uid: str | None = None) -> int:
+    if user_uid:
+        rebuild_user(user_uid)
+        return 1
+    db = ensure_initialized()
+    count = 0
+    for doc in db.collection("users").stream():
+        rebuild_user(doc.id)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Лічильники статистики користувачів")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="перерахувати лічильники з колекцій")
+    rebuild_cmd.add_argument("--user", help="лише для одного користувача (uid)")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        print(f"Перераховано користувачів: {rebuild(args.user)}")
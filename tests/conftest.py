@@ -0,0 +1,16 @@
+# tests/conftest.py
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Обов'язкові налаштування core/config.py — тести не ходять у зовнішні сервіси
+for name, value in {
+    "FIREBASE_SERVICE_ACCOUNT_KEY_PATH": "/dev/null",
+    "MONOBANK_API_TOKEN": "test-token",
+    "MONOBANK_API_URL": "http://monobank.test",
+    "FRONTEND_ORIGIN": "http://localhost:3000",
+    "GEMINI_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,110 @@
+# tests/test_declaration_vector.py
+"""Векторна декларація: кожне значення стоїть у своєму рядку офіційного бланка."""
+from io import BytesIO
+
+import pytest
+
+from core.templates import TEMPLATES_DIR
+from services.pdf_service import DECLARATION_TEMPLATE_PAGES, PDFService
+
+pypdf = pytest.importorskip("pypdf")
+pytest.importorskip("reportlab")
+
+MM = 72 / 25.4
+CONTEXT = {
+    "full_name": "Шевченко Тарас Григорович",
+    "tax_id": "1234567890",
+    "year": 2025,
+    "quarter": 3,
+    "total_income": "123456.78",
+    "single_tax": "6172.84",
+    "filled_date": "19.10.2025",
+}
+# Графа 4 (ставка 5 %) розділів II і III, мм від лівого краю
+AMOUNT_COLUMN = (184.8, 198.6)
+
+
+def _texts(reader) -> list[list[tuple[float, float, str]]]:
+    """(x мм, базова лінія мм від верху, текст) для кожної сторінки."""
+    pages = []
+    for page in reader.pages:
+        height = float(page.mediabox.height)
+        items = []
+
+        def visit(text, cm, tm, font, size):
+            if text.strip():
+                x = tm[4] * cm[0] + cm[4]
+                y = tm[5] * cm[3] + cm[5]
+                items.append((round(x / MM, 1), round((height - y) / MM, 1), text.strip()))
+
+        page.extract_text(visitor_text=visit)
+        pages.append(items)
+    return pages
+
+
+@pytest.fixture(scope="module")
+def layout():
+    try:
+        pdf = PDFService.render_declaration_vector(CONTEXT)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    rendered = _texts(pypdf.PdfReader(BytesIO(pdf)))
+    template = [_texts(pypdf.PdfReader(str(TEMPLATES_DIR / name)))[0] for name in DECLARATION_TEMPLATE_PAGES]
+    overlay = [[item for item in page if item not in set(blank)] for page, blank in zip(rendered, template)]
+    return template, overlay
+
+
+def _baseline(items, text: str, x_range=(0, 210)) -> float:
+    found = [y for x, y, t in items if t.startswith(text) and x_range[0] <= x <= x_range[1]]
+    assert found, f"на бланку немає «{text}»"
+    return found[0]
+
+
+def _row(template_page, code: str) -> float:
+    """Базова лінія рядка за його кодом у графі «Код рядка»."""
+    return _baseline(template_page, code, (163.0, 168.0))
+
+
+def _placed(overlay_page, value: str) -> list[tuple[float, float]]:
+    return [(x, y) for x, y, t in overlay_page if t == value]
+
+
+@pytest.mark.parametrize("key, rows", [("total_income", ("1", "5")), ("single_tax", ("6", "8", "12"))])
+def test_amounts_are_in_their_rows(layout, key, rows):
+    template, overlay = layout
+    placed = _placed(overlay[0], CONTEXT[key])
+    assert len(placed) == len(rows)
+    for code in rows:
+        y_row = _row(template[0], code)
+        assert any(abs(y - y_row) < 0.8 and AMOUNT_COLUMN[0] < x < AMOUNT_COLUMN[1] for x, y in placed), (key, code, placed)
+
+
+def test_name_and_period_on_first_page(layout):
+    template, overlay = layout
+    (x, y), = _placed(overlay[0], CONTEXT["full_name"])
+    label_x, label_y = next((lx, ly) for lx, ly, t in template[0] if t.startswith("повне найменування"))
+    assert abs(y - label_y) < 1.0 and x > label_x + 80
+
+    marks = _placed(overlay[0], "X")
+    period_y = _baseline(template[0], "три квартали")
+    period_x = next(lx for lx, ly, t in template[0] if t.startswith("три квартали"))
+    assert any(abs(my - period_y) < 0.8 and period_x < mx < period_x + 45 for mx, my in marks)
+    assert any(abs(my - _baseline(template[0], "звітна")) < 0.8 for mx, my in marks)
+
+    year_y = _baseline(template[0], "року", (185.0, 200.0))
+    assert [t for x, y, t in overlay[0] if abs(y - year_y) < 0.8 and 180.0 < x < 189.0] == ["2", "5"]
+
+
+def test_signature_block_on_second_page(layout):
+    template, overlay = layout
+    date_y = _baseline(template[1], ".", (20.0, 45.0))
+    digits = [t for x, y, t in sorted(overlay[1]) if abs(y - date_y) < 0.8 and x < 70.0]
+    assert "".join(digits) == CONTEXT["filled_date"].replace(".", "")
+
+    (x, y), = _placed(overlay[1], CONTEXT["full_name"])
+    manager_y = _baseline(template[1], "Керівник платника")
+    caption_y = _baseline(template[1], "(власне ім", (100.0, 110.0))
+    assert manager_y < y < caption_y and 72.0 < x < 160.0
+    # Блок контролюючого органу — нижче; туди платник нічого не пише
+    officer_y = _baseline(template[1], "Ця частина заповнюється")
+    assert all(y < officer_y for _, y, _ in overlay[1])
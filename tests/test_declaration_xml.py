@@ -0,0 +1,32 @@
+# tests/test_declaration_xml.py
+"""XML-копія декларації: значення під кодами рядків бланка і відповідність схемі."""
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from services import declaration_xml
+
+CONTEXT = {
+    "full_name": "Шевченко Тарас Григорович",
+    "tax_id": "1234567890",
+    "year": 2025,
+    "quarter": 3,
+    "total_income": "123456.78",
+    "single_tax": "6172.84",
+    "filled_date": "19.10.2025",
+}
+
+
+def test_values_are_under_form_row_codes():
+    root = ET.fromstring(declaration_xml.build_declaration(CONTEXT))
+    body = root.find("BODY")
+    assert root.tag == "FOPILOT_DECLARATION"
+    assert [body.findtext(code) for code in ("R01G4", "R05G4")] == [CONTEXT["total_income"]] * 2
+    assert [body.findtext(code) for code in ("R06G4", "R08G4", "R12G4")] == [CONTEXT["single_tax"]] * 3
+    assert root.find("HEAD").findtext("D_FILL") == "2025-10-19"
+
+
+def test_matches_bundled_schema():
+    pytest.importorskip("lxml")
+    assert declaration_xml.validate(declaration_xml.build_declaration(CONTEXT)) == []
+    assert declaration_xml.validate(declaration_xml.build_declaration({**CONTEXT, "tax_id": ""}))
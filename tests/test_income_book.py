@@ -0,0 +1,28 @@
+# tests/test_income_book.py
+"""PDF «Книга обліку доходів»: потоковий векторний файл з підсумками по сторінках."""
+from io import BytesIO
+
+import pytest
+
+from services import export_service
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _rows(count: int):
+    for i in range(count):
+        yield {"date": "2025-01-15", "description": f"Оплата рахунку {i + 1}", "amount": "100.00", "amount_kop": 10000}
+
+
+def test_book_pages_carry_running_total():
+    chunks = list(export_service.stream_income_book(_rows(45), owner="Шевченко Тарас Григорович"))
+    assert len(chunks) == 4  # заголовок, дві сторінки, шрифти з xref
+
+    reader = pypdf.PdfReader(BytesIO(b"".join(chunks)), strict=True)
+    assert len(reader.pages) == 2
+    first, second = (page.extract_text() for page in reader.pages)
+    assert "Шевченко Тарас Григорович" in first and "Оплата рахунку 40" in first
+    assert "Оплата рахунку 41" in second and "Оплата рахунку 40" not in second
+    # Разом на сторінці / з початку періоду
+    assert "4000.00" in first
+    assert "500.00" in second and "4500.00" in second
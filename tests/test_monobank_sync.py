@@ -0,0 +1,160 @@
+# tests/test_monobank_sync.py
+"""Синхронізація виписки проти локального фейкового сервера services/monobank_fake.py."""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from cryptography.fernet import Fernet
+from fastapi import HTTPException
+
+from core.config import settings
+from services import monobank_fake, monobank_sync
+
+ACCOUNT = "fake-fop-uah"
+
+
+class _Snap:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class _LinkRef:
+    """Документ monobank_links/{uid} у пам'яті."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get(self):
+        return _Snap(self.data)
+
+    def set(self, data, merge=False):
+        for key, value in data.items():
+            if merge and isinstance(value, dict) and isinstance(self.data.get(key), dict):
+                self.data[key] = {**self.data[key], **value}
+            else:
+                self.data[key] = value
+
+
+class _Writer:
+    """Замість транзакції Firestore: записи застосовуються одразу."""
+
+    def set(self, ref, data, merge=False):
+        ref.set(data, merge=merge)
+
+
+class _LinksDB:
+    def __init__(self, link):
+        self.link_ref = _LinkRef(link)
+
+    def collection(self, name):
+        assert name == monobank_sync.LINKS_COLLECTION
+        return self
+
+    def document(self, doc_id):
+        return self.link_ref
+
+
+@pytest.fixture
+def fake_bank(monkeypatch):
+    monkeypatch.setattr(monobank_fake, "RATE_LIMIT_SECONDS", 0)
+    monkeypatch.setattr(monobank_fake, "_transactions", {a["id"]: [] for a in monobank_fake._accounts})
+    monkeypatch.setattr(monobank_fake, "_last_request", {})
+    monkeypatch.setattr(settings, "MONOBANK_API_URL", "http://monobank.test")
+    monkeypatch.setattr(settings, "MONOBANK_STATEMENT_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(settings, "MONOBANK_TOKEN_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(monobank_sync, "_gates", {})
+    return monobank_fake._transactions
+
+
+def _http():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=monobank_fake.app))
+
+
+def _credit(tx_id: str, ts: int, amount: int = 1000) -> dict:
+    return {"id": tx_id, "time": ts, "description": "Оплата", "amount": amount, "currencyCode": 980, "hold": False}
+
+
+def _statement(from_ts: int, to_ts: int) -> list[dict]:
+    async def _run():
+        async with _http() as http:
+            return await monobank_sync.MonobankPersonalClient("token", http).statement(ACCOUNT, from_ts, to_ts)
+
+    return asyncio.run(_run())
+
+
+def test_statement_pages_do_not_skip_transactions_in_the_boundary_second(fake_bank):
+    now = int(time.time())
+    # Межа сторінки (500-та транзакція) припадає на секунду, в якій є ще дві
+    fake_bank[ACCOUNT] += [_credit(f"new-{i}", now - 100 + i % 50) for i in range(499)]
+    fake_bank[ACCOUNT] += [_credit(f"edge-{i}", now - 200) for i in range(3)]
+    fake_bank[ACCOUNT] += [_credit(f"old-{i}", now - 300 - i) for i in range(10)]
+
+    items = _statement(now - 3600, now)
+
+    assert sorted(i["id"] for i in items) == sorted(t["id"] for t in fake_bank[ACCOUNT])
+
+
+def test_statement_reads_full_window_beyond_page_limit(fake_bank):
+    now = int(time.time())
+    monobank_fake.seed(ACCOUNT, 1300, now - 20 * 24 * 3600, now, credit_ratio=0.5)
+
+    items = _statement(now - 21 * 24 * 3600, now)
+
+    assert len(items) == 1300
+    assert {i["id"] for i in items} == {t["id"] for t in fake_bank[ACCOUNT]}
+
+
+def test_sync_checkpoint_stays_behind_settle_window(fake_bank, monkeypatch):
+    now = int(time.time())
+    settled = _credit("settled", now - 3 * monobank_sync.SETTLE_SECONDS)
+    recent = _credit("recent", now - 10)
+    fake_bank[ACCOUNT] += [settled, recent]
+
+    db = _LinksDB({"user_uid": "u1", monobank_sync.TOKEN_FIELD: monobank_sync.encrypt_token("token"), "accounts": [ACCOUNT]})
+    monkeypatch.setattr(monobank_sync, "ensure_initialized", lambda: db)
+    stored: dict[str, dict] = {}
+
+    def _store(_db, user_uid, account, items, on_last_batch=None):
+        new = [i for i in items if i["id"] not in stored]
+        stored.update((i["id"], i) for i in items)
+        if on_last_batch:
+            on_last_batch(_Writer())
+        return len(new)
+
+    monkeypatch.setattr(monobank_sync, "store_credits", _store)
+
+    async def _sync():
+        async with _http() as http:
+            return await monobank_sync.sync_user("u1", http=http)
+
+    first = asyncio.run(_sync())
+    checkpoint = db.link_ref.data["checkpoints"][ACCOUNT]
+    assert first["imported"] == 2
+    assert checkpoint <= int(time.time()) - monobank_sync.SETTLE_SECONDS
+    assert checkpoint < recent["time"]
+
+    # Транзакція, що з'явилась у виписці із запізненням, потрапляє в наступний синк
+    late = _credit("late", now - 20)
+    fake_bank[ACCOUNT].append(late)
+    second = asyncio.run(_sync())
+    assert second["imported"] == 1
+    assert set(stored) == {"settled", "recent", "late"}
+
+
+def test_connect_requires_user_token(fake_bank):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(monobank_sync.connect_user("u1", None, None))
+    assert exc.value.status_code == 400
+
+
+def test_income_date_is_kyiv_calendar_time():
+    # 31.03 23:30 UTC — вже 1 квітня в Києві, тобто II квартал
+    ts = int(datetime(2025, 3, 31, 23, 30, tzinfo=timezone.utc).timestamp())
+    income = monobank_sync._income_from_item("u1", ACCOUNT, _credit("q2", ts))
+    assert income["date"] == datetime(2025, 4, 1, 2, 30)